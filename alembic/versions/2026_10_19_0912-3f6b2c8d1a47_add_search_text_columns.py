@@ -0,0 +1,75 @@
+"""add search_text columns and search indexes
+
+Revision ID: 3f6b2c8d1a47
+Revises: 8cbfa8d0e747
+Create Date: 2026-10-19 09:12:08.512044
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f6b2c8d1a47"
+down_revision: Union[str, Sequence[str], None] = "8cbfa8d0e747"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCHABLE = (
+    ("trips", "title"),
+    ("activities", "title"),
+    ("participants", "name"),
+)
+
+# core.slugs.normalize_search_text in SQL: strip accents (NFKD, then drop
+# what is not ASCII), lowercase and collapse whitespace.
+NORMALIZE_SQL = (
+    r"lower(btrim(regexp_replace(regexp_replace("
+    r"normalize(coalesce({source}, ''), NFKD), '[^\x01-\x7F]', '', 'g'),"
+    r" '\s+', ' ', 'g')))"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    for table_name, source in SEARCHABLE:
+        op.add_column(table_name, sa.Column("search_text", sa.String(), nullable=True))
+        # One set-based statement, which also works with ``--sql``.
+        op.execute(
+            f"UPDATE {table_name} SET search_text = "
+            + NORMALIZE_SQL.format(source=source)
+        )
+
+        op.alter_column(
+            table_name,
+            "search_text",
+            existing_type=sa.String(),
+            nullable=False,
+            server_default="",
+        )
+        op.create_index(
+            f"ix_{table_name}_search_text_trgm",
+            table_name,
+            ["search_text"],
+            postgresql_using="gin",
+            postgresql_ops={"search_text": "gin_trgm_ops"},
+        )
+        op.create_index(
+            f"ix_{table_name}_search_text_tsv",
+            table_name,
+            [sa.text("to_tsvector('simple', search_text)")],
+            postgresql_using="gin",
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name, _ in reversed(SEARCHABLE):
+        op.drop_index(f"ix_{table_name}_search_text_tsv", table_name=table_name)
+        op.drop_index(f"ix_{table_name}_search_text_trgm", table_name=table_name)
+        op.drop_column(table_name, "search_text")
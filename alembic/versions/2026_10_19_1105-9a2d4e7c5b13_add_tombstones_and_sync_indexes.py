@@ -0,0 +1,60 @@
+"""add tombstones table and delta-sync indexes
+
+Revision ID: 9a2d4e7c5b13
+Revises: 3f6b2c8d1a47
+Create Date: 2026-10-19 11:05:41.207317
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9a2d4e7c5b13"
+down_revision: Union[str, Sequence[str], None] = "3f6b2c8d1a47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SYNC_INDEXES = (
+    ("calendars", "trip_id"),
+    ("activities", "calendar_id"),
+    ("participants", "trip_id"),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "tombstones",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("trip_id", sa.UUID(), nullable=False),
+        sa.Column("entity", sa.String(), nullable=False),
+        sa.Column("entity_id", sa.String(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["trip_id"], ["trips.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_tombstones_trip_id_deleted_at",
+        "tombstones",
+        ["trip_id", "deleted_at"],
+    )
+    for table_name, scope in SYNC_INDEXES:
+        op.create_index(
+            f"ix_{table_name}_{scope}_created_at", table_name, [scope, "created_at"]
+        )
+        op.create_index(
+            f"ix_{table_name}_{scope}_updated_at", table_name, [scope, "updated_at"]
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name, scope in reversed(SYNC_INDEXES):
+        op.drop_index(f"ix_{table_name}_{scope}_updated_at", table_name=table_name)
+        op.drop_index(f"ix_{table_name}_{scope}_created_at", table_name=table_name)
+    op.drop_index("ix_tombstones_trip_id_deleted_at", table_name="tombstones")
+    op.drop_table("tombstones")
@@ -0,0 +1,74 @@
+"""cascade deletes on foreign keys
+
+Revision ID: c4e81f0b9d26
+Revises: 9a2d4e7c5b13
+Create Date: 2026-10-19 13:42:17.630951
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e81f0b9d26"
+down_revision: Union[str, Sequence[str], None] = "9a2d4e7c5b13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (constraint name, source table, referent table, local column)
+FOREIGN_KEYS = (
+    ("calendars_trip_id_fkey", "calendars", "trips", "trip_id"),
+    ("fk_participants_trip_id_trips_id", "participants", "trips", "trip_id"),
+    ("activities_calendar_id_fkey", "activities", "calendars", "calendar_id"),
+    (
+        "activity_participant_activity_id_fkey",
+        "activity_participant",
+        "activities",
+        "activity_id",
+    ),
+    (
+        "activity_participant_participant_id_fkey",
+        "activity_participant",
+        "participants",
+        "participant_id",
+    ),
+    ("expenses_activity_id_fkey", "expenses", "activities", "activity_id"),
+    (
+        "expense_payments_expense_id_fkey",
+        "expense_payments",
+        "expenses",
+        "expense_id",
+    ),
+    (
+        "expense_payments_participant_id_fkey",
+        "expense_payments",
+        "participants",
+        "participant_id",
+    ),
+    ("expense_splits_expense_id_fkey", "expense_splits", "expenses", "expense_id"),
+    (
+        "expense_splits_participant_id_fkey",
+        "expense_splits",
+        "participants",
+        "participant_id",
+    ),
+)
+
+
+def _recreate_foreign_keys(ondelete: str | None) -> None:
+    for name, source, referent, column in FOREIGN_KEYS:
+        op.drop_constraint(name, source, type_="foreignkey")
+        op.create_foreign_key(
+            name, source, referent, [column], ["id"], ondelete=ondelete
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _recreate_foreign_keys("CASCADE")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _recreate_foreign_keys(None)
@@ -0,0 +1,43 @@
+"""add trip version and changed_at columns
+
+Revision ID: e7b35a91c204
+Revises: c4e81f0b9d26
+Create Date: 2026-10-19 15:20:44.118270
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e7b35a91c204"
+down_revision: Union[str, Sequence[str], None] = "c4e81f0b9d26"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "trips",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+    op.add_column(
+        "trips",
+        sa.Column(
+            "changed_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+    )
+    op.execute("UPDATE trips SET changed_at = COALESCE(updated_at, created_at)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("trips", "changed_at")
+    op.drop_column("trips", "version")
@@ -0,0 +1,37 @@
+"""add trip_documents table
+
+Revision ID: 5d09c3f7e8a2
+Revises: e7b35a91c204
+Create Date: 2026-10-19 16:10:03.904112
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5d09c3f7e8a2"
+down_revision: Union[str, Sequence[str], None] = "e7b35a91c204"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "trip_documents",
+        sa.Column("trip_id", sa.UUID(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("built_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["trip_id"], ["trips.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("trip_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("trip_documents")
@@ -0,0 +1,39 @@
+"""add keyset pagination indexes
+
+Revision ID: b81f4c2d6e90
+Revises: 5d09c3f7e8a2
+Create Date: 2026-10-19 17:45:12.530871
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b81f4c2d6e90"
+down_revision: Union[str, Sequence[str], None] = "5d09c3f7e8a2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PAGE_INDEXES = (
+    ("calendars", "trip_id", ("dt", "id")),
+    ("activities", "calendar_id", ("created_at", "id")),
+    ("participants", "trip_id", ("id",)),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table_name, scope, keys in PAGE_INDEXES:
+        op.create_index(
+            f"ix_{table_name}_{scope}_{'_'.join(keys)}", table_name, [scope, *keys]
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name, scope, keys in reversed(PAGE_INDEXES):
+        op.drop_index(
+            f"ix_{table_name}_{scope}_{'_'.join(keys)}", table_name=table_name
+        )
@@ -0,0 +1,34 @@
+"""add rate_limit_buckets table
+
+Revision ID: 3c7e91d4a0b5
+Revises: b81f4c2d6e90
+Create Date: 2026-10-19 19:30:41.208317
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3c7e91d4a0b5"
+down_revision: Union[str, Sequence[str], None] = "b81f4c2d6e90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "rate_limit_buckets",
+        sa.Column("key", sa.String(length=255), nullable=False),
+        sa.Column("tat", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("rate_limit_buckets")
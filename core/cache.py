@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from typing import Any, Generic, Hashable, TypeVar
+
+from core.events import TripEvent
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """Small thread-safe LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> V | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        with self._lock:
+            self._store(key, value)
+
+    def delete(self, *keys: Hashable) -> None:
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    # Called with the lock held.
+    def _store(self, key: Hashable, value: V) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._remove(next(iter(self._data)))
+
+    def _remove(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+
+class TripCache(TTLCache[V]):
+    """TTLCache of values derived from a single trip, invalidated by its events.
+
+    ``keys`` names the entries a trip event makes stale. Values are stored
+    with the trip version they were built from, and ``put`` refuses a value
+    older than an invalidation already seen, so a slow fill racing a change
+    cannot put the stale value back after it was deleted. Only the last
+    ``maxsize`` invalidated trips are remembered for that; a fill outliving
+    that many invalidations of other trips is not expected.
+
+    Each entry also records its trip, so ``invalidate_trip`` can drop a
+    trip's entries without knowing their keys.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        keys: Callable[[TripEvent], Iterable[Hashable]],
+        maxsize: int = 1024,
+    ):
+        super().__init__(ttl, maxsize)
+        self.keys = keys
+        self._versions: OrderedDict[str, int] = OrderedDict()
+        self._trips: dict[Hashable, str] = {}
+
+    def put(self, key: Hashable, value: V, trip_id: Any, version: int) -> bool:
+        with self._lock:
+            if self._versions.get(str(trip_id), 0) > version:
+                return False
+            self._store(key, value)
+            self._trips[key] = str(trip_id)
+            return True
+
+    def invalidate(self, trip_event: TripEvent) -> None:
+        version = trip_event.data.get("version") or 0
+        with self._lock:
+            self._seen(trip_event.trip_id, version)
+            for key in self.keys(trip_event):
+                self._remove(key)
+
+    def invalidate_trip(self, trip_id: str, version: int = 0) -> None:
+        """Drop every entry built from ``trip_id``."""
+        with self._lock:
+            self._seen(trip_id, version)
+            for key in [k for k, owner in self._trips.items() if owner == trip_id]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._trips.clear()
+
+    def _seen(self, trip_id: str, version: int) -> None:
+        self._versions[trip_id] = max(self._versions.get(trip_id, 0), version)
+        self._versions.move_to_end(trip_id)
+        while len(self._versions) > self.maxsize:
+            self._versions.popitem(last=False)
+
+    def _remove(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+        self._trips.pop(key, None)
+
+
+# Rendered iCalendar feeds keyed by trip slug.
+calendar_feed_cache: TripCache = TripCache(
+    ttl=300,
+    keys=lambda trip_event: (
+        trip_event.trip_slug,
+        trip_event.data.get("previous_trip_slug"),
+    ),
+)
@@ -1,17 +1,47 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.orm import Session, sessionmaker
 
-from core.settings import get_settings
+from core.settings import Settings, get_settings
 
-settings = get_settings()
+# Created on first use (normally the app lifespan, after workers fork) so that
+# importing the app never opens a pool that forked processes would share.
+_engine: Engine | None = None
+_session_factory: sessionmaker[Session] | None = None
 
-engine = create_engine(settings.get_db_url())
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def init_db(settings: Settings | None = None) -> Engine:
+    global _engine, _session_factory
+    if _engine is None:
+        settings = settings or get_settings()
+        _engine = create_engine(
+            settings.get_db_url(),
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+        )
+        _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
+    return _engine
+
+
+def dispose_db() -> None:
+    global _engine, _session_factory
+    if _engine is not None:
+        _engine.dispose()
+    _engine = None
+    _session_factory = None
+
+
+def get_engine() -> Engine:
+    return init_db()
+
+
+def get_session_factory() -> sessionmaker[Session]:
+    init_db()
+    assert _session_factory is not None
+    return _session_factory
 
 
 def get_db():
-    db = SessionLocal()
+    db = get_session_factory()()
     try:
         yield db
     finally:
@@ -0,0 +1,206 @@
+"""Negotiated response encodings.
+
+``MessagePackMiddleware`` re-encodes JSON responses as ``application/msgpack``
+when the ``Accept`` header prefers it, so every response model gets the
+binary form without per-route code. ``CompressionMiddleware`` gzip- or
+brotli-compresses responses above ``COMPRESSION_MIN_BYTES`` according to
+``Accept-Encoding``. Both only touch complete (non-streaming) bodies, and
+bodies of ``COMPRESSION_OFFLOAD_BYTES`` or more are encoded in a worker
+thread so the event loop keeps serving other requests meanwhile.
+
+msgpack and brotli are optional: without the packages installed the
+corresponding encoding is simply never offered.
+
+A re-encoded response carries the ETag with the coding appended
+(``"<tag>-br"``), a strong tag of its own since its bytes differ from the
+identity JSON, and a ``Vary`` header naming what it was negotiated on.
+``core.http`` strips the coding again when it compares validators, so the tag
+of any encoding works in ``If-Match`` and ``If-None-Match``.
+"""
+
+import asyncio
+import gzip
+import json
+from collections.abc import Callable
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.http import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/msgpack",
+    "application/x-ndjson",
+    "text/",
+)
+
+
+def _accepted(header: str) -> dict[str, float]:
+    """Parse an ``Accept``-style header into ``{value: q}``."""
+    accepted = {}
+    for item in header.split(","):
+        value, *params = [part.strip() for part in item.split(";")]
+        if not value:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, raw = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(raw)
+                except ValueError:
+                    q = 0.0
+        accepted[value.lower()] = q
+    return accepted
+
+
+def _add_vary(headers: MutableHeaders, value: str) -> None:
+    existing = [v.strip() for v in headers.get("vary", "").split(",") if v.strip()]
+    if value.lower() not in (v.lower() for v in existing):
+        headers["vary"] = ", ".join([*existing, value])
+
+
+def _tag_etag(headers: MutableHeaders, coding: str) -> None:
+    etag = headers.get("etag")
+    if etag:
+        headers["etag"] = encoded_etag(etag, coding)
+
+
+class _ReencodingMiddleware:
+    """Buffers a complete response body and hands it to ``reencode``."""
+
+    def __init__(self, app: ASGIApp, offload_size: int):
+        self.app = app
+        self.offload_size = offload_size
+
+    def negotiate(self, request_headers: Headers) -> str | None:
+        raise NotImplementedError
+
+    async def reencode(
+        self, choice: str, headers: MutableHeaders, body: bytes
+    ) -> bytes | None:
+        """Return the new body (having updated ``headers``), or None to keep it."""
+        raise NotImplementedError
+
+    async def run(self, fn: Callable[[bytes], bytes], body: bytes) -> bytes:
+        if len(body) >= self.offload_size:
+            return await asyncio.to_thread(fn, body)
+        return fn(body)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        choice = self.negotiate(Headers(scope=scope))
+        if choice is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+        streaming = False
+
+        async def buffered_send(message: Message) -> None:
+            nonlocal start, streaming
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if streaming or message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            if message.get("more_body", False):
+                # Streaming responses are passed through unchanged.
+                streaming = True
+                await send(start)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=list(start["headers"]))
+            new_body = await self.reencode(choice, headers, body)
+            if new_body is not None:
+                headers["content-length"] = str(len(new_body))
+                message = {**message, "body": new_body}
+            await send({**start, "headers": headers.raw})
+            await send(message)
+
+        await self.app(scope, receive, buffered_send)
+
+
+class MessagePackMiddleware(_ReencodingMiddleware):
+    def negotiate(self, request_headers: Headers) -> str | None:
+        if msgpack is None:
+            return None
+        # JSON answers are negotiated too: a cache must not hand them to a
+        # client asking for MessagePack, so they also get ``Vary: Accept``.
+        if "accept" not in request_headers:
+            return "json"
+        accepted = _accepted(request_headers["accept"])
+        q_msgpack = max(accepted.get(t, 0.0) for t in MSGPACK_TYPES)
+        q_json = max(accepted.get("application/json", 0.0), accepted.get("*/*", 0.0))
+        return "msgpack" if q_msgpack > 0 and q_msgpack >= q_json else "json"
+
+    async def reencode(
+        self, choice: str, headers: MutableHeaders, body: bytes
+    ) -> bytes | None:
+        if not headers.get("content-type", "").startswith("application/json"):
+            return None
+        _add_vary(headers, "Accept")
+        if choice != "msgpack" or not body:
+            return None
+        packed = await self.run(
+            lambda raw: msgpack.packb(json.loads(raw), use_bin_type=True), body
+        )
+        headers["content-type"] = "application/msgpack"
+        _tag_etag(headers, "msgpack")
+        return packed
+
+
+class CompressionMiddleware(_ReencodingMiddleware):
+    def __init__(self, app: ASGIApp, minimum_size: int, offload_size: int):
+        super().__init__(app, offload_size)
+        self.minimum_size = minimum_size
+        self.encoders: dict[str, Callable[[bytes], bytes]] = {
+            "gzip": lambda raw: gzip.compress(raw, compresslevel=6)
+        }
+        if brotli is not None:
+            self.encoders["br"] = lambda raw: brotli.compress(raw, quality=5)
+
+    def negotiate(self, request_headers: Headers) -> str | None:
+        accepted = _accepted(request_headers.get("accept-encoding", ""))
+        wildcard = accepted.get("*", 0.0)
+        # Brotli first: it wins ties because it compresses JSON better.
+        ranked = sorted(
+            self.encoders,
+            key=lambda name: (accepted.get(name, wildcard), name == "br"),
+            reverse=True,
+        )
+        best = ranked[0]
+        return best if accepted.get(best, wildcard) > 0 else None
+
+    async def reencode(
+        self, choice: str, headers: MutableHeaders, body: bytes
+    ) -> bytes | None:
+        content_type = headers.get("content-type", "")
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return None
+        _add_vary(headers, "Accept-Encoding")
+        if "content-encoding" in headers or len(body) < self.minimum_size:
+            return None
+        compressed = await self.run(self.encoders[choice], body)
+        if len(compressed) >= len(body):
+            return None
+        headers["content-encoding"] = choice
+        _tag_etag(headers, choice)
+        return compressed
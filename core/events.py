@@ -0,0 +1,274 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import Engine, event, func
+from sqlalchemy import select as sa_select
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+PENDING_EVENTS_KEY = "pending_trip_events"
+NOTIFY_CHANNEL = "tripboard_events"
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+@dataclass(frozen=True)
+class TripEvent:
+    trip_id: str
+    trip_slug: str
+    kind: str
+    data: dict[str, Any] = field(default_factory=dict)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "trip_id": self.trip_id,
+                "trip_slug": self.trip_slug,
+                "kind": self.kind,
+                "data": self.data,
+            },
+            default=str,
+        )
+
+    @classmethod
+    def from_json(cls, payload: str) -> "TripEvent":
+        raw = json.loads(payload)
+        return cls(
+            trip_id=raw["trip_id"],
+            trip_slug=raw["trip_slug"],
+            kind=raw["kind"],
+            data=raw.get("data") or {},
+        )
+
+
+EventListener = Callable[[TripEvent], None]
+ConnectionListener = Callable[[bool], None]
+
+_listeners: list[EventListener] = []
+_connection_listeners: list[ConnectionListener] = []
+
+
+def add_event_listener(listener: EventListener) -> None:
+    """Register a callback run for every delivered event, in every worker."""
+    _listeners.append(listener)
+
+
+def add_connection_listener(listener: ConnectionListener) -> None:
+    """Register a callback told when the bus stops or resumes delivering."""
+    _connection_listeners.append(listener)
+
+
+class Subscription:
+    """Queue of events for one trip, consumed on the subscriber's event loop."""
+
+    def __init__(self, bus: "LocalEventBus", trip_id: str):
+        self.bus = bus
+        self.trip_id = trip_id
+        self.loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue[TripEvent] = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(self, trip_event: TripEvent) -> None:
+        try:
+            self._queue.put_nowait(trip_event)
+        except asyncio.QueueFull:
+            # A slow consumer only needs to know it must refetch.
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(
+                TripEvent(trip_event.trip_id, trip_event.trip_slug, "resync")
+            )
+
+    async def get(self) -> TripEvent:
+        return await self._queue.get()
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self)
+
+
+class LocalEventBus:
+    """Fans committed events out to listeners and subscribers of this process."""
+
+    def __init__(self):
+        self._subscriptions: dict[str, set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self.connected = True
+
+    def set_connected(self, connected: bool) -> None:
+        if connected == self.connected:
+            return
+        self.connected = connected
+        for listener in _connection_listeners:
+            try:
+                listener(connected)
+            except Exception:
+                logger.exception("Connection listener failed")
+
+    def subscribe(self, trip_id: str) -> Subscription:
+        subscription = Subscription(self, trip_id)
+        with self._lock:
+            self._subscriptions.setdefault(trip_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.trip_id)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.trip_id]
+
+    def deliver(self, trip_event: TripEvent) -> None:
+        for listener in _listeners:
+            try:
+                listener(trip_event)
+            except Exception:
+                logger.exception("Event listener failed for %s", trip_event.kind)
+
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(trip_event.trip_id, ()))
+        for subscription in subscriptions:
+            if subscription.loop.is_closed():
+                continue
+            subscription.loop.call_soon_threadsafe(subscription.offer, trip_event)
+
+    def before_commit(self, session: Session, events: list[TripEvent]) -> None:
+        pass
+
+    def after_commit(self, events: list[TripEvent]) -> None:
+        for trip_event in events:
+            self.deliver(trip_event)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+class PostgresEventBus(LocalEventBus):
+    """Delivers events to every worker through PostgreSQL ``LISTEN/NOTIFY``.
+
+    Notifications are queued inside the writing transaction, so they are only
+    sent if it commits, and come back to this worker through the listener
+    thread like they do for every other worker.
+    """
+
+    def __init__(self, engine: Engine, reconnect_delay: float = 1.0):
+        super().__init__()
+        self.engine = engine
+        self.reconnect_delay = reconnect_delay
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def before_commit(self, session: Session, events: list[TripEvent]) -> None:
+        for trip_event in events:
+            session.execute(
+                sa_select(func.pg_notify(NOTIFY_CHANNEL, trip_event.to_json()))
+            )
+
+    def after_commit(self, events: list[TripEvent]) -> None:
+        pass
+
+    def start(self) -> None:
+        self._stopping.clear()
+        # Until LISTEN is in place, changes from other workers go unseen.
+        self.set_connected(False)
+        self._thread = threading.Thread(
+            target=self._listen_forever, name="event-bus-listener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _connect(self):
+        # A dedicated DBAPI connection; LISTEN must not hold a pooled one.
+        args, kwargs = self.engine.dialect.create_connect_args(self.engine.url)
+        conn = self.engine.dialect.loaded_dbapi.connect(*args, **kwargs)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        return conn
+
+    def _listen_forever(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                conn = self._connect()
+            except Exception:
+                logger.exception("Event bus could not connect; retrying")
+                self.set_connected(False)
+                self._stopping.wait(self.reconnect_delay)
+                continue
+            self.set_connected(True)
+            try:
+                self._drain(conn)
+            except Exception:
+                logger.exception("Event bus connection lost; reconnecting")
+                self.set_connected(False)
+            finally:
+                conn.close()
+
+    def _drain(self, conn) -> None:
+        while not self._stopping.is_set():
+            readable, _, _ = select.select([conn], [], [], 1.0)
+            if not readable:
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                try:
+                    trip_event = TripEvent.from_json(notify.payload)
+                except (KeyError, ValueError):
+                    logger.warning("Ignoring malformed event %r", notify.payload)
+                    continue
+                self.deliver(trip_event)
+
+
+_event_bus: LocalEventBus = LocalEventBus()
+
+
+def get_event_bus() -> LocalEventBus:
+    return _event_bus
+
+
+def set_event_bus(bus: LocalEventBus) -> None:
+    global _event_bus
+    _event_bus = bus
+
+
+def emit_trip_event(
+    db: Session, trip_id: Any, trip_slug: str, kind: str, **data: Any
+) -> None:
+    """Queue an event that is published only if the session commits."""
+    db.info.setdefault(PENDING_EVENTS_KEY, []).append(
+        TripEvent(str(trip_id), trip_slug, kind, data)
+    )
+
+
+@event.listens_for(Session, "before_commit")
+def _publish_before_commit(session: Session) -> None:
+    events = session.info.get(PENDING_EVENTS_KEY)
+    if events:
+        _event_bus.before_commit(session, events)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session: Session) -> None:
+    events = session.info.pop(PENDING_EVENTS_KEY, None)
+    if events:
+        _event_bus.after_commit(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(PENDING_EVENTS_KEY, None)
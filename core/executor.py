@@ -0,0 +1,187 @@
+"""Bounded executor for blocking database work.
+
+Routes are ``async def`` but the services use a synchronous Session, so
+their calls are handed to a thread pool sized to the connection pool. At most
+``max_workers`` calls run at once (one connection each); up to
+``max_queue`` more wait for a thread, and anything beyond that is turned
+away with ``503 Service Unavailable`` and ``Retry-After`` instead of piling
+up behind an exhausted pool.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import metrics
+from core.profiling import profiled_threads
+from core.settings import Settings, get_settings
+
+T = TypeVar("T")
+M = TypeVar("M", bound=BaseModel)
+
+queue_wait_seconds = metrics.histogram(
+    "db_executor_queue_wait_seconds", "Time DB calls waited for an executor thread"
+)
+rejected_total = metrics.counter(
+    "db_executor_rejected_total", "DB calls rejected because the queue was full"
+)
+
+# Seconds this request's DB calls spent queued; set by QueueTimingMiddleware.
+_request_wait: contextvars.ContextVar[list[float] | None] = contextvars.ContextVar(
+    "request_db_queue_wait", default=None
+)
+
+
+class DBExecutor:
+    def __init__(self, max_workers: int, max_queue: int, retry_after: int = 1):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="db")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._pending - self.max_workers)
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                rejected_total.inc()
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy, retry shortly",
+                    headers={"Retry-After": str(self.retry_after)},
+                )
+            self._pending += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+        self._admit()
+        submitted = time.perf_counter()
+        request_wait = _request_wait.get()
+
+        def call() -> T:
+            waited = time.perf_counter() - submitted
+            queue_wait_seconds.observe(waited)
+            if request_wait is not None:
+                request_wait[0] += waited
+            threads = profiled_threads.get()
+            if threads is not None:
+                threads.add(threading.get_ident())
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if threads is not None:
+                    threads.discard(threading.get_ident())
+                # Released by the thread, so a cancelled request still
+                # counts until its call actually finishes.
+                self._release()
+
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool, context.run, call)
+        except RuntimeError:
+            # The pool refused the call (shutting down); call() never ran.
+            self._release()
+            raise
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+_executor: DBExecutor | None = None
+
+
+def init_executor(settings: Settings | None = None) -> DBExecutor:
+    global _executor
+    if _executor is None:
+        settings = settings or get_settings()
+        _executor = DBExecutor(
+            max_workers=settings.db_pool_size + settings.db_max_overflow,
+            max_queue=settings.db_queue_limit,
+            retry_after=settings.db_retry_after,
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+    _executor = None
+
+
+async def run_db(fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+    """Run a blocking service call on the DB executor."""
+    return await init_executor().run(fn, *args, **kwargs)
+
+
+async def run_db_as(
+    schema: type[M], fn: Callable[..., Any], /, *args: Any, **kwargs: Any
+) -> M | None:
+    """Run a service call and build ``schema`` from its ORM result, both on
+    the DB executor.
+
+    Relationships the schema embeds are lazy-loaded there, instead of while
+    FastAPI serializes a live ORM object on the event loop.
+    """
+
+    def call() -> M | None:
+        result = fn(*args, **kwargs)
+        return None if result is None else schema.model_validate(result)
+
+    return await run_db(call)
+
+
+def executor_queue_depth() -> int:
+    return _executor.queue_depth if _executor is not None else 0
+
+
+metrics.gauge(
+    "db_executor_queue_depth",
+    "DB calls waiting for an executor thread",
+    executor_queue_depth,
+)
+
+
+class QueueTimingMiddleware:
+    """Reports the request's DB queue wait in a ``Server-Timing`` header."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        waited = [0.0]
+        token = _request_wait.set(waited)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (b"server-timing", f"db-queue;dur={waited[0] * 1000:.1f}".encode())
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_wait.reset(token)
@@ -0,0 +1,145 @@
+"""Sparse fieldsets (``?fields=``) and relationship expansion (``?expand=``).
+
+``expand`` lists the relationships to embed as dotted paths
+(``calendars.activities`` implies ``calendars``); without it every
+relationship is embedded as before. ``fields`` lists the attributes to keep,
+unqualified for the top level and dotted for nested levels
+(``title,calendars.dt``). Relationships that are not expanded are never
+loaded from the database.
+"""
+
+import typing
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy.orm import raiseload, selectinload
+
+
+def _split(value: str | None) -> list[str]:
+    if value is None:
+        return []
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def _relations(schema: type[BaseModel]) -> dict[str, type[BaseModel]]:
+    relations = {}
+    for name, field in schema.model_fields.items():
+        if typing.get_origin(field.annotation) is list:
+            (item,) = typing.get_args(field.annotation)
+            if isinstance(item, type) and issubclass(item, BaseModel):
+                relations[name] = item
+    return relations
+
+
+def _join(path: str, name: str) -> str:
+    return f"{path}.{name}" if path else name
+
+
+@dataclass(frozen=True)
+class FieldSelection:
+    # Level path ("" for the top level) -> attribute names to keep.
+    fields: dict[str, frozenset[str]]
+    # Relationship paths to embed; None embeds everything.
+    expand: frozenset[str] | None
+
+    def selects(self, path: str, name: str) -> bool:
+        chosen = self.fields.get(path)
+        return chosen is None or name in chosen
+
+    def embeds(self, path: str, name: str) -> bool:
+        full = _join(path, name)
+        if any(level == full or level.startswith(full + ".") for level in self.fields):
+            return True
+        if self.expand is not None:
+            return full in self.expand or name in self.fields.get(path, ())
+        return self.selects(path, name)
+
+    def validate(self, schema: type[BaseModel]) -> None:
+        levels: dict[str, type[BaseModel]] = {}
+
+        def walk(level: type[BaseModel], path: str) -> None:
+            levels[path] = level
+            for name, child in _relations(level).items():
+                walk(child, _join(path, name))
+
+        walk(schema, "")
+        unknown = [
+            _join(path, name)
+            for path, names in self.fields.items()
+            for name in sorted(names)
+            if path not in levels or name not in levels[path].model_fields
+        ]
+        unknown += sorted(
+            path for path in self.expand or () if path not in levels or not path
+        )
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}",
+            )
+
+    def loader_options(self, model: type, schema: type[BaseModel]) -> list:
+        """Loader options that load exactly the embedded relationships."""
+        self.validate(schema)
+        return self._loader_options(model, schema, "", None)
+
+    def _loader_options(self, model, schema, path: str, parent) -> list:
+        options = []
+        for name, child in _relations(schema).items():
+            attr = getattr(model, name)
+            full = _join(path, name)
+            if self.embeds(path, name):
+                loader = parent.selectinload(attr) if parent else selectinload(attr)
+                options.append(loader)
+                options.extend(
+                    self._loader_options(
+                        attr.property.mapper.class_, child, full, loader
+                    )
+                )
+            else:
+                options.append(parent.raiseload(attr) if parent else raiseload(attr))
+        return options
+
+    def dump(self, obj: Any, schema: type[BaseModel], path: str = "") -> dict:
+        """Serialize ``obj`` like ``schema`` would, keeping selected fields only."""
+        relations = _relations(schema)
+        scalars = [name for name in schema.model_fields if name not in relations]
+        # model_construct skips validation, so unloaded relationships are
+        # never touched; the field serializers still apply on dump.
+        partial = schema.model_construct(
+            **{name: getattr(obj, name) for name in scalars}
+        ).model_dump(mode="json", include={n for n in scalars if self.selects(path, n)})
+        for name, child in relations.items():
+            if self.embeds(path, name):
+                partial[name] = [
+                    self.dump(item, child, _join(path, name))
+                    for item in getattr(obj, name)
+                ]
+        return {name: partial[name] for name in schema.model_fields if name in partial}
+
+
+def field_selection(
+    fields: str | None = None, expand: str | None = None
+) -> FieldSelection | None:
+    """Query parameter dependency; ``None`` when neither parameter is given."""
+    if fields is None and expand is None:
+        return None
+
+    chosen: dict[str, set[str]] = {}
+    for entry in _split(fields):
+        path, _, name = entry.rpartition(".")
+        chosen.setdefault(path, set()).add(name)
+
+    expanded = None
+    if expand is not None:
+        expanded = set()
+        for entry in _split(expand):
+            parts = entry.split(".")
+            expanded.update(".".join(parts[: i + 1]) for i in range(len(parts)))
+
+    return FieldSelection(
+        fields={path: frozenset(names) for path, names in chosen.items()},
+        expand=frozenset(expanded) if expanded is not None else None,
+    )
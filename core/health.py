@@ -0,0 +1,164 @@
+"""Cached health probes for the load balancer.
+
+A background task checks the database every ``HEALTH_PROBE_INTERVAL_S`` on
+its own unpooled connection, bounded by ``HEALTH_PROBE_TIMEOUT_S``, and
+compares the applied Alembic revision with the head in ``alembic/``. The
+health routes only read the cached result plus in-memory pool and executor
+counters, so answering a health check never waits for, or takes, a pooled
+connection.
+
+Probes run on a dedicated thread, and on PostgreSQL the connect and
+statement timeouts end a probe against a hung server on the server side
+too. While a timed-out probe is still running no new one is started, so a
+stuck database ties up that one thread and nothing else.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import Engine, create_engine, text
+from sqlalchemy.pool import NullPool
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from core.executor import executor_queue_depth
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_DIR = Path(__file__).resolve().parent.parent / "alembic"
+
+
+def migration_head() -> str | None:
+    """The newest revision in ``alembic/versions``, if the scripts are present."""
+    if not ALEMBIC_DIR.is_dir():
+        return None
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+@dataclass
+class ProbeResult:
+    checked_at: float
+    database: bool
+    latency_ms: float | None = None
+    revision: str | None = None
+    error: str | None = None
+
+
+class HealthMonitor:
+    def __init__(
+        self,
+        engine: Engine,
+        expected_head: str | None,
+        pool_capacity: int,
+        interval: float = 5.0,
+        timeout: float = 2.0,
+    ):
+        self.engine = engine
+        self.expected_head = expected_head
+        self.pool_capacity = pool_capacity
+        self.interval = interval
+        self.timeout = timeout
+        self.last: ProbeResult | None = None
+        connect_args = {}
+        if engine.dialect.name == "postgresql":
+            connect_args["connect_timeout"] = max(1, int(timeout))
+        # Separate and unpooled, so probes neither wait on nor hold the
+        # connections serving requests.
+        self._probe_engine = create_engine(
+            engine.url, poolclass=NullPool, connect_args=connect_args
+        )
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="health-probe")
+        self._check_running: Future | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._probe_engine.dispose()
+
+    async def _run(self) -> None:
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval)
+
+    def _check(self) -> str | None:
+        with self._probe_engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                timeout_ms = max(1, int(self.timeout * 1000))
+                conn.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
+            conn.execute(text("SELECT 1"))
+            return MigrationContext.configure(conn).get_current_revision()
+
+    async def probe(self) -> ProbeResult:
+        started = time.perf_counter()
+        try:
+            if self._check_running is not None and not self._check_running.done():
+                raise TimeoutError("previous probe still running")
+            self._check_running = self._executor.submit(self._check)
+            revision = await asyncio.wait_for(
+                asyncio.wrap_future(self._check_running), self.timeout
+            )
+        except Exception as exc:
+            error = "timed out" if isinstance(exc, TimeoutError) else str(exc)
+            error = error.splitlines()[0] if error else type(exc).__name__
+            result = ProbeResult(time.time(), database=False, error=error)
+        else:
+            latency = (time.perf_counter() - started) * 1000
+            result = ProbeResult(
+                time.time(), database=True, latency_ms=latency, revision=revision
+            )
+        if self.last is None or self.last.database != result.database:
+            log = logger.info if result.database else logger.warning
+            log("Database probe %s", "ok" if result.database else result.error)
+        self.last = result
+        return result
+
+    def pool_status(self) -> dict[str, Any]:
+        checkedout = getattr(self.engine.pool, "checkedout", None)
+        checked_out = checkedout() if checkedout is not None else 0
+        return {
+            "checked_out": checked_out,
+            "capacity": self.pool_capacity,
+            "utilization": round(checked_out / self.pool_capacity, 3),
+        }
+
+    def readiness(self) -> tuple[bool, dict[str, Any]]:
+        last = self.last
+        stale = last is None or time.time() - last.checked_at > 3 * self.interval
+        database_ok = last is not None and last.database and not stale
+        migrations_ok = self.expected_head is None or (
+            last is not None and last.revision == self.expected_head
+        )
+        pool = self.pool_status()
+        queue_depth = executor_queue_depth()
+        # Every connection is busy and calls are already waiting for one.
+        exhausted = pool["utilization"] >= 1 and queue_depth > 0
+        checks = {
+            "database": {
+                "ok": database_ok,
+                "checked_at": last.checked_at if last else None,
+                "latency_ms": last.latency_ms if last else None,
+                "error": last.error if last else "not probed yet",
+            },
+            "migrations": {
+                "ok": migrations_ok,
+                "current": last.revision if last else None,
+                "head": self.expected_head,
+            },
+            "pool": {"ok": not exhausted, **pool},
+            "executor": {"ok": not exhausted, "queue_depth": queue_depth},
+        }
+        return all(check["ok"] for check in checks.values()), checks
@@ -0,0 +1,119 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Annotated
+
+from fastapi import Depends, Header, Request, Response, status
+from sqlalchemy.orm import Session
+
+from core.db import get_db
+
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def validator_headers(etag: str, last_modified: datetime) -> dict[str, str]:
+    return {"ETag": etag, "Last-Modified": http_date(last_modified)}
+
+
+def not_modified_response(etag: str, last_modified: datetime) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=validator_headers(etag, last_modified),
+    )
+
+
+# Content codings that ``core.encoding`` appends to the ETag of a re-encoded
+# response, so each representation keeps a distinct strong tag.
+ETAG_CODINGS = ("gzip", "br", "msgpack")
+
+
+def encoded_etag(etag: str, coding: str) -> str:
+    """``"abc-3"`` becomes ``"abc-3-gzip"`` (a weak tag stays weak)."""
+    prefix = "W/" if etag.startswith("W/") else ""
+    return f'{prefix}"{etag.removeprefix("W/").strip('"')}-{coding}"'
+
+
+def _without_codings(etag: str) -> str:
+    prefix = "W/" if etag.startswith("W/") else ""
+    opaque = etag.removeprefix("W/").strip('"')
+    stripped = True
+    while stripped:
+        stripped = False
+        for coding in ETAG_CODINGS:
+            if opaque.endswith(f"-{coding}"):
+                opaque = opaque.removesuffix(f"-{coding}")
+                stripped = True
+    return f'{prefix}"{opaque}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [c.strip() for c in header.split(",")]
+    # If-None-Match uses the weak comparison function (RFC 9110 13.1.2).
+    return "*" in candidates or any(
+        _without_codings(c).removeprefix("W/") == etag.removeprefix("W/")
+        for c in candidates
+    )
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def if_match_satisfied(header: str, etag: str) -> bool:
+    # If-Match uses the strong comparison function (RFC 9110 13.1.1).
+    # The tag of any encoding of the current representation matches.
+    candidates = [_without_codings(c.strip()) for c in header.split(",")]
+    return "*" in candidates or (not etag.startswith("W/") and etag in candidates)
+
+
+def return_preference(prefer: str | None) -> str | None:
+    """The ``return`` preference of a ``Prefer`` header (RFC 7240)."""
+    for item in (prefer or "").split(","):
+        name, _, value = item.split(";")[0].partition("=")
+        if name.strip().lower() == "return":
+            return value.strip().strip('"').lower()
+    return None
+
+
+def prefers_minimal(
+    db: Annotated[Session, Depends(get_db)],
+    prefer: Annotated[str | None, Header()] = None,
+) -> bool:
+    """Dependency for writes honouring ``Prefer: return=minimal``.
+
+    Nothing is read back for a minimal response, so the written attributes
+    are kept instead of being expired (and reloaded) on commit.
+    """
+    minimal = return_preference(prefer) == "minimal"
+    if minimal:
+        db.expire_on_commit = False
+    return minimal
+
+
+def minimal_response(location: str, etag: str, last_modified: datetime) -> Response:
+    return Response(
+        status_code=status.HTTP_204_NO_CONTENT,
+        headers={
+            "Location": location,
+            "Preference-Applied": "return=minimal",
+            **validator_headers(etag, last_modified),
+        },
+    )
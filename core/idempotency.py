@@ -0,0 +1,422 @@
+"""Replay of retried ``POST`` requests carrying an ``Idempotency-Key``.
+
+The first request with a key runs normally and, if it succeeds (2xx), its
+response is stored for ``IDEMPOTENCY_TTL_S``. A retry with the same key on
+the same route is answered from the store with one primary-key read and
+never reaches the handler, so it writes nothing. Failed requests are not
+stored, leaving the client free to retry them.
+
+Keys are scoped to the route and the client (the ``RATE_LIMIT_CLIENT_HEADER``
+value or the client address, as for rate limiting), so one client cannot
+replay another's response by guessing its key. A key reused with a different
+request body is rejected with ``422``, and a retry arriving while the first
+request is still running gets ``409 Conflict`` with ``Retry-After``. A
+reservation left behind by a worker that died expires after
+``lock_timeout`` seconds. Request bodies larger than ``MAX_STORED_BODY`` are
+not buffered for fingerprinting; such requests run without replay
+protection.
+
+Keys live in this worker unless ``IDEMPOTENCY_BACKEND=postgres`` shares them
+through ``idempotency_keys``.
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from sqlalchemy import Engine, create_engine, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import metrics
+from core.models import IdempotencyKey
+from core.ratelimit import client_id
+from core.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# Larger requests and responses are not worth keeping; such requests just
+# run again.
+MAX_STORED_BODY = 1024 * 1024
+
+idempotency_total = metrics.counter(
+    "idempotency_requests_total",
+    "Requests with an Idempotency-Key by outcome "
+    "(replayed, conflict, mismatch, too_large)",
+)
+
+
+@dataclass(frozen=True)
+class IdempotencyRecord:
+    fingerprint: str
+    expires_at: float
+    status_code: int | None = None
+    headers: list[tuple[str, str]] | None = None
+    body: bytes | None = None
+
+    @property
+    def pending(self) -> bool:
+        return self.status_code is None
+
+
+class IdempotencyStore:
+    """Records kept in this process, oldest keys evicted past ``maxsize``."""
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._records: OrderedDict[str, IdempotencyRecord] = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def begin(
+        self, key: str, fingerprint: str, now: float, lock_until: float
+    ) -> IdempotencyRecord | None:
+        """Reserve ``key`` and return None, or return the live record holding it."""
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None and record.expires_at > now:
+                return record
+            self._records[key] = IdempotencyRecord(fingerprint, lock_until)
+            self._records.move_to_end(key)
+            while len(self._records) > self.maxsize:
+                self._records.popitem(last=False)
+            return None
+
+    async def complete(self, key: str, record: IdempotencyRecord) -> None:
+        with self._lock:
+            self._records[key] = record
+
+    async def release(self, key: str) -> None:
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None and record.pending:
+                del self._records[key]
+
+
+class PostgresIdempotencyStore(IdempotencyStore):
+    """Records shared by all workers through the ``idempotency_keys`` table.
+
+    Uses a small pool of its own, like the shared rate limit store. If the
+    database cannot be reached, requests run without replay protection
+    rather than being rejected.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, engine: Engine, pool_size: int = 2):
+        super().__init__()
+        self._engine = create_engine(
+            engine.url, pool_size=pool_size, max_overflow=0, pool_timeout=1
+        )
+        self._calls = 0
+
+    async def begin(
+        self, key: str, fingerprint: str, now: float, lock_until: float
+    ) -> IdempotencyRecord | None:
+        return await asyncio.to_thread(self._begin, key, fingerprint, now, lock_until)
+
+    def _read(self, key: str) -> IdempotencyRecord | None:
+        with self._engine.connect() as conn:
+            row = conn.execute(
+                select(IdempotencyKey.__table__).where(IdempotencyKey.key == key)
+            ).first()
+        if row is None:
+            return None
+        headers = [tuple(pair) for pair in row.headers] if row.headers else None
+        return IdempotencyRecord(
+            row.fingerprint, row.expires_at, row.status_code, headers, row.body
+        )
+
+    def _begin(
+        self, key: str, fingerprint: str, now: float, lock_until: float
+    ) -> IdempotencyRecord | None:
+        table = IdempotencyKey.__table__
+        record = self._read(key)
+        if record is not None and record.expires_at > now:
+            return record
+        reservation = {
+            "fingerprint": fingerprint,
+            "expires_at": lock_until,
+            "status_code": None,
+            "headers": None,
+            "body": None,
+        }
+        with self._engine.begin() as conn:
+            if record is None:
+                try:
+                    conn.execute(insert(table).values(key=key, **reservation))
+                    reserved = True
+                except IntegrityError:
+                    reserved = False
+            else:
+                # Take over the expired row unless another worker just did.
+                reserved = (
+                    conn.execute(
+                        update(table)
+                        .where(table.c.key == key, table.c.expires_at <= now)
+                        .values(**reservation)
+                    ).rowcount
+                    == 1
+                )
+            self._calls += 1
+            if reserved and self._calls % self.PRUNE_EVERY == 0:
+                conn.execute(delete(table).where(table.c.expires_at < now))
+        return None if reserved else self._read(key)
+
+    async def complete(self, key: str, record: IdempotencyRecord) -> None:
+        table = IdempotencyKey.__table__
+        stmt = (
+            update(table)
+            .where(table.c.key == key)
+            .values(
+                status_code=record.status_code,
+                headers=[list(pair) for pair in record.headers or ()],
+                body=record.body,
+                expires_at=record.expires_at,
+            )
+        )
+        await asyncio.to_thread(self._execute, stmt)
+
+    async def release(self, key: str) -> None:
+        table = IdempotencyKey.__table__
+        stmt = delete(table).where(table.c.key == key, table.c.status_code.is_(None))
+        await asyncio.to_thread(self._execute, stmt)
+
+    def _execute(self, stmt) -> None:
+        with self._engine.begin() as conn:
+            conn.execute(stmt)
+
+    def close(self) -> None:
+        self._engine.dispose()
+
+
+_store: IdempotencyStore = IdempotencyStore()
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    return _store
+
+
+def set_idempotency_store(store: IdempotencyStore) -> None:
+    global _store
+    _store = store
+
+
+def _error(
+    status_code: int, detail: str, headers: dict[str, str] | None = None
+) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=status_code, headers=headers)
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app: ASGIApp, settings: Settings, lock_timeout: float = 60.0):
+        self.app = app
+        self.ttl = settings.idempotency_ttl_s
+        self.lock_timeout = lock_timeout
+        self.retry_after = str(settings.db_retry_after)
+        self.client_header = settings.rate_limit_client_header.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].startswith("/api/")
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        client_key = headers.get(HEADER)
+        if client_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not 0 < len(client_key) <= MAX_KEY_LENGTH:
+            await _error(
+                status.HTTP_400_BAD_REQUEST,
+                f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters",
+            )(scope, receive, send)
+            return
+
+        # Keys are scoped to the client and the route, so one key can't
+        # replay another client's or another endpoint's response.
+        client = client_id(scope, self.client_header)
+        key = hashlib.sha256(
+            f"{client}\n{scope['method']} {scope['path']}\n{client_key}".encode()
+        ).hexdigest()
+        body, messages = await _read_body(receive, MAX_STORED_BODY)
+        if body is None:
+            idempotency_total.inc(outcome="too_large")
+            await self.app(scope, _replay(messages, receive), send)
+            return
+        fingerprint = _fingerprint(scope, headers, body)
+
+        store = get_idempotency_store()
+        now = time.time()
+        try:
+            record = await store.begin(key, fingerprint, now, now + self.lock_timeout)
+        except Exception:
+            logger.warning("Idempotency store unavailable", exc_info=True)
+            await self.app(scope, _replay(messages, receive), send)
+            return
+
+        if record is not None:
+            if record.fingerprint != fingerprint:
+                idempotency_total.inc(outcome="mismatch")
+                response = _error(
+                    status.HTTP_422_UNPROCESSABLE_CONTENT,
+                    f"{HEADER} was already used for a different request",
+                )
+            elif record.pending:
+                idempotency_total.inc(outcome="conflict")
+                response = _error(
+                    status.HTTP_409_CONFLICT,
+                    f"A request with this {HEADER} is still in progress",
+                    {"Retry-After": self.retry_after},
+                )
+            else:
+                idempotency_total.inc(outcome="replayed")
+                await _send_record(record, send)
+                return
+            await response(scope, receive, send)
+            return
+
+        await self._run(
+            scope, _replay(messages, receive), send, store, key, fingerprint
+        )
+
+    async def _run(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        store: IdempotencyStore,
+        key: str,
+        fingerprint: str,
+    ) -> None:
+        start: Message | None = None
+        stored = False
+
+        async def storing_send(message: Message) -> None:
+            nonlocal start, stored
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            if _storable(start, message):
+                # Stored before the client sees it, so an immediate retry
+                # already gets the replay.
+                record = IdempotencyRecord(
+                    fingerprint,
+                    time.time() + self.ttl,
+                    start["status"],
+                    [
+                        (name.decode("latin-1"), value.decode("latin-1"))
+                        for name, value in start.get("headers", [])
+                    ],
+                    message.get("body", b""),
+                )
+                try:
+                    await store.complete(key, record)
+                    stored = True
+                except Exception:
+                    logger.warning("Could not store idempotent response", exc_info=True)
+            await send(start)
+            start = None
+            await send(message)
+
+        try:
+            await self.app(scope, receive, storing_send)
+        finally:
+            if not stored:
+                try:
+                    await store.release(key)
+                except Exception:
+                    logger.warning("Could not release idempotency key", exc_info=True)
+
+
+def _fingerprint(scope: Scope, headers: Headers, body: bytes) -> str:
+    media_type, _, params = headers.get("content-type", "").partition(";")
+    boundary = ""
+    for param in params.split(";"):
+        name, _, value = param.strip().partition("=")
+        if name.lower() == "boundary":
+            boundary = value.strip('"')
+    if boundary:
+        # A retried multipart request may pick a new boundary.
+        body = body.replace(boundary.encode("latin-1"), b"")
+    return hashlib.sha256(
+        b"\n".join(
+            [
+                scope.get("query_string", b""),
+                media_type.strip().lower().encode("latin-1"),
+                body,
+            ]
+        )
+    ).hexdigest()
+
+
+def _storable(start: Message, message: Message) -> bool:
+    return (
+        200 <= start["status"] < 300
+        and not message.get("more_body", False)
+        and len(message.get("body", b"")) <= MAX_STORED_BODY
+    )
+
+
+async def _read_body(
+    receive: Receive, limit: int
+) -> tuple[bytes | None, list[Message]]:
+    """Read the request body, or stop with None once it exceeds ``limit``."""
+    messages = []
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        chunk = message.get("body", b"")
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            return None, messages
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks), messages
+
+
+def _replay(messages: list[Message], receive: Receive) -> Receive:
+    """A ``receive`` yielding the already read ``messages`` first."""
+    pending = list(messages)
+
+    async def replayed() -> Message:
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replayed
+
+
+async def _send_record(record: IdempotencyRecord, send: Send) -> None:
+    headers = [
+        (name.encode("latin-1"), value.encode("latin-1"))
+        for name, value in record.headers or ()
+    ]
+    headers.append((b"idempotent-replayed", b"true"))
+    await send(
+        {
+            "type": "http.response.start",
+            "status": record.status_code,
+            "headers": headers,
+        }
+    )
+    await send({"type": "http.response.body", "body": record.body or b""})
@@ -0,0 +1,105 @@
+"""Invalidation of in-process caches across workers.
+
+Services publish every committed trip change through the event bus
+(``record_trip_change``), which ``PostgresEventBus`` delivers to every worker
+with ``LISTEN/NOTIFY`` and ``LocalEventBus`` loops back within the process.
+``CacheInvalidator`` turns those events into deletions in the registered
+``TripCache`` instances.
+
+Per trip, events arrive in version order: the version bump locks the trip
+row, and PostgreSQL delivers notifications in commit order. Duplicate or
+older versions are skipped, and a gap in the versions (an event missed while
+reconnecting) drops every cached entry of that trip, since the missing
+event's keys, a renamed slug for example, cannot be known. The last versions
+of up to ``max_trips`` trips are remembered; a trip beyond that is treated
+as never seen. While the bus is disconnected, caches are
+cleared and their TTL is cut to ``CACHE_FALLBACK_TTL_S`` so entries are never
+staler than that; both are restored once it reconnects.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+from core.cache import TripCache
+from core.events import TripEvent, add_connection_listener, add_event_listener
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+invalidations_total = metrics.counter(
+    "cache_invalidations_total", "Trip events applied to in-process caches"
+)
+skipped_total = metrics.counter(
+    "cache_invalidations_skipped_total",
+    "Trip events skipped as duplicates or older than one already applied",
+)
+flushes_total = metrics.counter(
+    "cache_flushes_total", "Times every in-process cache was cleared"
+)
+trip_flushes_total = metrics.counter(
+    "cache_trip_flushes_total",
+    "Times every cached entry of one trip was dropped after missed events",
+)
+
+
+class CacheInvalidator:
+    def __init__(self, fallback_ttl: float = 5.0, max_trips: int = 10_000):
+        self.fallback_ttl = fallback_ttl
+        self.max_trips = max_trips
+        self.connected = True
+        self._caches: dict[TripCache, float] = {}
+        self._versions: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, cache: TripCache) -> TripCache:
+        with self._lock:
+            self._caches[cache] = cache.ttl
+            if not self.connected:
+                cache.ttl = min(cache.ttl, self.fallback_ttl)
+        return cache
+
+    def handle(self, trip_event: TripEvent) -> None:
+        version = trip_event.data.get("version")
+        with self._lock:
+            last = self._versions.get(trip_event.trip_id)
+            if version is not None:
+                if last is not None and version <= last:
+                    skipped_total.inc()
+                    return
+                self._versions[trip_event.trip_id] = version
+                self._versions.move_to_end(trip_event.trip_id)
+                while len(self._versions) > self.max_trips:
+                    self._versions.popitem(last=False)
+            caches = list(self._caches)
+        missed = version is not None and last is not None and version > last + 1
+        if missed:
+            logger.info("Missed events for trip %s", trip_event.trip_id)
+            trip_flushes_total.inc()
+        for cache in caches:
+            if missed:
+                cache.invalidate_trip(trip_event.trip_id, version)
+            cache.invalidate(trip_event)
+        invalidations_total.inc(kind=trip_event.kind)
+
+    def flush(self, reason: str) -> None:
+        logger.info("Clearing in-process caches: %s", reason)
+        flushes_total.inc()
+        with self._lock:
+            caches = list(self._caches)
+        for cache in caches:
+            cache.clear()
+
+    def connection_changed(self, connected: bool) -> None:
+        with self._lock:
+            self.connected = connected
+            # Events missed while disconnected leave unknowable gaps.
+            self._versions.clear()
+            for cache, ttl in self._caches.items():
+                cache.ttl = ttl if connected else min(ttl, self.fallback_ttl)
+        self.flush("event bus reconnected" if connected else "event bus disconnected")
+
+
+invalidator = CacheInvalidator()
+add_event_listener(invalidator.handle)
+add_connection_listener(invalidator.connection_changed)
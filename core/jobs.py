@@ -0,0 +1,307 @@
+"""Durable background jobs.
+
+Jobs are rows in ``jobs``. A request handler (or CLI) queues one with
+``enqueue_job`` in its own transaction, and ``JobWorker`` threads in the
+``worker.py`` process claim them with ``SELECT ... FOR UPDATE SKIP LOCKED``
+so concurrent workers never pick the same row. Handlers registered with
+``job_handler`` get a ``JobContext`` holding a session and a way to report
+progress, and return a JSON-able result.
+
+A failed attempt is retried after an exponential backoff with jitter until
+``max_attempts`` is reached; ``PermanentJobError`` skips the retries. Running
+jobs heartbeat, and a job whose worker died is claimed again once its
+heartbeat is older than the lease. Files that handlers leave in
+``results_dir`` are deleted once they are older than ``result_ttl``.
+"""
+
+import logging
+import random
+import socket
+import threading
+import time
+import traceback
+import uuid
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from core.metrics import metrics
+from core.models import Job
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+jobs_total = metrics.counter("jobs_total", "Job attempts by kind and outcome")
+
+JobHandler = Callable[["JobContext"], dict[str, Any] | None]
+
+_handlers: dict[str, JobHandler] = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help."""
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    def register(handler: JobHandler) -> JobHandler:
+        _handlers[kind] = handler
+        return handler
+
+    return register
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue_job(
+    db: Session,
+    kind: str,
+    payload: dict[str, Any] | None = None,
+    max_attempts: int = 3,
+) -> Job:
+    """Add a job to the session; it becomes visible to workers on commit."""
+    job = Job(kind=kind, payload=payload or {}, max_attempts=max_attempts)
+    db.add(job)
+    db.flush()
+    return job
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    return min(cap, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+class JobContext:
+    def __init__(
+        self,
+        job: Job,
+        db: Session,
+        session_factory: sessionmaker[Session],
+        results_dir: str,
+    ):
+        self.job_id = job.id
+        self.kind = job.kind
+        self.payload = job.payload
+        self.attempt = job.attempts
+        self.db = db
+        self.results_dir = results_dir
+        self._session_factory = session_factory
+
+    def report_progress(self, fraction: float, message: str | None = None) -> None:
+        """Record progress in its own transaction, visible to pollers at once."""
+        with self._session_factory() as db:
+            db.execute(
+                update(Job)
+                .where(Job.id == self.job_id, Job.status == RUNNING)
+                .values(
+                    progress=max(0.0, min(fraction, 1.0)),
+                    progress_message=message,
+                    heartbeat_at=_now(),
+                    updated_at=_now(),
+                )
+            )
+            db.commit()
+
+
+class JobWorker:
+    def __init__(
+        self,
+        session_factory: sessionmaker[Session],
+        concurrency: int = 2,
+        poll_interval: float = 1.0,
+        lease: float = 300.0,
+        backoff_base: float = 5.0,
+        backoff_max: float = 600.0,
+        results_dir: str = "job_results",
+        result_ttl: float = 86400.0,
+    ):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.results_dir = results_dir
+        self.result_ttl = result_ttl
+        self.worker_id = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self._stopping = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._running: set[uuid.UUID] = set()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        self._stopping.clear()
+        targets = [self._work] * self.concurrency + [self._heartbeat]
+        for i, target in enumerate(targets):
+            thread = threading.Thread(target=target, name=f"job-worker-{i}")
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Stop claiming jobs and wait for the running ones to finish."""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                ran = self.run_once()
+            except Exception:
+                logger.exception("Job worker loop failed")
+                ran = False
+            if not ran:
+                self._stopping.wait(self.poll_interval)
+
+    def _heartbeat(self) -> None:
+        while not self._stopping.wait(self.lease / 3):
+            try:
+                self.prune_results()
+            except Exception:
+                logger.exception("Pruning job results failed")
+            with self._lock:
+                running = list(self._running)
+            if not running:
+                continue
+            try:
+                with self.session_factory() as db:
+                    db.execute(
+                        update(Job)
+                        .where(Job.id.in_(running), Job.locked_by == self.worker_id)
+                        .values(heartbeat_at=_now())
+                    )
+                    db.commit()
+            except Exception:
+                logger.exception("Job heartbeat failed")
+
+    def prune_results(self) -> int:
+        """Delete result files older than ``result_ttl``; returns how many."""
+        directory = Path(self.results_dir)
+        if not directory.is_dir():
+            return 0
+        cutoff = time.time() - self.result_ttl
+        pruned = 0
+        for path in directory.iterdir():
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                pruned += 1
+        return pruned
+
+    def claim(self, db: Session) -> Job | None:
+        now = _now()
+        expired = now - timedelta(seconds=self.lease)
+        while True:
+            job = db.scalars(
+                select(Job)
+                .where(
+                    or_(
+                        and_(Job.status == QUEUED, Job.run_at <= now),
+                        and_(Job.status == RUNNING, Job.heartbeat_at < expired),
+                    )
+                )
+                .order_by(Job.run_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            ).first()
+            if job is None:
+                db.commit()
+                return None
+            if job.status == RUNNING and job.attempts >= job.max_attempts:
+                # Its worker died on the last attempt.
+                job.status = FAILED
+                job.error = "Worker stopped heartbeating"
+                job.finished_at = job.updated_at = now
+                db.commit()
+                continue
+            job.status = RUNNING
+            job.attempts += 1
+            job.locked_by = self.worker_id
+            job.heartbeat_at = job.updated_at = now
+            db.commit()
+            return job
+
+    def run_once(self) -> bool:
+        """Claim and run one job; False if none was due."""
+        with self.session_factory() as db:
+            job = self.claim(db)
+            if job is None:
+                return False
+            with self._lock:
+                self._running.add(job.id)
+            try:
+                self._run(job, db)
+            finally:
+                with self._lock:
+                    self._running.discard(job.id)
+        return True
+
+    def _run(self, job: Job, db: Session) -> None:
+        job_id, kind, attempt = job.id, job.kind, job.attempts
+        handler = _handlers.get(kind)
+        context = JobContext(job, db, self.session_factory, self.results_dir)
+        try:
+            if handler is None:
+                raise PermanentJobError(f"No handler for job kind {kind!r}")
+            result = handler(context)
+        except Exception as exc:
+            db.rollback()
+            logger.warning("Job %s (%s) attempt %d failed", job_id, kind, attempt)
+            self._finish_failed(db, job_id, attempt, exc)
+            return
+
+        db.commit()
+        self._finish(
+            db,
+            job_id,
+            attempt,
+            status=SUCCEEDED,
+            result=result,
+            progress=1.0,
+            finished_at=_now(),
+        )
+        jobs_total.inc(kind=kind, outcome=SUCCEEDED)
+
+    def _finish_failed(
+        self, db: Session, job_id: uuid.UUID, attempt: int, exc: Exception
+    ) -> None:
+        job = db.get(Job, job_id)
+        error = "".join(traceback.format_exception_only(exc)).strip()
+        if isinstance(exc, PermanentJobError) or attempt >= job.max_attempts:
+            self._finish(
+                db, job_id, attempt, status=FAILED, error=error, finished_at=_now()
+            )
+            jobs_total.inc(kind=job.kind, outcome=FAILED)
+        else:
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+            self._finish(
+                db,
+                job_id,
+                attempt,
+                status=QUEUED,
+                error=error,
+                run_at=_now() + timedelta(seconds=delay),
+            )
+            jobs_total.inc(kind=job.kind, outcome="retried")
+
+    def _finish(self, db: Session, job_id: uuid.UUID, attempt: int, **values) -> None:
+        # Only if the job is still ours: after a lost heartbeat another
+        # worker may have claimed it again.
+        db.execute(
+            update(Job)
+            .where(
+                Job.id == job_id,
+                Job.locked_by == self.worker_id,
+                Job.attempts == attempt,
+            )
+            .values(locked_by=None, updated_at=_now(), **values)
+        )
+        db.commit()
@@ -0,0 +1,225 @@
+"""Allocation tracing for memory-heavy requests.
+
+With ``MEMTRACE=true`` the process runs under tracemalloc. Each request's
+peak traced memory is recorded per route, together with the number of
+trips, calendars, activities and participants it loaded through the ORM.
+Requests whose peak exceeds ``MEMTRACE_THRESHOLD_MB`` are logged with those
+counts and the allocation sites that grew most since startup, captured when
+the response starts (while the serialized body is still alive).
+
+tracemalloc's peak is process-wide, so one request is measured at a time;
+requests arriving meanwhile are counted but not measured, and concurrent
+work can still inflate a measured peak. Tracing itself slows allocation
+noticeably, so leave it off outside of investigations.
+"""
+
+import contextvars
+import itertools
+import logging
+import threading
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Any
+
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import metrics
+from core.models import Base
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+request_peak_bytes = metrics.histogram(
+    "request_peak_memory_bytes",
+    "Peak traced memory while handling a request",
+    buckets=tuple(n * MB for n in (1, 5, 10, 25, 50, 100, 250, 500, 1000)),
+)
+unmeasured_total = metrics.counter(
+    "request_memory_unmeasured_total",
+    "Requests not measured because another request was being measured",
+)
+
+# ORM objects loaded by the current request, keyed by table name.
+loaded_objects: contextvars.ContextVar[Counter[str] | None] = contextvars.ContextVar(
+    "loaded_objects", default=None
+)
+
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _count_load(target, context) -> None:
+    loads = loaded_objects.get()
+    if loads is not None:
+        loads[target.__table__.name] += 1
+
+
+def _format_diff(stats: list[tracemalloc.StatisticDiff]) -> list[dict[str, Any]]:
+    return [
+        {
+            "site": str(stat.traceback),
+            "size_bytes": stat.size,
+            "size_diff_bytes": stat.size_diff,
+            "count_diff": stat.count_diff,
+        }
+        for stat in stats
+    ]
+
+
+def _route_label(scope: Scope) -> str:
+    route = getattr(scope.get("route"), "path", scope.get("path", ""))
+    return f"{scope.get('method')} {route}"
+
+
+class MemoryTracer:
+    def __init__(
+        self,
+        threshold_bytes: int,
+        frames: int = 10,
+        top: int = 10,
+        max_snapshots: int = 4,
+    ):
+        self.threshold_bytes = threshold_bytes
+        self.frames = frames
+        self.top = top
+        self.max_snapshots = max_snapshots
+        self.routes: dict[str, dict[str, Any]] = {}
+        self._baseline: tracemalloc.Snapshot | None = None
+        self._snapshots: OrderedDict[int, tracemalloc.Snapshot] = OrderedDict()
+        self._snapshot_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._started_tracing = False
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        event.listen(Base, "load", _count_load, propagate=True)
+        self._baseline = self._take()
+
+    def stop(self) -> None:
+        event.remove(Base, "load", _count_load)
+        self._baseline = None
+        self._snapshots.clear()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _take(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(_IGNORED)
+
+    def top_sites(self) -> list[dict[str, Any]]:
+        """Allocation sites that grew most since the tracer started."""
+        snapshot = self._take()
+        stats = snapshot.compare_to(self._baseline, "lineno")
+        return _format_diff(stats[: self.top])
+
+    def snapshot(self) -> dict[str, Any]:
+        snapshot = self._take()
+        with self._lock:
+            snapshot_id = next(self._snapshot_ids)
+            self._snapshots[snapshot_id] = snapshot
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "id": snapshot_id,
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "snapshots": list(self._snapshots),
+        }
+
+    def diff(self, base: int, target: int | None = None) -> list[dict[str, Any]] | None:
+        """Top growth from snapshot ``base`` to ``target`` (or to now)."""
+        with self._lock:
+            old = self._snapshots.get(base)
+            new = self._snapshots.get(target) if target is not None else None
+        if old is None or (target is not None and new is None):
+            return None
+        new = new or self._take()
+        return _format_diff(new.compare_to(old, "lineno")[: self.top])
+
+    def record(
+        self,
+        route: str,
+        peak: int,
+        loads: Counter[str],
+        sites: list[dict[str, Any]] | None,
+    ) -> None:
+        request_peak_bytes.observe(peak, route=route)
+        with self._lock:
+            stats = self.routes.setdefault(
+                route, {"requests": 0, "max_peak_bytes": 0, "top_sites": []}
+            )
+            stats["requests"] += 1
+            stats["last_peak_bytes"] = peak
+            if peak >= stats["max_peak_bytes"]:
+                stats["max_peak_bytes"] = peak
+                stats["loaded"] = dict(loads)
+                if sites is not None:
+                    stats["top_sites"] = sites
+
+
+class MemoryTraceMiddleware:
+    def __init__(self, app: ASGIApp, tracer: MemoryTracer):
+        self.app = app
+        self.tracer = tracer
+        self._measuring = threading.Lock()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracemalloc.is_tracing():
+            await self.app(scope, receive, send)
+            return
+        if not self._measuring.acquire(blocking=False):
+            unmeasured_total.inc()
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self._measure(scope, receive, send)
+        finally:
+            self._measuring.release()
+
+    async def _measure(self, scope: Scope, receive: Receive, send: Send) -> None:
+        tracer = self.tracer
+        loads: Counter[str] = Counter()
+        token = loaded_objects.set(loads)
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        sites = None
+
+        async def send_with_sites(message: Message) -> None:
+            nonlocal sites
+            if message["type"] == "http.response.start":
+                _, peak = tracemalloc.get_traced_memory()
+                if peak - start > tracer.threshold_bytes:
+                    sites = tracer.top_sites()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_sites)
+        finally:
+            loaded_objects.reset(token)
+            _, peak = tracemalloc.get_traced_memory()
+            peak -= start
+            route = _route_label(scope)
+            if peak > tracer.threshold_bytes:
+                sites = sites or tracer.top_sites()
+                logger.warning(
+                    "%s peaked at %.1f MB (loaded %s)\n%s",
+                    route,
+                    peak / MB,
+                    ", ".join(f"{n} {table}" for table, n in sorted(loads.items()))
+                    or "nothing",
+                    "\n".join(
+                        f"  {site['size_diff_bytes'] / MB:+.1f} MB {site['site']}"
+                        for site in sites
+                    ),
+                )
+            tracer.record(route, peak, loads, sites)
@@ -4,16 +4,22 @@ import uuid
 from datetime import date, datetime, timezone
 
 from sqlalchemy import (
+    JSON,
     Boolean,
     Column,
     Date,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    LargeBinary,
     String,
     Table,
+    Text,
     UniqueConstraint,
+    func,
+    text,
 )
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import (
@@ -21,26 +27,59 @@ from sqlalchemy.orm import (
     Mapped,
     mapped_column,
     relationship,
+    validates,
 )
 
+from core.slugs import normalize_search_text
+
 
 class Base(DeclarativeBase):
     pass
 
 
+def sync_indexes(table_name: str, scope: str) -> tuple[Index, Index]:
+    """Indexes answering "rows of this scope changed since T" for delta sync."""
+    return (
+        Index(f"ix_{table_name}_{scope}_created_at", scope, "created_at"),
+        Index(f"ix_{table_name}_{scope}_updated_at", scope, "updated_at"),
+    )
+
+
+def page_index(table_name: str, scope: str, *keys: str) -> Index:
+    """Ordered index serving keyset pagination of a scope's rows."""
+    return Index(f"ix_{table_name}_{scope}_{'_'.join(keys)}", scope, *keys)
+
+
+def search_text_indexes(table_name: str) -> tuple[Index, Index]:
+    """Trigram and full-text GIN indexes over ``search_text`` (PostgreSQL only)."""
+    return (
+        Index(
+            f"ix_{table_name}_search_text_trgm",
+            "search_text",
+            postgresql_using="gin",
+            postgresql_ops={"search_text": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            f"ix_{table_name}_search_text_tsv",
+            text("to_tsvector('simple', search_text)"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
 activity_participant = Table(
     "activity_participant",
     Base.metadata,
     Column(
         "activity_id",
         PG_UUID(as_uuid=True),
-        ForeignKey("activities.id"),
+        ForeignKey("activities.id", ondelete="CASCADE"),
         primary_key=True,
     ),
     Column(
         "participant_id",
         Integer,
-        ForeignKey("participants.id"),
+        ForeignKey("participants.id", ondelete="CASCADE"),
         primary_key=True,
     ),
 )
@@ -48,6 +87,7 @@ activity_participant = Table(
 
 class Trip(Base):
     __tablename__ = "trips"
+    __table_args__ = search_text_indexes("trips")
 
     id: Mapped[uuid.UUID] = mapped_column(
         PG_UUID(as_uuid=True),
@@ -57,15 +97,32 @@ class Trip(Base):
     slug: Mapped[str] = mapped_column(String, unique=True, index=True, nullable=False)
     title: Mapped[str] = mapped_column(String, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    search_text: Mapped[str] = mapped_column(
+        String, nullable=False, default="", server_default=""
+    )
+    # Bumped by every change to the trip or anything inside it; drives ETags.
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default="1"
+    )
+    changed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+        nullable=False,
+    )
 
     participants: Mapped[list[Participant]] = relationship(
         back_populates="trip",
         cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="Participant.id",
     )
 
     calendars: Mapped[list[Calendar]] = relationship(
         back_populates="trip",
         cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="[Calendar.dt, Calendar.id]",
     )
 
     created_at: Mapped[datetime] = mapped_column(
@@ -78,16 +135,25 @@ class Trip(Base):
         nullable=True,
     )
 
+    @validates("title")
+    def _fold_title(self, key: str, value: str) -> str:
+        self.search_text = normalize_search_text(value)
+        return value
+
 
 class Calendar(Base):
     __tablename__ = "calendars"
+    __table_args__ = (
+        *sync_indexes("calendars", "trip_id"),
+        page_index("calendars", "trip_id", "dt", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     dt: Mapped[date] = mapped_column(Date, nullable=False)
 
     trip_id: Mapped[uuid.UUID] = mapped_column(
         PG_UUID(as_uuid=True),
-        ForeignKey("trips.id"),
+        ForeignKey("trips.id", ondelete="CASCADE"),
         nullable=False,
     )
     trip: Mapped[Trip] = relationship(back_populates="calendars")
@@ -95,6 +161,8 @@ class Calendar(Base):
     activities: Mapped[list[Activity]] = relationship(
         back_populates="calendar",
         cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="[Activity.created_at, Activity.id]",
     )
 
     created_at: Mapped[datetime] = mapped_column(
@@ -110,6 +178,11 @@ class Calendar(Base):
 
 class Activity(Base):
     __tablename__ = "activities"
+    __table_args__ = (
+        *search_text_indexes("activities"),
+        *sync_indexes("activities", "calendar_id"),
+        page_index("activities", "calendar_id", "created_at", "id"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         PG_UUID(as_uuid=True),
@@ -118,10 +191,13 @@ class Activity(Base):
     )
     slug: Mapped[str] = mapped_column(String, unique=True, index=True, nullable=False)
     title: Mapped[str] = mapped_column(String, nullable=False)
+    search_text: Mapped[str] = mapped_column(
+        String, nullable=False, default="", server_default=""
+    )
 
     calendar_id: Mapped[int] = mapped_column(
         Integer,
-        ForeignKey("calendars.id"),
+        ForeignKey("calendars.id", ondelete="CASCADE"),
         nullable=False,
     )
     calendar: Mapped[Calendar] = relationship(back_populates="activities")
@@ -129,11 +205,14 @@ class Activity(Base):
     expense: Mapped[Expense | None] = relationship(
         back_populates="activity",
         uselist=False,
+        passive_deletes=True,
     )
 
     participants: Mapped[list[Participant]] = relationship(
         secondary=activity_participant,
         back_populates="activities",
+        passive_deletes=True,
+        order_by="Participant.id",
     )
 
     created_at: Mapped[datetime] = mapped_column(
@@ -146,18 +225,29 @@ class Activity(Base):
         nullable=True,
     )
 
+    @validates("title")
+    def _fold_title(self, key: str, value: str) -> str:
+        self.search_text = normalize_search_text(value)
+        return value
+
 
 class Participant(Base):
     __tablename__ = "participants"
     __table_args__ = (
         UniqueConstraint("trip_id", "name", name="uq_participant_trip_name"),
+        *search_text_indexes("participants"),
+        *sync_indexes("participants", "trip_id"),
+        page_index("participants", "trip_id", "id"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
+    search_text: Mapped[str] = mapped_column(
+        String, nullable=False, default="", server_default=""
+    )
     trip_id: Mapped[uuid.UUID] = mapped_column(
         PG_UUID(as_uuid=True),
-        ForeignKey("trips.id"),
+        ForeignKey("trips.id", ondelete="CASCADE"),
         nullable=False,
     )
     trip: Mapped[Trip] = relationship(back_populates="participants")
@@ -165,6 +255,7 @@ class Participant(Base):
     activities: Mapped[list[Activity]] = relationship(
         secondary=activity_participant,
         back_populates="participants",
+        passive_deletes=True,
     )
 
     created_at: Mapped[datetime] = mapped_column(
@@ -177,6 +268,53 @@ class Participant(Base):
         nullable=True,
     )
 
+    @validates("name")
+    def _fold_name(self, key: str, value: str) -> str:
+        self.search_text = normalize_search_text(value)
+        return value
+
+
+class Tombstone(Base):
+    """Records a hard-deleted row so delta-sync clients can drop it."""
+
+    __tablename__ = "tombstones"
+    __table_args__ = (
+        Index("ix_tombstones_trip_id_deleted_at", "trip_id", "deleted_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    trip_id: Mapped[uuid.UUID] = mapped_column(
+        PG_UUID(as_uuid=True),
+        ForeignKey("trips.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    entity: Mapped[str] = mapped_column(String, nullable=False)
+    entity_id: Mapped[str] = mapped_column(String, nullable=False)
+    deleted_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+
+
+class TripDocument(Base):
+    """The serialized ``TripOut`` of a trip, valid while ``version`` matches."""
+
+    __tablename__ = "trip_documents"
+
+    trip_id: Mapped[uuid.UUID] = mapped_column(
+        PG_UUID(as_uuid=True),
+        ForeignKey("trips.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+    built_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+
 
 class Expense(Base):
     __tablename__ = "expenses"
@@ -191,7 +329,7 @@ class Expense(Base):
 
     activity_id: Mapped[uuid.UUID] = mapped_column(
         PG_UUID(as_uuid=True),
-        ForeignKey("activities.id"),
+        ForeignKey("activities.id", ondelete="CASCADE"),
         nullable=False,
     )
     activity: Mapped[Activity] = relationship(
@@ -202,10 +340,12 @@ class Expense(Base):
     payments: Mapped[list[ExpensePayment]] = relationship(
         back_populates="expense",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
     splits: Mapped[list[ExpenseSplit]] = relationship(
         back_populates="expense",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     created_at: Mapped[datetime] = mapped_column(
@@ -235,12 +375,12 @@ class ExpensePayment(Base):
 
     expense_id: Mapped[uuid.UUID] = mapped_column(
         PG_UUID(as_uuid=True),
-        ForeignKey("expenses.id"),
+        ForeignKey("expenses.id", ondelete="CASCADE"),
         nullable=False,
     )
     participant_id: Mapped[int] = mapped_column(
         Integer,
-        ForeignKey("participants.id"),
+        ForeignKey("participants.id", ondelete="CASCADE"),
         nullable=False,
     )
 
@@ -276,12 +416,12 @@ class ExpenseSplit(Base):
 
     expense_id: Mapped[uuid.UUID] = mapped_column(
         PG_UUID(as_uuid=True),
-        ForeignKey("expenses.id"),
+        ForeignKey("expenses.id", ondelete="CASCADE"),
         nullable=False,
     )
     participant_id: Mapped[int] = mapped_column(
         Integer,
-        ForeignKey("participants.id"),
+        ForeignKey("participants.id", ondelete="CASCADE"),
         nullable=False,
     )
 
@@ -303,3 +443,75 @@ class ExpenseSplit(Base):
         DateTime(timezone=True),
         nullable=True,
     )
+
+
+class RateLimitBucket(Base):
+    """Shared rate limit state: the theoretical arrival time of ``key``."""
+
+    __tablename__ = "rate_limit_buckets"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    tat: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+class IdempotencyKey(Base):
+    """The response stored for a request's ``Idempotency-Key``.
+
+    ``status_code`` is NULL while the first request is still running.
+    """
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (Index("ix_idempotency_keys_expires_at", "expires_at"),)
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    status_code: Mapped[int | None] = mapped_column(Integer)
+    headers: Mapped[list | None] = mapped_column(JSON)
+    body: Mapped[bytes | None] = mapped_column(LargeBinary)
+    expires_at: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+class Job(Base):
+    """A unit of background work, claimed by workers with ``SKIP LOCKED``."""
+
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_run_at", "status", "run_at"),)
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        PG_UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+    )
+    kind: Mapped[str] = mapped_column(String, nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    # queued -> running -> succeeded | failed; failed attempts go back to queued.
+    status: Mapped[str] = mapped_column(String, nullable=False, default="queued")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=3)
+    run_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    locked_by: Mapped[str | None] = mapped_column(String, nullable=True)
+    heartbeat_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    progress: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    progress_message: Mapped[str | None] = mapped_column(String, nullable=True)
+    result: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    updated_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
@@ -0,0 +1,67 @@
+"""Keyset pagination over the ordered ``page_index`` indexes.
+
+A cursor encodes the sort key of the last row of a page, so the next page
+is an index range scan starting after it instead of an ``OFFSET`` that
+re-reads every earlier row.
+"""
+
+import base64
+import binascii
+import json
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.orm import InstrumentedAttribute, Session
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+@dataclass(frozen=True)
+class Keyset:
+    """Sort key of a paginated collection and how to parse it back."""
+
+    columns: tuple[InstrumentedAttribute, ...]
+    parsers: tuple[Callable[[str], Any], ...]
+
+    def encode(self, row: Any) -> str:
+        values = [str(getattr(row, column.key)) for column in self.columns]
+        raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def decode(self, cursor: str) -> list[Any]:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            if not isinstance(values, list) or len(values) != len(self.parsers):
+                raise ValueError(cursor)
+            return [parse(value) for parse, value in zip(self.parsers, values)]
+        except (binascii.Error, UnicodeError, ValueError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid page cursor",
+            )
+
+    def after(self, cursor: str):
+        return tuple_(*self.columns) > tuple_(*self.decode(cursor))
+
+    def page(self, rows: Sequence[Any], limit: int) -> dict:
+        """Page of ``rows`` fetched with ``limit + 1`` to detect a next page."""
+        items = list(rows[:limit])
+        has_more = len(rows) > limit
+        return {
+            "items": items,
+            "next_cursor": self.encode(items[-1]) if has_more else None,
+        }
+
+
+def paginate(
+    stmt: Select, keyset: Keyset, cursor: str | None, limit: int, db: Session
+) -> dict:
+    if cursor:
+        stmt = stmt.where(keyset.after(cursor))
+    rows = db.scalars(stmt.order_by(*keyset.columns).limit(limit + 1)).all()
+    return keyset.page(rows, limit)
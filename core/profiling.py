@@ -0,0 +1,164 @@
+"""On-demand sampling profiler for single requests.
+
+A request is profiled when it carries the configured token in the
+``X-Profile`` header or is picked by ``PROFILE_SAMPLE_RATE``. The token is
+not accepted as a query parameter, where it would end up in access logs.
+A sampler thread records the stacks of the event loop thread and of the DB
+executor threads working for that request, and the result is written to
+``PROFILE_DIR`` in the collapsed-stack format read by flamegraph.pl and
+speedscope. At most ``PROFILE_MAX_CONCURRENT`` requests
+are profiled at once; others run unprofiled.
+
+The event loop is shared, so its samples can include other requests that
+ran concurrently.
+"""
+
+import asyncio
+import contextvars
+import hmac
+import logging
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from types import FrameType
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import metrics
+from core.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+profiled_requests_total = metrics.counter(
+    "profiled_requests_total", "Requests profiled by the sampling profiler"
+)
+
+# Executor threads currently running DB calls for the profiled request.
+profiled_threads: contextvars.ContextVar[set[int] | None] = contextvars.ContextVar(
+    "profiled_threads", default=None
+)
+
+
+def _collapse(frame: FrameType | None) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    def __init__(self, threads: Callable[[], Iterable[int]], interval: float = 0.005):
+        self.threads = threads
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.threads()):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.samples[_collapse(frame)] += 1
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", value).strip("_")[:80] or "root"
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp, settings: Settings):
+        self.app = app
+        self.token = settings.profile_token
+        self.sample_rate = settings.profile_sample_rate
+        self.directory = Path(settings.profile_dir)
+        self.interval = settings.profile_interval_ms / 1000
+        self._slots = threading.BoundedSemaphore(settings.profile_max_concurrent)
+
+    def _requested(self, scope: Scope) -> bool:
+        if self.token:
+            candidate = dict(scope.get("headers", [])).get(b"x-profile", b"")
+            if candidate and hmac.compare_digest(candidate, self.token.encode()):
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if not self._slots.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            self._slots.release()
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        loop_thread = threading.get_ident()
+        threads: set[int] = set()
+        token = profiled_threads.set(threads)
+        profiler = SamplingProfiler(lambda: [loop_thread, *threads], self.interval)
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        async def send_with_name(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = [
+                    *message.get("headers", []),
+                    (b"x-profile-id", name.encode()),
+                ]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_name)
+        finally:
+            samples = profiler.stop()
+            profiled_threads.reset(token)
+            elapsed = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", scope.get("path", ""))
+            params = scope.get("path_params", {})
+            trip_slug = params.get("slug") or params.get("trip_slug") or "-"
+            path = self.directory / f"{name}-{_slug(route)}-{_slug(trip_slug)}.folded"
+            await asyncio.to_thread(self._write, path, samples)
+            profiled_requests_total.inc()
+            logger.info(
+                "Profiled %s %s (trip %s) in %.0f ms: %s",
+                scope.get("method"),
+                route,
+                trip_slug,
+                elapsed * 1000,
+                path,
+            )
+
+    def _write(self, path: Path, samples: Counter[str]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as fh:
+            for stack, count in samples.most_common():
+                fh.write(f"{stack} {count}\n")
@@ -0,0 +1,216 @@
+"""Admission control: per-client rate limits and concurrency caps.
+
+``RateLimitMiddleware`` gives every client a token bucket per route class
+(reads are ``GET``/``HEAD``/``OPTIONS``, everything else is a write) and
+answers ``429 Too Many Requests`` with ``Retry-After`` once it is empty.
+Buckets are tracked as a theoretical arrival time (GCRA), which behaves
+like a token bucket refilled at ``rate`` per second up to ``burst`` but
+needs only one number per key. State lives in this worker unless
+``RATE_LIMIT_BACKEND=postgres`` shares it through ``rate_limit_buckets``.
+
+``ConcurrencyLimit`` is a route dependency capping how many expensive
+requests (full trip reads, exports) run at once in this worker; beyond the
+cap they are shed with ``503 Service Unavailable``.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import Engine, create_engine, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.metrics import metrics
+from core.models import RateLimitBucket
+from core.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+rate_limited_total = metrics.counter(
+    "rate_limited_requests_total", "Requests rejected by the per-client rate limit"
+)
+shed_total = metrics.counter(
+    "shed_requests_total",
+    "Requests shed because an endpoint was at its concurrency cap",
+)
+
+
+class RateLimitStore:
+    """Bucket state kept in this process, oldest keys evicted past ``maxsize``."""
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._tat: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate: float, burst: int, now: float) -> float:
+        """Take one token; return 0 if allowed, else seconds until one is free."""
+        return self._take_local(key, rate, burst, now)
+
+    def _take_local(self, key: str, rate: float, burst: int, now: float) -> float:
+        interval = 1 / rate
+        with self._lock:
+            tat = max(self._tat.get(key, now), now) + interval
+            allowed_at = tat - burst * interval
+            if allowed_at > now:
+                return allowed_at - now
+            self._tat[key] = tat
+            self._tat.move_to_end(key)
+            while len(self._tat) > self.maxsize:
+                self._tat.popitem(last=False)
+            return 0.0
+
+
+class PostgresRateLimitStore(RateLimitStore):
+    """Buckets shared by all workers through the ``rate_limit_buckets`` table.
+
+    Uses a small pool of its own so rate limiting never competes with
+    request handlers for connections. If the database cannot be reached the
+    worker falls back to its local buckets rather than rejecting traffic.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, engine: Engine, pool_size: int = 2):
+        super().__init__()
+        self._engine = create_engine(
+            engine.url, pool_size=pool_size, max_overflow=0, pool_timeout=1
+        )
+        self._calls = 0
+
+    async def take(self, key: str, rate: float, burst: int, now: float) -> float:
+        try:
+            return await asyncio.to_thread(self._take_shared, key, rate, burst, now)
+        except Exception:
+            logger.warning("Shared rate limit store unavailable", exc_info=True)
+            return self._take_local(key, rate, burst, now)
+
+    def _take_shared(self, key: str, rate: float, burst: int, now: float) -> float:
+        interval = 1 / rate
+        bucket = RateLimitBucket.__table__
+        tat = func.greatest(bucket.c.tat, now) + interval
+        stmt = (
+            insert(bucket)
+            .values(key=key, tat=now + interval)
+            .on_conflict_do_update(
+                index_elements=[bucket.c.key],
+                set_={"tat": tat},
+                where=tat - burst * interval <= now,
+            )
+            .returning(bucket.c.tat)
+        )
+        with self._engine.begin() as conn:
+            if conn.execute(stmt).first() is not None:
+                retry_after = 0.0
+            else:
+                current = conn.scalar(select(bucket.c.tat).where(bucket.c.key == key))
+                allowed_at = (current or now) + interval - burst * interval
+                retry_after = max(allowed_at - now, 0.001)
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                # Buckets whose arrival time has passed are full again.
+                conn.execute(delete(bucket).where(bucket.c.tat < now))
+        return retry_after
+
+    def close(self) -> None:
+        self._engine.dispose()
+
+
+_store: RateLimitStore = RateLimitStore()
+
+
+def get_rate_limit_store() -> RateLimitStore:
+    return _store
+
+
+def set_rate_limit_store(store: RateLimitStore) -> None:
+    global _store
+    _store = store
+
+
+def client_id(scope: Scope, header: str) -> str:
+    if header:
+        for name, value in scope.get("headers", []):
+            if name == header:
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _too_many_requests(retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": "Rate limit exceeded"},
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, settings: Settings):
+        self.app = app
+        self.header = settings.rate_limit_client_header.lower().encode("latin-1")
+        self.limits = {
+            "read": (settings.rate_limit_reads_per_s, settings.rate_limit_read_burst),
+            "write": (
+                settings.rate_limit_writes_per_s,
+                settings.rate_limit_write_burst,
+            ),
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        route_class = "read" if scope["method"] in READ_METHODS else "write"
+        rate, burst = self.limits[route_class]
+        if rate > 0:
+            key = f"{route_class}:{client_id(scope, self.header)}"
+            store = get_rate_limit_store()
+            retry_after = await store.take(key, rate, burst, time.time())
+            if retry_after > 0:
+                rate_limited_total.inc(route_class=route_class)
+                await _too_many_requests(retry_after)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class ConcurrencyLimit:
+    """Dependency capping concurrent requests to an endpoint in this worker.
+
+    ``setting`` names the ``Settings`` field holding the cap; 0 disables it.
+    """
+
+    def __init__(self, name: str, setting: str):
+        self.name = name
+        self.setting = setting
+        self.active = 0
+
+    async def __call__(self, request: Request):
+        settings = request.app.state.settings
+        limit = getattr(settings, self.setting)
+        if limit and self.active >= limit:
+            shed_total.inc(endpoint=self.name)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, retry shortly",
+                headers={"Retry-After": str(settings.db_retry_after)},
+            )
+        # Only touched on the event loop, so no lock is needed.
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+
+
+full_trip_read_slots = ConcurrencyLimit("full_trip_read", "full_trip_read_concurrency")
+export_slots = ConcurrencyLimit("export", "export_concurrency")
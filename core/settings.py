@@ -1,12 +1,9 @@
 import os
 from dataclasses import dataclass
+from functools import lru_cache
 
 from dotenv import load_dotenv
 
-DEBUG = os.getenv("DEBUG", "True").lower() == "true"
-
-load_dotenv(".env.dev" if DEBUG else ".env.prod")
-
 
 @dataclass
 class Settings:
@@ -17,10 +14,97 @@ class Settings:
     postgres_host: str = "db"
     postgres_port: int = 5432
     postgres_db: str = "trip_expenses"
+    events_backend: str = "memory"
+    workers: int = 1
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_queue_limit: int = 100
+    db_retry_after: int = 1
+    loop_watchdog: bool = False
+    loop_block_threshold_ms: int = 100
+    profile_token: str = ""
+    profile_sample_rate: float = 0.0
+    profile_dir: str = "profiles"
+    profile_interval_ms: int = 5
+    profile_max_concurrent: int = 2
+    memtrace: bool = False
+    memtrace_threshold_mb: int = 50
+    memtrace_frames: int = 10
+    memtrace_token: str = ""
+    health_probe_interval_s: float = 5.0
+    health_probe_timeout_s: float = 2.0
+    rate_limit_backend: str = "memory"
+    rate_limit_client_header: str = ""
+    rate_limit_reads_per_s: float = 0.0
+    rate_limit_read_burst: int = 40
+    rate_limit_writes_per_s: float = 0.0
+    rate_limit_write_burst: int = 10
+    full_trip_read_concurrency: int = 16
+    export_concurrency: int = 4
+    single_flight_timeout_s: float = 10.0
+    compression_min_bytes: int = 1024
+    compression_offload_bytes: int = 65536
+    cache_fallback_ttl_s: float = 5.0
+    job_worker_concurrency: int = 2
+    job_poll_interval_s: float = 1.0
+    job_lease_s: float = 300.0
+    job_retry_backoff_s: float = 5.0
+    job_retry_backoff_max_s: float = 600.0
+    # Shared by the API and the worker; see services.job_service.
+    job_results_dir: str = "job_results"
+    job_result_ttl_s: float = 86400.0
+    idempotency_backend: str = "memory"
+    idempotency_ttl_s: float = 86400.0
 
     def __post_init__(self):
         self.debug = os.getenv("DEBUG", "True").lower() == "true"
         self.port = int(os.getenv("PORT", "8001"))
+        self.events_backend = os.getenv("EVENTS_BACKEND", "memory").lower()
+        self.workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+        self.db_pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+        self.db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        self.db_queue_limit = int(os.getenv("DB_QUEUE_LIMIT", "100"))
+        self.db_retry_after = int(os.getenv("DB_RETRY_AFTER", "1"))
+        self.loop_watchdog = os.getenv("LOOP_WATCHDOG", "False").lower() == "true"
+        self.loop_block_threshold_ms = int(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+        self.profile_token = os.getenv("PROFILE_TOKEN", "")
+        self.profile_sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.profile_dir = os.getenv("PROFILE_DIR", "profiles")
+        self.profile_interval_ms = int(os.getenv("PROFILE_INTERVAL_MS", "5"))
+        self.profile_max_concurrent = int(os.getenv("PROFILE_MAX_CONCURRENT", "2"))
+        self.memtrace = os.getenv("MEMTRACE", "False").lower() == "true"
+        self.memtrace_threshold_mb = int(os.getenv("MEMTRACE_THRESHOLD_MB", "50"))
+        self.memtrace_frames = int(os.getenv("MEMTRACE_FRAMES", "10"))
+        self.memtrace_token = os.getenv("MEMTRACE_TOKEN", "")
+        self.health_probe_interval_s = float(os.getenv("HEALTH_PROBE_INTERVAL_S", "5"))
+        self.health_probe_timeout_s = float(os.getenv("HEALTH_PROBE_TIMEOUT_S", "2"))
+        self.rate_limit_backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+        self.rate_limit_client_header = os.getenv("RATE_LIMIT_CLIENT_HEADER", "")
+        self.rate_limit_reads_per_s = float(os.getenv("RATE_LIMIT_READS_PER_S", "0"))
+        self.rate_limit_read_burst = int(os.getenv("RATE_LIMIT_READ_BURST", "40"))
+        self.rate_limit_writes_per_s = float(os.getenv("RATE_LIMIT_WRITES_PER_S", "0"))
+        self.rate_limit_write_burst = int(os.getenv("RATE_LIMIT_WRITE_BURST", "10"))
+        self.full_trip_read_concurrency = int(
+            os.getenv("FULL_TRIP_READ_CONCURRENCY", "16")
+        )
+        self.export_concurrency = int(os.getenv("EXPORT_CONCURRENCY", "4"))
+        self.single_flight_timeout_s = float(os.getenv("SINGLE_FLIGHT_TIMEOUT_S", "10"))
+        self.compression_min_bytes = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+        self.compression_offload_bytes = int(
+            os.getenv("COMPRESSION_OFFLOAD_BYTES", "65536")
+        )
+        self.cache_fallback_ttl_s = float(os.getenv("CACHE_FALLBACK_TTL_S", "5"))
+        self.job_worker_concurrency = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+        self.job_poll_interval_s = float(os.getenv("JOB_POLL_INTERVAL_S", "1"))
+        self.job_lease_s = float(os.getenv("JOB_LEASE_S", "300"))
+        self.job_retry_backoff_s = float(os.getenv("JOB_RETRY_BACKOFF_S", "5"))
+        self.job_retry_backoff_max_s = float(
+            os.getenv("JOB_RETRY_BACKOFF_MAX_S", "600")
+        )
+        self.job_results_dir = os.getenv("JOB_RESULTS_DIR", "job_results")
+        self.job_result_ttl_s = float(os.getenv("JOB_RESULT_TTL_S", "86400"))
+        self.idempotency_backend = os.getenv("IDEMPOTENCY_BACKEND", "memory").lower()
+        self.idempotency_ttl_s = float(os.getenv("IDEMPOTENCY_TTL_S", "86400"))
 
         required = [
             "POSTGRES_USERNAME",
@@ -43,5 +127,9 @@ class Settings:
         return f"postgresql+psycopg2://{self.postgres_username}:{self.postgres_password}@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
 
 
-def get_settings():
+@lru_cache
+def get_settings() -> Settings:
+    """Settings read once per process; ``get_settings.cache_clear()`` re-reads."""
+    debug = os.getenv("DEBUG", "True").lower() == "true"
+    load_dotenv(".env.dev" if debug else ".env.prod")
     return Settings()
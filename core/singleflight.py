@@ -0,0 +1,89 @@
+"""Coalescing of identical concurrent work within a worker.
+
+The first caller for a key (the leader) runs the work; callers arriving
+while it is in flight wait for the leader's result instead of repeating it.
+Errors are delivered to everyone waiting at the time and nothing is cached
+afterwards. If the leader is cancelled (client gone, shutdown), one of the
+waiters takes over rather than failing with it. Waiters give up after
+``timeout`` seconds with ``503 Service Unavailable``; the leader is never
+timed out, since the work is running on its behalf.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any, TypeVar
+
+from fastapi import HTTPException, status
+
+from core.metrics import metrics
+
+T = TypeVar("T")
+
+coalesced_total = metrics.counter(
+    "singleflight_coalesced_total",
+    "Requests served by another request's in-flight work",
+)
+timeouts_total = metrics.counter(
+    "singleflight_timeouts_total", "Coalesced requests that gave up waiting"
+)
+
+
+class SingleFlight:
+    def __init__(self, name: str, timeout: float = 10.0, retry_after: int = 1):
+        self.name = name
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._flights: dict[Hashable, asyncio.Future[Any]] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[T]],
+        timeout: float | None = None,
+    ) -> T:
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                return await self._lead(key, fn)
+
+            coalesced_total.inc(flight=self.name)
+            try:
+                return await asyncio.wait_for(
+                    asyncio.shield(flight), timeout or self.timeout
+                )
+            except TimeoutError:
+                timeouts_total.inc(flight=self.name)
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy, retry shortly",
+                    headers={"Retry-After": str(self.retry_after)},
+                ) from None
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if flight.cancelled() and task is not None and not task.cancelling():
+                    # The leader went away, not us: try again, possibly leading.
+                    continue
+                raise
+
+    async def _lead(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        flight: asyncio.Future[T] = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as exc:
+            flight.set_exception(exc)
+            # Waiters re-raise it; without any, don't log it as unretrieved.
+            flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
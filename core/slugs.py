@@ -9,6 +9,10 @@ def normalize_str(value: str) -> str:
     return value
 
 
+def normalize_search_text(value: str) -> str:
+    return " ".join(normalize_str(value).lower().split())
+
+
 def slugify_trip(title: str) -> str:
     normalized_title = normalize_str(title)
     slug = re.sub(r"[^a-zA-Z0-9]+", "-", normalized_title)
@@ -0,0 +1,116 @@
+"""Event-loop blocking detector.
+
+A heartbeat task on the loop records when it last ran; a watchdog thread
+checks the heartbeat and, if the loop has not come back within
+``threshold`` seconds, logs the loop thread's current stack together with
+the request path and any SQL statement that thread is executing. Enable
+with ``LOOP_WATCHDOG=true``; the cost is one wake-up per ``interval`` on
+each side.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from types import FrameType
+
+from sqlalchemy import Engine, event
+
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+loop_lag_seconds = metrics.histogram(
+    "event_loop_lag_seconds", "How late the event loop heartbeat ran"
+)
+loop_blocked_total = metrics.counter(
+    "event_loop_blocked_total", "Times the event loop was blocked past the threshold"
+)
+
+# Thread id -> SQL statement currently executing on that thread.
+_sql_in_flight: dict[int, str] = {}
+
+
+def _track_sql_start(conn, cursor, statement, parameters, context, executemany):
+    _sql_in_flight[threading.get_ident()] = statement
+
+
+def _track_sql_end(conn, cursor, statement, parameters, context, executemany):
+    _sql_in_flight.pop(threading.get_ident(), None)
+
+
+def _request_path(frame: FrameType | None) -> str | None:
+    while frame is not None:
+        scope = frame.f_locals.get("scope")
+        if isinstance(scope, dict) and scope.get("type") == "http":
+            route = scope.get("route")
+            return getattr(route, "path", None) or scope.get("path")
+        frame = frame.f_back
+    return None
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float = 0.1, interval: float = 0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: int | None = None
+        self._heartbeat: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopping.clear()
+        event.listen(Engine, "before_cursor_execute", _track_sql_start)
+        event.listen(Engine, "after_cursor_execute", _track_sql_end)
+        self._heartbeat = asyncio.get_running_loop().create_task(self._beat())
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+        event.remove(Engine, "before_cursor_execute", _track_sql_start)
+        event.remove(Engine, "after_cursor_execute", _track_sql_end)
+
+    async def _beat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            loop_lag_seconds.observe(max(0.0, now - expected))
+            self._last_beat = now
+
+    def _watch(self) -> None:
+        reported_beat = None
+        while not self._stopping.wait(self.interval):
+            beat = self._last_beat
+            stalled = time.monotonic() - beat
+            if stalled > self.threshold and beat != reported_beat:
+                # Report each stall once, while it is still in progress.
+                reported_beat = beat
+                self._report(stalled)
+
+    def _report(self, stalled: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        loop_blocked_total.inc()
+        logger.warning(
+            "Event loop blocked for %.0f ms (path=%s, sql=%r)\n%s",
+            stalled * 1000,
+            _request_path(frame),
+            _sql_in_flight.get(self._loop_thread_id),
+            "".join(traceback.format_stack(frame)),
+        )
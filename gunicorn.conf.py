@@ -0,0 +1,18 @@
+"""Multi-worker production server: ``gunicorn -c gunicorn.conf.py``.
+
+Needs the ``server`` extra. The master imports ``main:app`` once and forks
+the workers from it (``preload_app``), so they share the imported code and
+the built app instead of each paying for startup. Creating the app opens no
+database connections; every worker creates its own engine and pool in the
+app lifespan, after the fork.
+"""
+
+from core.settings import get_settings
+
+settings = get_settings()
+
+wsgi_app = "main:app"
+preload_app = True
+worker_class = "uvicorn_worker.UvicornWorker"
+workers = settings.workers
+bind = f"0.0.0.0:{settings.port}"
@@ -1,46 +1,202 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-
-from core.settings import get_settings
-from routers.api_v1 import api_v1_router
+import time
 
-settings = get_settings()
+_import_started = time.perf_counter()
 
-app = FastAPI(
-    title="TripBoard API",
-    version="1.0.0",
-    openapi_url="/openapi.json",
-    docs_url="/docs",
-)
+import asyncio
+import logging
+import sys
+from contextlib import asynccontextmanager
 
-origins = [
-    "*",
-]
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+from core.db import dispose_db, init_db
+from core.encoding import CompressionMiddleware, MessagePackMiddleware
+from core.events import PostgresEventBus, get_event_bus, set_event_bus
+from core.executor import QueueTimingMiddleware, init_executor, shutdown_executor
+from core.health import HealthMonitor, migration_head
+from core.idempotency import (
+    IdempotencyMiddleware,
+    IdempotencyStore,
+    PostgresIdempotencyStore,
+    get_idempotency_store,
+    set_idempotency_store,
+)
+from core.invalidation import invalidator
+from core.memtrace import MB, MemoryTraceMiddleware, MemoryTracer
+from core.profiling import ProfilingMiddleware
+from core.ratelimit import (
+    PostgresRateLimitStore,
+    RateLimitMiddleware,
+    RateLimitStore,
+    get_rate_limit_store,
+    set_rate_limit_store,
 )
+from core.settings import Settings, get_settings
+from core.watchdog import LoopWatchdog
+from routers.api_v1 import api_v1_router
+from routers.debug import router as debug_router
+from routers.health import router as health_router
+from routers.metrics import router as metrics_router
+
+logger = logging.getLogger(__name__)
 
-app.include_router(api_v1_router, prefix="/api")
+# Time spent importing main and, through it, the routers, models and
+# services; reported with the startup time so slow imports show up.
+IMPORT_MS = (time.perf_counter() - _import_started) * 1000
 
-app.openapi_tags = [
+OPENAPI_TAGS = [
     {"name": "trips", "description": "Trip management"},
     {"name": "calendars", "description": "Trip calendars"},
     {"name": "activities", "description": "Trip activities"},
     {"name": "participants", "description": "Trip participants"},
+    {"name": "exports", "description": "Streaming trip exports"},
+    {"name": "events", "description": "Trip change notifications"},
+    {"name": "search", "description": "Search across trips"},
+    {"name": "jobs", "description": "Background job status and results"},
 ]
 
 
-@app.get("/")
-async def read_root():
-    return {"message": "hello world"}
+def create_app(settings: Settings | None = None) -> FastAPI:
+    started = time.perf_counter()
+    settings = settings or get_settings()
+    tracer = None
+    if settings.memtrace:
+        tracer = MemoryTracer(
+            settings.memtrace_threshold_mb * MB, frames=settings.memtrace_frames
+        )
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Runs in each worker after it forks, so no connection is shared.
+        engine = init_db(settings)
+        init_executor(settings)
+        health = app.state.health = HealthMonitor(
+            engine,
+            await asyncio.to_thread(migration_head),
+            pool_capacity=settings.db_pool_size + settings.db_max_overflow,
+            interval=settings.health_probe_interval_s,
+            timeout=settings.health_probe_timeout_s,
+        )
+        health.start()
+        invalidator.fallback_ttl = settings.cache_fallback_ttl_s
+        if settings.events_backend == "postgres":
+            set_event_bus(PostgresEventBus(engine))
+        if settings.rate_limit_backend == "postgres":
+            set_rate_limit_store(PostgresRateLimitStore(engine))
+        if settings.idempotency_backend == "postgres":
+            set_idempotency_store(PostgresIdempotencyStore(engine))
+        event_bus = get_event_bus()
+        event_bus.start()
+        watchdog = None
+        if settings.loop_watchdog:
+            watchdog = LoopWatchdog(settings.loop_block_threshold_ms / 1000)
+            watchdog.start()
+        if tracer is not None:
+            tracer.start()
+        logger.info(
+            "Startup took %.0f ms after app creation (imports took %.0f ms)",
+            (time.perf_counter() - started) * 1000,
+            IMPORT_MS,
+        )
+        yield
+        if tracer is not None:
+            tracer.stop()
+        if watchdog is not None:
+            watchdog.stop()
+        event_bus.stop()
+        health.stop()
+        store = get_rate_limit_store()
+        if isinstance(store, PostgresRateLimitStore):
+            store.close()
+            set_rate_limit_store(RateLimitStore())
+        idempotency_store = get_idempotency_store()
+        if isinstance(idempotency_store, PostgresIdempotencyStore):
+            idempotency_store.close()
+            set_idempotency_store(IdempotencyStore())
+        shutdown_executor()
+        dispose_db()
+
+    app = FastAPI(
+        title="TripBoard API",
+        version="1.0.0",
+        openapi_url="/openapi.json",
+        docs_url="/docs",
+        lifespan=lifespan,
+    )
+    app.state.settings = settings
+
+    origins = [
+        "*",
+    ]
+
+    # Innermost, so replays get fresh CORS headers and encodings and retries
+    # still count against the rate limit.
+    app.add_middleware(IdempotencyMiddleware, settings=settings)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(
+        MessagePackMiddleware, offload_size=settings.compression_offload_bytes
+    )
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_min_bytes,
+        offload_size=settings.compression_offload_bytes,
+    )
+    app.add_middleware(QueueTimingMiddleware)
+    if settings.rate_limit_reads_per_s > 0 or settings.rate_limit_writes_per_s > 0:
+        app.add_middleware(RateLimitMiddleware, settings=settings)
+    if settings.profile_token or settings.profile_sample_rate > 0:
+        app.add_middleware(ProfilingMiddleware, settings=settings)
+    if tracer is not None:
+        app.state.memory_tracer = tracer
+        app.add_middleware(MemoryTraceMiddleware, tracer=tracer)
+
+    app.include_router(api_v1_router, prefix="/api")
+    app.include_router(metrics_router)
+    app.include_router(health_router)
+    if tracer is not None:
+        app.include_router(debug_router)
+
+    app.openapi_tags = OPENAPI_TAGS
+
+    @app.get("/")
+    async def read_root():
+        return {"message": "hello world"}
+
+    return app
+
+
+def __getattr__(name: str):
+    # ``main:app`` keeps working, but settings are only read and the app
+    # only built when it is first asked for rather than on import.
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
+    settings = get_settings()
+    if not settings.debug and settings.workers > 1:
+        # Preloads the app in gunicorn's master and forks the workers from
+        # it; see gunicorn.conf.py.
+        from gunicorn.app.wsgiapp import run
+
+        sys.argv = ["gunicorn", "--config", "gunicorn.conf.py"]
+        sys.exit(run())
+
     import uvicorn
 
-    uvicorn.run("main:app", host="0.0.0.0", port=settings.port, reload=settings.debug)
+    uvicorn.run(
+        "main:create_app",
+        factory=True,
+        host="0.0.0.0",
+        port=settings.port,
+        reload=settings.debug,
+    )
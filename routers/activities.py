@@ -1,10 +1,23 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from core.db import get_db
+from core.executor import run_db, run_db_as
+from core.fieldsets import FieldSelection, field_selection
+from core.http import (
+    is_not_modified,
+    minimal_response,
+    not_modified_response,
+    prefers_minimal,
+    validator_headers,
+)
+from core.models import Activity
+from core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from schemas.activities import ActivityCreate, ActivityOut, ActivityUpdate
+from schemas.pagination import PageOut
 from services.activity_service import (
     add_activity_to_calendar,
     add_participant_to_activity,
@@ -13,19 +26,97 @@ from services.activity_service import (
     remove_participant_from_activity,
     update_activity_by_slug,
 )
+from services.page_service import list_calendar_activities
+from services.trip_service import (
+    check_trip_precondition,
+    get_trip_version_or_404,
+    written_trip_version,
+)
 
 router = APIRouter()
 
 DBSession = Annotated[Session, Depends(get_db)]
+IfMatch = Annotated[str | None, Header()]
+Fields = Annotated[FieldSelection | None, Depends(field_selection)]
+PageSize = Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)]
+ReturnMinimal = Annotated[bool, Depends(prefers_minimal)]
+
+
+async def _written_activity(
+    request: Request,
+    response: Response,
+    trip_slug: str,
+    activity: Activity,
+    db: Session,
+    selection: FieldSelection | None,
+    minimal: bool,
+):
+    current = written_trip_version(db)
+    if minimal:
+        location = request.url_for(
+            "read_activity",
+            trip_slug=trip_slug,
+            calendar_id=activity.calendar_id,
+            activity_slug=activity.slug,
+        )
+        return minimal_response(str(location), current.etag, current.changed_at)
+    headers = validator_headers(current.etag, current.changed_at)
+    if selection is not None:
+        body = await run_db(selection.dump, activity, ActivityOut)
+        return JSONResponse(body, headers=headers)
+    response.headers.update(headers)
+    return await run_db(ActivityOut.model_validate, activity)
+
+
+@router.get(
+    "/{trip_slug}/calendars/{calendar_id}/activities",
+    response_model=PageOut[ActivityOut],
+)
+async def read_activities(
+    trip_slug: str,
+    calendar_id: int,
+    request: Request,
+    response: Response,
+    db: DBSession,
+    cursor: str | None = None,
+    limit: PageSize = DEFAULT_PAGE_SIZE,
+):
+    current = await run_db(get_trip_version_or_404, trip_slug, db)
+    if is_not_modified(request, current.etag, current.changed_at):
+        return not_modified_response(current.etag, current.changed_at)
+    page = await run_db(
+        list_calendar_activities, trip_slug, calendar_id, cursor, limit, db
+    )
+    response.headers.update(validator_headers(current.etag, current.changed_at))
+    return page
 
 
 @router.get(
     "/{trip_slug}/calendars/{calendar_id}/activities/{activity_slug}",
     response_model=ActivityOut,
 )
-async def read_activity(calendar_id: int, activity_slug: str, db: DBSession):
-    activity = get_activity_by_slug(calendar_id, activity_slug, db)
-    return activity
+async def read_activity(
+    trip_slug: str,
+    calendar_id: int,
+    activity_slug: str,
+    request: Request,
+    response: Response,
+    db: DBSession,
+    selection: Fields,
+):
+    current = await run_db(get_trip_version_or_404, trip_slug, db)
+    if is_not_modified(request, current.etag, current.changed_at):
+        return not_modified_response(current.etag, current.changed_at)
+    headers = validator_headers(current.etag, current.changed_at)
+    if selection is not None:
+        activity = await run_db(
+            get_activity_by_slug, calendar_id, activity_slug, db, selection
+        )
+        return JSONResponse(selection.dump(activity, ActivityOut), headers=headers)
+    response.headers.update(headers)
+    return await run_db_as(
+        ActivityOut, get_activity_by_slug, calendar_id, activity_slug, db
+    )
 
 
 @router.post(
@@ -35,10 +126,25 @@ async def create_activity(
     trip_slug: str,
     calendar_id: int,
     data: Annotated[ActivityCreate, Depends(ActivityCreate.as_form)],
+    request: Request,
+    response: Response,
     db: DBSession,
+    selection: Fields,
+    minimal: ReturnMinimal,
 ):
-    activity = add_activity_to_calendar(trip_slug, calendar_id, data, db)
-    return activity
+    if selection is not None:
+        selection.validate(ActivityOut)
+    activity = await run_db(
+        add_activity_to_calendar,
+        trip_slug,
+        calendar_id,
+        data,
+        db,
+        refresh=not minimal,
+    )
+    return await _written_activity(
+        request, response, trip_slug, activity, db, selection, minimal
+    )
 
 
 @router.post(
@@ -50,12 +156,26 @@ async def create_participant_in_activity(
     calendar_id: int,
     activity_slug: str,
     participant_id: int,
+    request: Request,
+    response: Response,
     db: DBSession,
+    selection: Fields,
+    minimal: ReturnMinimal,
 ):
-    activity = add_participant_to_activity(
-        trip_slug, calendar_id, activity_slug, participant_id, db
+    if selection is not None:
+        selection.validate(ActivityOut)
+    activity = await run_db(
+        add_participant_to_activity,
+        trip_slug,
+        calendar_id,
+        activity_slug,
+        participant_id,
+        db,
+        refresh=not minimal,
+    )
+    return await _written_activity(
+        request, response, trip_slug, activity, db, selection, minimal
     )
-    return activity
 
 
 @router.post(
@@ -67,12 +187,26 @@ async def delete_participant_in_activity(
     calendar_id: int,
     activity_slug: str,
     participant_id: int,
+    request: Request,
+    response: Response,
     db: DBSession,
+    selection: Fields,
+    minimal: ReturnMinimal,
 ):
-    activity = remove_participant_from_activity(
-        trip_slug, calendar_id, activity_slug, participant_id, db
+    if selection is not None:
+        selection.validate(ActivityOut)
+    activity = await run_db(
+        remove_participant_from_activity,
+        trip_slug,
+        calendar_id,
+        activity_slug,
+        participant_id,
+        db,
+        refresh=not minimal,
+    )
+    return await _written_activity(
+        request, response, trip_slug, activity, db, selection, minimal
     )
-    return activity
 
 
 @router.put(
@@ -80,17 +214,42 @@ async def delete_participant_in_activity(
     response_model=ActivityOut,
 )
 async def update_activity(
+    trip_slug: str,
     calendar_id: int,
     activity_slug: str,
     data: Annotated[ActivityUpdate, Depends(ActivityUpdate.as_form)],
+    request: Request,
+    response: Response,
     db: DBSession,
+    selection: Fields,
+    minimal: ReturnMinimal,
+    if_match: IfMatch = None,
 ):
-    activity = update_activity_by_slug(calendar_id, activity_slug, data, db)
-    return activity
+    if selection is not None:
+        selection.validate(ActivityOut)
+    await run_db(check_trip_precondition, trip_slug, if_match, db)
+    activity = await run_db(
+        update_activity_by_slug,
+        calendar_id,
+        activity_slug,
+        data,
+        db,
+        refresh=not minimal,
+    )
+    return await _written_activity(
+        request, response, trip_slug, activity, db, selection, minimal
+    )
 
 
 @router.delete(
     "/{trip_slug}/calendars/{calendar_id}/activities/{activity_slug}", status_code=204
 )
-async def delete_activity(calendar_id: int, activity_slug: str, db: DBSession):
-    delete_activity_by_slug(calendar_id, activity_slug, db)
+async def delete_activity(
+    trip_slug: str,
+    calendar_id: int,
+    activity_slug: str,
+    db: DBSession,
+    if_match: IfMatch = None,
+):
+    await run_db(check_trip_precondition, trip_slug, if_match, db)
+    await run_db(delete_activity_by_slug, calendar_id, activity_slug, db)
@@ -1,6 +1,15 @@
 from fastapi import APIRouter
 
-from routers import activities, calendars, participants, trips
+from routers import (
+    activities,
+    calendars,
+    events,
+    exports,
+    jobs,
+    participants,
+    search,
+    trips,
+)
 
 api_v1_router = APIRouter(prefix="/v1")
 
@@ -10,3 +19,7 @@ api_v1_router.include_router(activities.router, prefix="/trips", tags=["activiti
 api_v1_router.include_router(
     participants.router, prefix="/trips", tags=["participants"]
 )
+api_v1_router.include_router(exports.router, prefix="/trips", tags=["exports"])
+api_v1_router.include_router(events.router, prefix="/trips", tags=["events"])
+api_v1_router.include_router(search.router, prefix="/search", tags=["search"])
+api_v1_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
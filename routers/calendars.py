@@ -1,36 +1,156 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Request, Response, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from core.db import get_db
-from schemas.calendars import CalendarCreate, CalendarOut, CalendarUpdate
+from core.executor import run_db, run_db_as
+from core.fieldsets import FieldSelection, field_selection
+from core.http import (
+    is_not_modified,
+    minimal_response,
+    not_modified_response,
+    prefers_minimal,
+    validator_headers,
+)
+from core.models import Calendar
+from core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from schemas.calendars import (
+    CalendarCreate,
+    CalendarOut,
+    CalendarPageOut,
+    CalendarUpdate,
+)
+from schemas.pagination import PageOut
 from services.calendar_service import (
     add_calendar_to_trip,
     delete_calendar_by_id,
     get_calendar_by_id,
     update_calendar_by_id,
 )
+from services.ical_service import get_trip_calendar_feed
+from services.page_service import get_calendar_page, list_trip_calendars
+from services.trip_service import (
+    check_trip_precondition,
+    get_trip_version_or_404,
+    written_trip_version,
+)
 
 router = APIRouter()
 
 DBSession = Annotated[Session, Depends(get_db)]
+IfMatch = Annotated[str | None, Header()]
+Fields = Annotated[FieldSelection | None, Depends(field_selection)]
+PageSize = Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)]
+NestedLimit = Annotated[int | None, Query(ge=1, le=MAX_PAGE_SIZE)]
+ReturnMinimal = Annotated[bool, Depends(prefers_minimal)]
+
+
+async def _written_calendar(
+    request: Request,
+    response: Response,
+    trip_slug: str,
+    calendar: Calendar,
+    db: Session,
+    selection: FieldSelection | None,
+    minimal: bool,
+):
+    current = written_trip_version(db)
+    if minimal:
+        location = request.url_for(
+            "read_calendar", trip_slug=trip_slug, calendar_id=calendar.id
+        )
+        return minimal_response(str(location), current.etag, current.changed_at)
+    headers = validator_headers(current.etag, current.changed_at)
+    if selection is not None:
+        body = await run_db(selection.dump, calendar, CalendarOut)
+        return JSONResponse(body, headers=headers)
+    response.headers.update(headers)
+    return await run_db(CalendarOut.model_validate, calendar)
+
+
+@router.get("/{trip_slug}/calendar.ics", response_class=Response)
+async def read_calendar_feed(trip_slug: str, request: Request, db: DBSession):
+    feed = await run_db(get_trip_calendar_feed, trip_slug, db)
+    headers = {
+        **validator_headers(feed.etag, feed.last_modified),
+        "Cache-Control": "public, max-age=60",
+    }
+    if is_not_modified(request, feed.etag, feed.last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=feed.body, media_type="text/calendar; charset=utf-8", headers=headers
+    )
+
 
+@router.get("/{trip_slug}/calendars", response_model=PageOut[CalendarPageOut])
+async def read_calendars(
+    trip_slug: str,
+    request: Request,
+    response: Response,
+    db: DBSession,
+    cursor: str | None = None,
+    limit: PageSize = DEFAULT_PAGE_SIZE,
+):
+    current = await run_db(get_trip_version_or_404, trip_slug, db)
+    if is_not_modified(request, current.etag, current.changed_at):
+        return not_modified_response(current.etag, current.changed_at)
+    page = await run_db(list_trip_calendars, trip_slug, cursor, limit, db)
+    response.headers.update(validator_headers(current.etag, current.changed_at))
+    return page
 
-@router.get("/{trip_slug}/calendars/{calendar_id}", response_model=CalendarOut)
-async def read_calendar(trip_slug: str, calendar_id: int, db: DBSession):
-    calendar = get_calendar_by_id(trip_slug, calendar_id, db)
-    return calendar
+
+@router.get(
+    "/{trip_slug}/calendars/{calendar_id}",
+    response_model=CalendarOut | CalendarPageOut,
+)
+async def read_calendar(
+    trip_slug: str,
+    calendar_id: int,
+    request: Request,
+    response: Response,
+    db: DBSession,
+    selection: Fields,
+    limit: NestedLimit = None,
+):
+    current = await run_db(get_trip_version_or_404, trip_slug, db)
+    if is_not_modified(request, current.etag, current.changed_at):
+        return not_modified_response(current.etag, current.changed_at)
+    headers = validator_headers(current.etag, current.changed_at)
+    if limit is not None:
+        page = await run_db(get_calendar_page, trip_slug, calendar_id, limit, db)
+        return JSONResponse(
+            CalendarPageOut.model_validate(page).model_dump(mode="json"),
+            headers=headers,
+        )
+    if selection is not None:
+        calendar = await run_db(
+            get_calendar_by_id, trip_slug, calendar_id, db, selection
+        )
+        return JSONResponse(selection.dump(calendar, CalendarOut), headers=headers)
+    response.headers.update(headers)
+    return await run_db_as(CalendarOut, get_calendar_by_id, trip_slug, calendar_id, db)
 
 
 @router.post("/{trip_slug}/calendars", response_model=CalendarOut)
 async def create_calendar(
     trip_slug: str,
     data: Annotated[CalendarCreate, Depends(CalendarCreate.as_form)],
+    request: Request,
+    response: Response,
     db: DBSession,
+    selection: Fields,
+    minimal: ReturnMinimal,
 ):
-    calendar = add_calendar_to_trip(trip_slug, data, db)
-    return calendar
+    if selection is not None:
+        selection.validate(CalendarOut)
+    calendar = await run_db(
+        add_calendar_to_trip, trip_slug, data, db, refresh=not minimal
+    )
+    return await _written_calendar(
+        request, response, trip_slug, calendar, db, selection, minimal
+    )
 
 
 @router.put("/{trip_slug}/calendars/{calendar_id}", response_model=CalendarOut)
@@ -38,12 +158,27 @@ async def update_calendar(
     trip_slug: str,
     calendar_id: int,
     data: Annotated[CalendarUpdate, Depends(CalendarUpdate.as_form)],
+    request: Request,
+    response: Response,
     db: DBSession,
+    selection: Fields,
+    minimal: ReturnMinimal,
+    if_match: IfMatch = None,
 ):
-    calendar = update_calendar_by_id(trip_slug, calendar_id, data, db)
-    return calendar
+    if selection is not None:
+        selection.validate(CalendarOut)
+    await run_db(check_trip_precondition, trip_slug, if_match, db)
+    calendar = await run_db(
+        update_calendar_by_id, trip_slug, calendar_id, data, db, refresh=not minimal
+    )
+    return await _written_calendar(
+        request, response, trip_slug, calendar, db, selection, minimal
+    )
 
 
 @router.delete("/{trip_slug}/calendars/{calendar_id}", status_code=204)
-async def delete_calendar(trip_slug: str, calendar_id: int, db: DBSession):
-    delete_calendar_by_id(trip_slug, calendar_id, db)
+async def delete_calendar(
+    trip_slug: str, calendar_id: int, db: DBSession, if_match: IfMatch = None
+):
+    await run_db(check_trip_precondition, trip_slug, if_match, db)
+    await run_db(delete_calendar_by_id, trip_slug, calendar_id, db)
@@ -0,0 +1,42 @@
+import hmac
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+
+from core.memtrace import MemoryTracer
+
+
+def get_memory_tracer(
+    request: Request, x_debug_token: Annotated[str, Header()] = ""
+) -> MemoryTracer:
+    token = request.app.state.settings.memtrace_token
+    if not token or not hmac.compare_digest(x_debug_token, token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return request.app.state.memory_tracer
+
+
+Tracer = Annotated[MemoryTracer, Depends(get_memory_tracer)]
+
+router = APIRouter(prefix="/debug/memory", include_in_schema=False)
+
+
+@router.get("")
+async def read_memory_routes(tracer: Tracer):
+    return tracer.routes
+
+
+@router.post("/snapshots", status_code=status.HTTP_201_CREATED)
+async def take_memory_snapshot(tracer: Tracer):
+    return tracer.snapshot()
+
+
+@router.get("/snapshots/{base_id}/diff")
+async def diff_memory_snapshots(
+    base_id: int, tracer: Tracer, target: int | None = None
+):
+    diff = tracer.diff(base_id, target)
+    if diff is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found"
+        )
+    return diff
@@ -0,0 +1,51 @@
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from core.db import get_db
+from core.events import get_event_bus
+from core.executor import run_db
+from services.trip_service import get_trip_or_404
+
+router = APIRouter()
+
+DBSession = Annotated[Session, Depends(get_db)]
+
+HEARTBEAT_SECONDS = 15.0
+
+
+async def _iter_sse(request: Request, trip_id: str) -> AsyncIterator[str]:
+    # Subscribe only once the response starts streaming: a client that
+    # disconnects before then never runs this body and leaves nothing behind.
+    subscription = get_event_bus().subscribe(trip_id)
+    try:
+        yield "retry: 5000\n\n"
+        while not await request.is_disconnected():
+            try:
+                trip_event = await asyncio.wait_for(
+                    subscription.get(), timeout=HEARTBEAT_SECONDS
+                )
+            except TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {trip_event.kind}\ndata: {trip_event.to_json()}\n\n"
+    finally:
+        subscription.close()
+
+
+@router.get("/{slug}/events", response_class=StreamingResponse)
+async def stream_trip_events(slug: str, request: Request, db: DBSession):
+    trip = await run_db(get_trip_or_404, slug, db)
+    trip_id = str(trip.id)
+    # The stream may stay open for hours; give the connection back to the pool.
+    await run_db(db.close)
+
+    return StreamingResponse(
+        _iter_sse(request, trip_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
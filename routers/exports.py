@@ -0,0 +1,106 @@
+from collections.abc import Callable, Iterator
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from core.db import get_db
+from core.executor import run_db, run_db_as
+from core.models import Trip
+from core.ratelimit import export_slots
+from schemas.jobs import JobOut
+from services.export_service import (
+    iter_expense_payments_csv,
+    iter_expense_splits_csv,
+    iter_expenses_csv,
+    iter_participant_totals_csv,
+    iter_trip_ndjson,
+)
+from services.job_service import ExportFormat, enqueue_export_job
+from services.trip_service import get_trip_or_404
+
+router = APIRouter()
+
+DBSession = Annotated[Session, Depends(get_db)]
+# Streaming exports hold a slot for as long as they stream.
+ExportSlot = [Depends(export_slots)]
+
+
+async def _stream_csv_export(
+    slug: str,
+    name: str,
+    render: Callable[[Trip, Session], Iterator[str]],
+    db: Session,
+) -> StreamingResponse:
+    trip = await run_db(get_trip_or_404, slug, db)
+    return StreamingResponse(
+        render(trip, db),
+        media_type="text/csv",
+        headers={
+            "Content-Disposition": f'attachment; filename="{trip.slug}-{name}.csv"'
+        },
+    )
+
+
+@router.get(
+    "/{slug}/export.ndjson", response_class=StreamingResponse, dependencies=ExportSlot
+)
+async def export_trip_ndjson(slug: str, db: DBSession):
+    trip = await run_db(get_trip_or_404, slug, db)
+    return StreamingResponse(
+        iter_trip_ndjson(trip, db),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{trip.slug}.ndjson"'},
+    )
+
+
+@router.get(
+    "/{slug}/expenses.csv", response_class=StreamingResponse, dependencies=ExportSlot
+)
+async def export_expenses_csv(slug: str, db: DBSession):
+    return await _stream_csv_export(slug, "expenses", iter_expenses_csv, db)
+
+
+@router.get(
+    "/{slug}/expenses/payments.csv",
+    response_class=StreamingResponse,
+    dependencies=ExportSlot,
+)
+async def export_expense_payments_csv(slug: str, db: DBSession):
+    return await _stream_csv_export(slug, "payments", iter_expense_payments_csv, db)
+
+
+@router.get(
+    "/{slug}/expenses/splits.csv",
+    response_class=StreamingResponse,
+    dependencies=ExportSlot,
+)
+async def export_expense_splits_csv(slug: str, db: DBSession):
+    return await _stream_csv_export(slug, "splits", iter_expense_splits_csv, db)
+
+
+@router.get(
+    "/{slug}/expenses/totals.csv",
+    response_class=StreamingResponse,
+    dependencies=ExportSlot,
+)
+async def export_participant_totals_csv(slug: str, db: DBSession):
+    return await _stream_csv_export(slug, "totals", iter_participant_totals_csv, db)
+
+
+@router.post(
+    "/{slug}/export-jobs",
+    response_model=JobOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def create_export_job(
+    slug: str,
+    export_format: Annotated[ExportFormat, Query(alias="format")],
+    response: Response,
+    db: DBSession,
+):
+    # The worker renders the export; poll the job and fetch its result.
+    job = await run_db_as(JobOut, enqueue_export_job, slug, export_format, db)
+    response.headers["Location"] = f"/api/v1/jobs/{job.id}"
+    return job
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Request, status
+from fastapi.responses import JSONResponse
+
+router = APIRouter(prefix="/health", include_in_schema=False)
+
+
+@router.get("/live")
+async def read_liveness():
+    # Answered by the event loop alone: if this responds, the worker is alive.
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def read_readiness(request: Request):
+    ready, checks = request.app.state.health.readiness()
+    return JSONResponse(
+        {"status": "ready" if ready else "unavailable", "checks": checks},
+        status_code=(
+            status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+    )
@@ -0,0 +1,29 @@
+import uuid
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from core.db import get_db
+from core.executor import run_db, run_db_as
+from schemas.jobs import JobOut
+from services.job_service import get_job_or_404, get_job_result_file
+
+router = APIRouter()
+
+DBSession = Annotated[Session, Depends(get_db)]
+
+
+@router.get("/{job_id}", response_model=JobOut)
+async def read_job(job_id: uuid.UUID, db: DBSession):
+    return await run_db_as(JobOut, get_job_or_404, job_id, db)
+
+
+@router.get("/{job_id}/result", response_class=FileResponse)
+async def read_job_result(job_id: uuid.UUID, request: Request, db: DBSession):
+    results_dir = request.app.state.settings.job_results_dir
+    path, result = await run_db(get_job_result_file, job_id, results_dir, db)
+    return FileResponse(
+        path, media_type=result.get("media_type"), filename=result.get("filename")
+    )
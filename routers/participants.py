@@ -1,36 +1,109 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Request, Response
 from sqlalchemy.orm import Session
 
 from core.db import get_db
+from core.executor import run_db, run_db_as
+from core.http import (
+    is_not_modified,
+    minimal_response,
+    not_modified_response,
+    prefers_minimal,
+    validator_headers,
+)
+from core.models import Participant
+from core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from schemas.pagination import PageOut
 from schemas.participants import ParticipantCreate, ParticipantOut, ParticipantUpdate
+from services.page_service import list_trip_participants
 from services.participant_service import (
     add_participant_to_trip,
     delete_participant_by_id,
     get_participant_by_id,
     update_participant_by_id,
 )
+from services.trip_service import (
+    check_trip_precondition,
+    get_trip_version_or_404,
+    written_trip_version,
+)
 
 router = APIRouter()
 
 DBSession = Annotated[Session, Depends(get_db)]
+IfMatch = Annotated[str | None, Header()]
+PageSize = Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)]
+ReturnMinimal = Annotated[bool, Depends(prefers_minimal)]
+
+
+async def _written_participant(
+    request: Request,
+    response: Response,
+    trip_slug: str,
+    participant: Participant,
+    db: Session,
+    minimal: bool,
+):
+    current = written_trip_version(db)
+    if minimal:
+        location = request.url_for(
+            "read_participant", trip_slug=trip_slug, participant_id=participant.id
+        )
+        return minimal_response(str(location), current.etag, current.changed_at)
+    response.headers.update(validator_headers(current.etag, current.changed_at))
+    return await run_db(ParticipantOut.model_validate, participant)
+
+
+@router.get("/{trip_slug}/participants", response_model=PageOut[ParticipantOut])
+async def read_participants(
+    trip_slug: str,
+    request: Request,
+    response: Response,
+    db: DBSession,
+    cursor: str | None = None,
+    limit: PageSize = DEFAULT_PAGE_SIZE,
+):
+    current = await run_db(get_trip_version_or_404, trip_slug, db)
+    if is_not_modified(request, current.etag, current.changed_at):
+        return not_modified_response(current.etag, current.changed_at)
+    page = await run_db(list_trip_participants, trip_slug, cursor, limit, db)
+    response.headers.update(validator_headers(current.etag, current.changed_at))
+    return page
 
 
 @router.get("/{trip_slug}/participants/{participant_id}", response_model=ParticipantOut)
-async def read_participant(trip_slug: str, participant_id: int, db: DBSession):
-    participant = get_participant_by_id(trip_slug, participant_id, db)
-    return participant
+async def read_participant(
+    trip_slug: str,
+    participant_id: int,
+    request: Request,
+    response: Response,
+    db: DBSession,
+):
+    current = await run_db(get_trip_version_or_404, trip_slug, db)
+    if is_not_modified(request, current.etag, current.changed_at):
+        return not_modified_response(current.etag, current.changed_at)
+    response.headers.update(validator_headers(current.etag, current.changed_at))
+    return await run_db_as(
+        ParticipantOut, get_participant_by_id, trip_slug, participant_id, db
+    )
 
 
 @router.post("/{trip_slug}/participants", response_model=ParticipantOut)
 async def create_participant(
     trip_slug: str,
     data: Annotated[ParticipantCreate, Depends(ParticipantCreate.as_form)],
+    request: Request,
+    response: Response,
     db: DBSession,
+    minimal: ReturnMinimal,
 ):
-    participant = add_participant_to_trip(trip_slug, data, db)
-    return participant
+    participant = await run_db(
+        add_participant_to_trip, trip_slug, data, db, refresh=not minimal
+    )
+    return await _written_participant(
+        request, response, trip_slug, participant, db, minimal
+    )
 
 
 @router.put("/{trip_slug}/participants/{participant_id}", response_model=ParticipantOut)
@@ -38,12 +111,29 @@ async def update_participant(
     trip_slug: str,
     participant_id: int,
     data: Annotated[ParticipantUpdate, Depends(ParticipantUpdate.as_form)],
+    request: Request,
+    response: Response,
     db: DBSession,
+    minimal: ReturnMinimal,
+    if_match: IfMatch = None,
 ):
-    participant = update_participant_by_id(trip_slug, participant_id, data, db)
-    return participant
+    await run_db(check_trip_precondition, trip_slug, if_match, db)
+    participant = await run_db(
+        update_participant_by_id,
+        trip_slug,
+        participant_id,
+        data,
+        db,
+        refresh=not minimal,
+    )
+    return await _written_participant(
+        request, response, trip_slug, participant, db, minimal
+    )
 
 
 @router.delete("/{trip_slug}/participants/{participant_id}", status_code=204)
-async def delete_participant(trip_slug: str, participant_id: int, db: DBSession):
-    delete_participant_by_id(trip_slug, participant_id, db)
+async def delete_participant(
+    trip_slug: str, participant_id: int, db: DBSession, if_match: IfMatch = None
+):
+    await run_db(check_trip_precondition, trip_slug, if_match, db)
+    await run_db(delete_participant_by_id, trip_slug, participant_id, db)
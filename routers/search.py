@@ -0,0 +1,23 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from core.db import get_db
+from core.executor import run_db
+from schemas.search import SearchResultOut
+from services.search_service import DEFAULT_SEARCH_LIMIT, search
+
+router = APIRouter()
+
+DBSession = Annotated[Session, Depends(get_db)]
+
+
+@router.get("", response_model=list[SearchResultOut])
+async def read_search(
+    db: DBSession,
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    limit: Annotated[int, Query(ge=1, le=100)] = DEFAULT_SEARCH_LIMIT,
+):
+    results = await run_db(search, q, db, limit)
+    return results
@@ -1,58 +1,169 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from core.db import get_db
-from schemas.trips import TripCreate, TripOut, TripUpdate
+from core.executor import run_db, run_db_as
+from core.fieldsets import FieldSelection, field_selection
+from core.http import (
+    is_not_modified,
+    minimal_response,
+    not_modified_response,
+    prefers_minimal,
+    validator_headers,
+)
+from core.models import Trip
+from core.pagination import MAX_PAGE_SIZE
+from core.ratelimit import full_trip_read_slots
+from core.singleflight import SingleFlight
+from schemas.changes import TripChangesOut
+from schemas.trips import TripCreate, TripOut, TripPageOut, TripUpdate
+from services.document_service import get_trip_document
+from services.page_service import get_trip_page
+from services.sync_service import get_trip_changes
+from services.trip_json_service import get_all_trips_json
 from services.trip_service import (
+    check_trip_precondition,
     delete_trip_by_slug,
     get_active_trip,
     get_all_trips,
     get_trip_by_slug,
+    get_trip_version_or_404,
     insert_trip,
     update_trip_by_slug,
+    written_trip_version,
 )
 
 router = APIRouter()
 
 DBSession = Annotated[Session, Depends(get_db)]
+IfMatch = Annotated[str | None, Header()]
+Fields = Annotated[FieldSelection | None, Depends(field_selection)]
+NestedLimit = Annotated[int | None, Query(ge=1, le=MAX_PAGE_SIZE)]
+ReturnMinimal = Annotated[bool, Depends(prefers_minimal)]
 
-
-@router.get("/", response_model=list[TripOut])
-async def read_trips(db: DBSession):
-    trips = get_all_trips(db)
-    return trips
+# Concurrent reads of the same trip version share one document load.
+trip_documents = SingleFlight("trip_document")
 
 
-@router.get("/{slug}", response_model=TripOut)
-async def read_trip(slug: str, db: DBSession):
-    trip = get_trip_by_slug(slug, db)
-    return trip
+@router.get("/", response_model=list[TripOut])
+async def read_trips(db: DBSession, selection: Fields):
+    if selection is not None:
+        trips = await run_db(get_all_trips, db, selection)
+        return JSONResponse([selection.dump(trip, TripOut) for trip in trips])
+    body = await run_db(get_all_trips_json, db)
+    return Response(content=body, media_type="application/json")
+
+
+@router.get(
+    "/{slug}",
+    response_model=TripOut | TripPageOut,
+    dependencies=[Depends(full_trip_read_slots)],
+)
+async def read_trip(
+    slug: str,
+    request: Request,
+    db: DBSession,
+    selection: Fields,
+    limit: NestedLimit = None,
+):
+    current = await run_db(get_trip_version_or_404, slug, db)
+    if is_not_modified(request, current.etag, current.changed_at):
+        return not_modified_response(current.etag, current.changed_at)
+    if limit is not None:
+        # Nested collections become pages continued through the
+        # sub-collection routes.
+        page = TripPageOut.model_validate(await run_db(get_trip_page, slug, limit, db))
+        return JSONResponse(
+            page.model_dump(mode="json"),
+            headers=validator_headers(current.etag, current.changed_at),
+        )
+    if selection is not None:
+        trip = await run_db(get_trip_by_slug, slug, db, selection)
+        return JSONResponse(
+            selection.dump(trip, TripOut),
+            headers=validator_headers(current.etag, current.changed_at),
+        )
+    document = await trip_documents.do(
+        current.etag,
+        lambda: run_db(get_trip_document, current, db),
+        timeout=request.app.state.settings.single_flight_timeout_s,
+    )
+    return Response(
+        content=document.body,
+        media_type="application/json",
+        headers=validator_headers(document.version.etag, document.version.changed_at),
+    )
+
+
+@router.get("/{slug}/changes", response_model=TripChangesOut)
+async def read_trip_changes(slug: str, db: DBSession, since: str | None = None):
+    changes = await run_db(get_trip_changes, slug, since, db)
+    return changes
 
 
 @router.get("/meta/active", response_model=TripOut | None)
 async def read_active_trip(db: DBSession):
     print("inside route")
-    return get_active_trip(db)
+    return await run_db_as(TripOut, get_active_trip, db)
+
+
+async def _written_trip(
+    request: Request,
+    response: Response,
+    trip: Trip,
+    db: Session,
+    selection: FieldSelection | None,
+    minimal: bool,
+):
+    current = written_trip_version(db)
+    if minimal:
+        location = request.url_for("read_trip", slug=trip.slug)
+        return minimal_response(str(location), current.etag, current.changed_at)
+    headers = validator_headers(current.etag, current.changed_at)
+    if selection is not None:
+        body = await run_db(selection.dump, trip, TripOut)
+        return JSONResponse(body, headers=headers)
+    response.headers.update(headers)
+    return await run_db(TripOut.model_validate, trip)
 
 
 @router.post("/", response_model=TripOut)
 async def create_trip(
-    data: Annotated[TripCreate, Depends(TripCreate.as_form)], db: DBSession
+    data: Annotated[TripCreate, Depends(TripCreate.as_form)],
+    request: Request,
+    response: Response,
+    db: DBSession,
+    selection: Fields,
+    minimal: ReturnMinimal,
 ):
-    trip = insert_trip(data, db)
-    return trip
+    if selection is not None:
+        selection.validate(TripOut)
+    trip = await run_db(insert_trip, data, db, refresh=not minimal)
+    return await _written_trip(request, response, trip, db, selection, minimal)
 
 
 @router.put("/{slug}", response_model=TripOut)
 async def update_trip(
-    slug: str, data: Annotated[TripUpdate, Depends(TripUpdate.as_form)], db: DBSession
+    slug: str,
+    data: Annotated[TripUpdate, Depends(TripUpdate.as_form)],
+    request: Request,
+    response: Response,
+    db: DBSession,
+    selection: Fields,
+    minimal: ReturnMinimal,
+    if_match: IfMatch = None,
 ):
-    trip = update_trip_by_slug(slug, data, db)
-    return trip
+    if selection is not None:
+        selection.validate(TripOut)
+    await run_db(check_trip_precondition, slug, if_match, db)
+    trip = await run_db(update_trip_by_slug, slug, data, db, refresh=not minimal)
+    return await _written_trip(request, response, trip, db, selection, minimal)
 
 
 @router.delete("/{slug}", status_code=204)
-async def delete_trip(slug: str, db: DBSession):
-    delete_trip_by_slug(slug, db)
+async def delete_trip(slug: str, db: DBSession, if_match: IfMatch = None):
+    await run_db(check_trip_precondition, slug, if_match, db)
+    await run_db(delete_trip_by_slug, slug, db)
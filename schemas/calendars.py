@@ -4,6 +4,7 @@ from fastapi import Form
 from pydantic import BaseModel, ConfigDict, field_serializer
 
 from schemas.activities import ActivityOut
+from schemas.pagination import PageOut
 
 
 class CalendarOut(BaseModel):
@@ -22,6 +23,10 @@ class CalendarOut(BaseModel):
         return v.astimezone().strftime("%Y-%m-%d %H:%M")
 
 
+class CalendarPageOut(CalendarOut):
+    activities: PageOut[ActivityOut]
+
+
 class CalendarCreate(BaseModel):
     dt: date
 
@@ -0,0 +1,74 @@
+import uuid
+from datetime import date, datetime
+
+from pydantic import BaseModel, ConfigDict, field_serializer
+
+from schemas.participants import ParticipantOut
+
+
+class TripChangeOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    title: str
+    slug: str
+    is_active: bool
+    created_at: datetime
+    updated_at: datetime | None = None
+
+    @field_serializer("created_at", "updated_at")
+    def serialize_dt(self, v: datetime | None, info) -> str | None:
+        if v is None:
+            return None
+        return v.astimezone().strftime("%Y-%m-%d %H:%M")
+
+
+class CalendarChangeOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    dt: date
+    created_at: datetime
+    updated_at: datetime | None = None
+
+    @field_serializer("created_at", "updated_at")
+    def serialize_dt(self, v: datetime | None, info) -> str | None:
+        if v is None:
+            return None
+        return v.astimezone().strftime("%Y-%m-%d %H:%M")
+
+
+class ActivityChangeOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: uuid.UUID
+    calendar_id: int
+    title: str
+    slug: str
+    participant_ids: list[int]
+    created_at: datetime
+    updated_at: datetime | None = None
+
+    @field_serializer("created_at", "updated_at")
+    def serialize_dt(self, v: datetime | None, info) -> str | None:
+        if v is None:
+            return None
+        return v.astimezone().strftime("%Y-%m-%d %H:%M")
+
+
+class TombstoneOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    entity: str
+    entity_id: str
+
+
+class TripChangesOut(BaseModel):
+    cursor: str
+    # True when the client's cursor was too old (or absent) and it must
+    # replace its local copy instead of merging.
+    reset: bool
+    trip: TripChangeOut | None = None
+    calendars: list[CalendarChangeOut]
+    activities: list[ActivityChangeOut]
+    participants: list[ParticipantOut]
+    deleted: list[TombstoneOut]
@@ -0,0 +1,36 @@
+import uuid
+from datetime import datetime
+from typing import Any
+
+from pydantic import BaseModel, ConfigDict, field_serializer
+
+
+class JobOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: uuid.UUID
+    kind: str
+    status: str
+    attempts: int
+    max_attempts: int
+    progress: float
+    progress_message: str | None = None
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    run_at: datetime
+    created_at: datetime
+    updated_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    @field_serializer("result")
+    def serialize_result(self, v: dict[str, Any] | None, info) -> dict | None:
+        # Where the worker stored a result file is not the client's business.
+        if v is None:
+            return None
+        return {key: value for key, value in v.items() if key != "path"}
+
+    @field_serializer("run_at", "created_at", "updated_at", "finished_at")
+    def serialize_dt(self, v: datetime | None, info) -> str | None:
+        if v is None:
+            return None
+        return v.astimezone().strftime("%Y-%m-%d %H:%M")
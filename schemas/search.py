@@ -0,0 +1,13 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class SearchResultOut(BaseModel):
+    kind: Literal["trip", "activity", "participant"]
+    title: str
+    trip_slug: str
+    slug: str | None = None
+    calendar_id: int | None = None
+    participant_id: int | None = None
+    score: float
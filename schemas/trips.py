@@ -3,7 +3,8 @@ from datetime import datetime
 from fastapi import Form
 from pydantic import BaseModel, ConfigDict, field_serializer
 
-from schemas.calendars import CalendarOut
+from schemas.calendars import CalendarOut, CalendarPageOut
+from schemas.pagination import PageOut
 from schemas.participants import ParticipantOut
 
 
@@ -25,6 +26,11 @@ class TripOut(BaseModel):
         return v.astimezone().strftime("%Y-%m-%d %H:%M")
 
 
+class TripPageOut(TripOut):
+    calendars: PageOut[CalendarPageOut]
+    participants: PageOut[ParticipantOut]
+
+
 class TripCreate(BaseModel):
     title: str
     is_active: bool = False
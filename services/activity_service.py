@@ -1,20 +1,27 @@
+from collections.abc import Sequence
 from datetime import datetime, timezone
 
 from fastapi import HTTPException, status
-from sqlalchemy import func
+from sqlalchemy import delete, func, insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from core.models import Activity, Calendar, Participant
+from core.fieldsets import FieldSelection
+from core.models import Activity, Calendar, Participant, activity_participant
 from core.slugs import slugify_activity
-from schemas.activities import ActivityCreate, ActivityUpdate
+from schemas.activities import ActivityCreate, ActivityOut, ActivityUpdate
 from services.calendar_service import get_calendar_or_404
 from services.participant_service import get_participant_or_404
+from services.sync_service import record_tombstones
+from services.trip_service import record_trip_change
 
 
-def get_activity_or_404(calendar_id: int, activity_slug: str, db: Session) -> Activity:
+def get_activity_or_404(
+    calendar_id: int, activity_slug: str, db: Session, options: Sequence = ()
+) -> Activity:
     activity = (
         db.query(Activity)
+        .options(*options)
         .filter(
             Activity.slug == activity_slug,
             Activity.calendar.has(Calendar.id == calendar_id),
@@ -29,12 +36,24 @@ def get_activity_or_404(calendar_id: int, activity_slug: str, db: Session) -> Ac
     return activity
 
 
-def get_activity_by_slug(calendar_id: int, activity_slug: str, db: Session):
-    return get_activity_or_404(calendar_id, activity_slug, db)
+def get_activity_by_slug(
+    calendar_id: int,
+    activity_slug: str,
+    db: Session,
+    selection: FieldSelection | None = None,
+):
+    if selection is None:
+        return get_activity_or_404(calendar_id, activity_slug, db)
+    options = selection.loader_options(Activity, ActivityOut)
+    return get_activity_or_404(calendar_id, activity_slug, db, options)
 
 
 def add_activity_to_calendar(
-    trip_slug: str, calendar_id: int, data: ActivityCreate, db: Session
+    trip_slug: str,
+    calendar_id: int,
+    data: ActivityCreate,
+    db: Session,
+    refresh: bool = True,
 ) -> Activity:
     calendar = get_calendar_or_404(trip_slug, calendar_id, db)
     slug = slugify_activity(data.title)
@@ -58,6 +77,15 @@ def add_activity_to_calendar(
 
     db.add(activity)
     try:
+        db.flush()
+        record_trip_change(
+            db,
+            calendar.trip_id,
+            trip_slug,
+            "activity.created",
+            calendar_id=calendar.id,
+            activity_slug=activity.slug,
+        )
         db.commit()
     except IntegrityError:
         db.rollback()
@@ -65,7 +93,8 @@ def add_activity_to_calendar(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Activity with this slug already exists",
         )
-    db.refresh(activity)
+    if refresh:
+        db.refresh(activity)
     return activity
 
 
@@ -75,6 +104,7 @@ def add_participant_to_activity(
     activity_slug: str,
     participant_id: int,
     db: Session,
+    refresh: bool = True,
 ) -> Activity:
     calendar = get_calendar_or_404(trip_slug, calendar_id, db)
     participant = get_participant_or_404(trip_slug, participant_id, db)
@@ -93,22 +123,33 @@ def add_participant_to_activity(
             detail="Activity not found",
         )
 
-    if any(p.id == participant.id for p in activity.participants):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Participant already exists in the activity",
-        )
-    activity.participants.append(participant)
-    activity.updated_at = datetime.now(tz=timezone.utc)
+    # Written through the association table, so the activity's participant
+    # list is never loaded; the primary key rejects duplicates.
     try:
-        db.commit()
+        db.execute(
+            insert(activity_participant).values(
+                activity_id=activity.id, participant_id=participant.id
+            )
+        )
     except IntegrityError:
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Participant already exists in the activity",
         )
-    db.refresh(activity)
+    activity.updated_at = datetime.now(tz=timezone.utc)
+    record_trip_change(
+        db,
+        calendar.trip_id,
+        trip_slug,
+        "activity.participant_added",
+        calendar_id=calendar.id,
+        activity_slug=activity.slug,
+        participant_id=participant.id,
+    )
+    db.commit()
+    if refresh:
+        db.refresh(activity)
     return activity
 
 
@@ -118,6 +159,7 @@ def remove_participant_from_activity(
     activity_slug: str,
     participant_id: int,
     db: Session,
+    refresh: bool = True,
 ) -> Activity:
     calendar = get_calendar_or_404(trip_slug, calendar_id, db)
     participant = get_participant_or_404(trip_slug, participant_id, db)
@@ -136,8 +178,22 @@ def remove_participant_from_activity(
             detail="Participant is already not in the activity",
         )
 
-    activity.participants.remove(participant)
+    db.execute(
+        delete(activity_participant).where(
+            activity_participant.c.activity_id == activity.id,
+            activity_participant.c.participant_id == participant.id,
+        )
+    )
     activity.updated_at = datetime.now(tz=timezone.utc)
+    record_trip_change(
+        db,
+        calendar.trip_id,
+        trip_slug,
+        "activity.participant_removed",
+        calendar_id=calendar.id,
+        activity_slug=activity.slug,
+        participant_id=participant.id,
+    )
     try:
         db.commit()
     except IntegrityError:
@@ -146,24 +202,50 @@ def remove_participant_from_activity(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Something went wrong while trying to remove the participant from the activity",
         )
-    db.refresh(activity)
+    if refresh:
+        db.refresh(activity)
     return activity
 
 
 def update_activity_by_slug(
-    calendar_id: int, slug: str, data: ActivityUpdate, db: Session
+    calendar_id: int,
+    slug: str,
+    data: ActivityUpdate,
+    db: Session,
+    refresh: bool = True,
 ) -> Activity:
     activity = get_activity_or_404(calendar_id, slug, db)
+    trip = activity.calendar.trip
     activity.title = data.title
     activity.slug = slugify_activity(data.title)
     activity.updated_at = datetime.now(tz=timezone.utc)
+    record_trip_change(
+        db,
+        trip.id,
+        trip.slug,
+        "activity.updated",
+        calendar_id=calendar_id,
+        activity_slug=activity.slug,
+        previous_activity_slug=slug,
+    )
     db.commit()
-    db.refresh(activity)
+    if refresh:
+        db.refresh(activity)
     return activity
 
 
 def delete_activity_by_slug(calendar_id: int, slug: str, db: Session) -> None:
     activity = get_activity_or_404(calendar_id, slug, db)
+    trip = activity.calendar.trip
+    record_trip_change(
+        db,
+        trip.id,
+        trip.slug,
+        "activity.deleted",
+        calendar_id=calendar_id,
+        activity_slug=slug,
+    )
+    record_tombstones(trip.id, "activity", [activity.id], db)
 
-    db.delete(activity)
+    db.execute(delete(Activity).where(Activity.id == activity.id))
     db.commit()
@@ -1,18 +1,24 @@
+from collections.abc import Sequence
 from datetime import datetime, timezone
 
 from fastapi import HTTPException, status
-from sqlalchemy import func
+from sqlalchemy import delete, func, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from core.models import Calendar, Trip
-from schemas.calendars import CalendarCreate, CalendarUpdate
-from services.trip_service import get_trip_or_404
+from core.fieldsets import FieldSelection
+from core.models import Activity, Calendar, Trip
+from schemas.calendars import CalendarCreate, CalendarOut, CalendarUpdate
+from services.sync_service import record_tombstones
+from services.trip_service import get_trip_or_404, record_trip_change
 
 
-def get_calendar_or_404(trip_slug: str, id: int, db: Session) -> Calendar:
+def get_calendar_or_404(
+    trip_slug: str, id: int, db: Session, options: Sequence = ()
+) -> Calendar:
     calendar = (
         db.query(Calendar)
+        .options(*options)
         .filter(Calendar.id == id, Calendar.trip.has(Trip.slug == trip_slug))
         .first()
     )
@@ -24,11 +30,18 @@ def get_calendar_or_404(trip_slug: str, id: int, db: Session) -> Calendar:
     return calendar
 
 
-def get_calendar_by_id(trip_slug: str, id: int, db: Session):
-    return get_calendar_or_404(trip_slug, id, db)
+def get_calendar_by_id(
+    trip_slug: str, id: int, db: Session, selection: FieldSelection | None = None
+):
+    if selection is None:
+        return get_calendar_or_404(trip_slug, id, db)
+    options = selection.loader_options(Calendar, CalendarOut)
+    return get_calendar_or_404(trip_slug, id, db, options)
 
 
-def add_calendar_to_trip(trip_slug: str, data: CalendarCreate, db: Session) -> Calendar:
+def add_calendar_to_trip(
+    trip_slug: str, data: CalendarCreate, db: Session, refresh: bool = True
+) -> Calendar:
     trip = get_trip_or_404(trip_slug, db)
     existing = (
         db.query(Calendar)
@@ -47,6 +60,10 @@ def add_calendar_to_trip(trip_slug: str, data: CalendarCreate, db: Session) -> C
     db.add(calendar)
 
     try:
+        db.flush()
+        record_trip_change(
+            db, trip.id, trip_slug, "calendar.created", calendar_id=calendar.id
+        )
         db.commit()
     except IntegrityError:
         db.rollback()
@@ -54,24 +71,39 @@ def add_calendar_to_trip(trip_slug: str, data: CalendarCreate, db: Session) -> C
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Calendar with the same date already exists in this trip",
         )
-    db.refresh(calendar)
+    if refresh:
+        db.refresh(calendar)
     return calendar
 
 
 def update_calendar_by_id(
-    trip_slug: str, id: int, data: CalendarUpdate, db: Session
+    trip_slug: str, id: int, data: CalendarUpdate, db: Session, refresh: bool = True
 ) -> Calendar:
     calendar = get_calendar_or_404(trip_slug, id, db)
 
     calendar.dt = data.dt
     calendar.updated_at = datetime.now(tz=timezone.utc)
+    record_trip_change(
+        db, calendar.trip_id, trip_slug, "calendar.updated", calendar_id=calendar.id
+    )
     db.commit()
-    db.refresh(calendar)
+    if refresh:
+        db.refresh(calendar)
     return calendar
 
 
 def delete_calendar_by_id(trip_slug: str, id: int, db: Session) -> None:
     calendar = get_calendar_or_404(trip_slug, id, db)
 
-    db.delete(calendar)
+    record_trip_change(
+        db, calendar.trip_id, trip_slug, "calendar.deleted", calendar_id=calendar.id
+    )
+    record_tombstones(calendar.trip_id, "calendar", [calendar.id], db)
+    record_tombstones(
+        calendar.trip_id,
+        "activity",
+        db.scalars(select(Activity.id).where(Activity.calendar_id == calendar.id)),
+        db,
+    )
+    db.execute(delete(Calendar).where(Calendar.id == calendar.id))
     db.commit()
@@ -0,0 +1,171 @@
+"""Materialized ``TripOut`` documents.
+
+Each trip's ``TripOut`` JSON, rendered in the database by
+``services.trip_json_service``, is stored in ``trip_documents`` together
+with the trip version it was rendered from. Every write bumps the trip
+version (see ``record_trip_change``) and re-renders the document just
+before its transaction commits, so reads never write. A read that finds no
+document for the current version (a trip written before documents
+existed) renders one without storing it.
+
+Run ``python -m services.document_service rebuild`` to pre-render all
+trips (``--background`` hands it to the job worker) and
+``python -m services.document_service check`` to detect documents that
+disagree with the normalized tables.
+"""
+
+import argparse
+import sys
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from core.models import Trip, TripDocument
+from services.trip_json_service import render_trip_json, trip_json_query
+from services.trip_service import CHANGED_TRIPS_KEY, TripVersion
+
+
+@dataclass(frozen=True)
+class RenderedTrip:
+    body: str
+    version: TripVersion
+
+
+@dataclass(frozen=True)
+class DocumentDrift:
+    slug: str
+    state: str  # "missing", "stale" or "drifted"
+
+
+def store_trip_document(body: str, version: TripVersion, db: Session) -> None:
+    values = {
+        "trip_id": version.trip_id,
+        "version": version.version,
+        "body": body,
+        "built_at": datetime.now(timezone.utc),
+    }
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(TripDocument).values(**values)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[TripDocument.trip_id],
+                set_={
+                    "version": stmt.excluded.version,
+                    "body": stmt.excluded.body,
+                    "built_at": stmt.excluded.built_at,
+                },
+                # A slower concurrent rebuild must not overwrite a newer one.
+                where=TripDocument.version <= stmt.excluded.version,
+            )
+        )
+    else:
+        db.merge(TripDocument(**values))
+
+
+def get_trip_document(current: TripVersion, db: Session) -> RenderedTrip:
+    body = db.scalar(
+        select(TripDocument.body).where(
+            TripDocument.trip_id == current.trip_id,
+            TripDocument.version == current.version,
+        )
+    )
+    if body is not None:
+        return RenderedTrip(body, current)
+    return RenderedTrip(*render_trip_json(current.trip_id, db))
+
+
+@event.listens_for(Session, "before_commit")
+def _store_changed_documents(session: Session) -> None:
+    trip_ids = session.info.pop(CHANGED_TRIPS_KEY, None)
+    if not trip_ids:
+        return
+    session.flush()
+    # Deleted trips simply have no row left to render.
+    for row in session.execute(trip_json_query(session, Trip.id.in_(trip_ids))):
+        store_trip_document(
+            row.body, TripVersion(row.id, row.version, row.changed_at), session
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_trips(session: Session) -> None:
+    session.info.pop(CHANGED_TRIPS_KEY, None)
+
+
+def rebuild_trip_documents(
+    db: Session, progress: Callable[[int], None] | None = None
+) -> int:
+    count = 0
+    for trip_id in db.scalars(select(Trip.id)).all():
+        store_trip_document(*render_trip_json(trip_id, db), db)
+        db.commit()
+        count += 1
+        if progress is not None:
+            progress(count)
+    return count
+
+
+def check_trip_documents(db: Session, repair: bool = False) -> list[DocumentDrift]:
+    problems = []
+    for trip_id, slug in db.execute(select(Trip.id, Trip.slug)).all():
+        body, version = render_trip_json(trip_id, db)
+        stored = db.get(TripDocument, trip_id)
+        if stored is None:
+            state = "missing"
+        elif stored.version != version.version:
+            state = "stale"
+        elif stored.body != body:
+            state = "drifted"
+        else:
+            state = None
+
+        if state is not None:
+            problems.append(DocumentDrift(slug, state))
+            if repair:
+                store_trip_document(body, version, db)
+                db.commit()
+        db.expunge_all()
+    return problems
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage materialized trip documents")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild", help="re-render every trip document")
+    rebuild.add_argument(
+        "--background", action="store_true", help="queue a job for the worker instead"
+    )
+    check = commands.add_parser(
+        "check", help="compare stored documents with the normalized tables"
+    )
+    check.add_argument("--repair", action="store_true", help="rewrite bad documents")
+    args = parser.parse_args(argv)
+
+    from core.db import get_session_factory
+
+    with get_session_factory()() as db:
+        if args.command == "rebuild" and args.background:
+            from services.job_service import enqueue_document_rebuild
+
+            print(f"Queued job {enqueue_document_rebuild(db).id}")
+            return 0
+        if args.command == "rebuild":
+            print(f"Rebuilt {rebuild_trip_documents(db)} trip documents")
+            return 0
+
+        problems = check_trip_documents(db, repair=args.repair)
+        for problem in problems:
+            print(f"{problem.state}: {problem.slug}")
+        # Missing and stale documents are rendered on read (and stored by the
+        # next write); drift means the tables changed without a version bump.
+        return 1 if any(p.state == "drifted" for p in problems) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+import csv
+import io
+import json
+import uuid
+from collections.abc import Callable, Iterator
+from datetime import date, datetime
+from typing import Any
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.orm import Session
+
+from core.models import (
+    Activity,
+    Calendar,
+    Expense,
+    ExpensePayment,
+    ExpenseSplit,
+    Participant,
+    Trip,
+    activity_participant,
+)
+
+# Rows fetched per round trip from the server-side cursor; each batch is
+# flushed to the client as a single chunk.
+EXPORT_BATCH_SIZE = 1000
+
+
+class ExportProgress:
+    """Counts rows written against the export's total row count."""
+
+    def __init__(self, report: Callable[[int, int], None]):
+        self.report = report
+        self.total = 0
+        self.done = 0
+
+    def start(self, stmts: list[Select], db: Session) -> None:
+        self.total = sum(
+            db.scalar(select(func.count()).select_from(stmt.order_by(None).subquery()))
+            for stmt in stmts
+        )
+
+    def advance(self, rows: int) -> None:
+        self.done += rows
+        self.report(self.done, self.total)
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _ndjson_line(record_type: str, data: dict[str, Any]) -> str:
+    return json.dumps({"type": record_type, **data}, default=_json_default) + "\n"
+
+
+def _stream_rows(
+    record_type: str, stmt: Select, db: Session, progress: ExportProgress | None
+) -> Iterator[str]:
+    result = db.execute(stmt, execution_options={"yield_per": EXPORT_BATCH_SIZE})
+    for rows in result.partitions():
+        yield "".join(_ndjson_line(record_type, row._asdict()) for row in rows)
+        if progress is not None:
+            progress.advance(len(rows))
+
+
+def iter_trip_ndjson(
+    trip: Trip, db: Session, progress: ExportProgress | None = None
+) -> Iterator[str]:
+    trip_id = trip.id
+    parts = [
+        (
+            "calendar",
+            select(
+                Calendar.id,
+                Calendar.dt,
+                Calendar.created_at,
+                Calendar.updated_at,
+            )
+            .where(Calendar.trip_id == trip_id)
+            .order_by(Calendar.dt, Calendar.id),
+        ),
+        (
+            "activity",
+            select(
+                Activity.id,
+                Activity.slug,
+                Activity.title,
+                Activity.calendar_id,
+                Activity.created_at,
+                Activity.updated_at,
+            )
+            .join(Calendar, Activity.calendar_id == Calendar.id)
+            .where(Calendar.trip_id == trip_id)
+            .order_by(Activity.calendar_id, Activity.created_at, Activity.id),
+        ),
+        (
+            "participant",
+            select(
+                Participant.id,
+                Participant.name,
+                Participant.created_at,
+                Participant.updated_at,
+            )
+            .where(Participant.trip_id == trip_id)
+            .order_by(Participant.id),
+        ),
+        (
+            "membership",
+            select(
+                activity_participant.c.activity_id,
+                activity_participant.c.participant_id,
+            )
+            .join(Activity, activity_participant.c.activity_id == Activity.id)
+            .join(Calendar, Activity.calendar_id == Calendar.id)
+            .where(Calendar.trip_id == trip_id)
+            .order_by(
+                activity_participant.c.activity_id,
+                activity_participant.c.participant_id,
+            ),
+        ),
+    ]
+    if progress is not None:
+        progress.start([stmt for _, stmt in parts], db)
+    yield _ndjson_line(
+        "trip",
+        {
+            "id": trip_id,
+            "slug": trip.slug,
+            "title": trip.title,
+            "is_active": trip.is_active,
+            "created_at": trip.created_at,
+            "updated_at": trip.updated_at,
+        },
+    )
+    for record_type, stmt in parts:
+        yield from _stream_rows(record_type, stmt, db, progress)
+
+
+def _stream_csv(
+    header: list[str], stmt: Select, db: Session, progress: ExportProgress | None
+) -> Iterator[str]:
+    if progress is not None:
+        progress.start([stmt], db)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue()
+
+    result = db.execute(stmt, execution_options={"yield_per": EXPORT_BATCH_SIZE})
+    for rows in result.partitions():
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        if progress is not None:
+            progress.advance(len(rows))
+
+
+def _live_expenses_of_trip(trip_id: uuid.UUID) -> Select:
+    return (
+        select(Expense.id)
+        .join(Activity, Expense.activity_id == Activity.id)
+        .join(Calendar, Activity.calendar_id == Calendar.id)
+        .where(Calendar.trip_id == trip_id, Expense.deleted_at.is_(None))
+    )
+
+
+def iter_expenses_csv(
+    trip: Trip, db: Session, progress: ExportProgress | None = None
+) -> Iterator[str]:
+    stmt = (
+        select(
+            Expense.slug,
+            Calendar.dt,
+            Activity.slug,
+            Activity.title,
+            Expense.total_amount,
+            Expense.created_at,
+            Expense.updated_at,
+        )
+        .join(Activity, Expense.activity_id == Activity.id)
+        .join(Calendar, Activity.calendar_id == Calendar.id)
+        .where(Calendar.trip_id == trip.id, Expense.deleted_at.is_(None))
+        .order_by(Calendar.dt, Expense.created_at, Expense.id)
+    )
+    header = [
+        "expense_slug",
+        "date",
+        "activity_slug",
+        "activity_title",
+        "total_amount",
+        "created_at",
+        "updated_at",
+    ]
+    return _stream_csv(header, stmt, db, progress)
+
+
+def iter_expense_payments_csv(
+    trip: Trip, db: Session, progress: ExportProgress | None = None
+) -> Iterator[str]:
+    stmt = (
+        select(
+            ExpensePayment.slug,
+            Expense.slug,
+            Participant.id,
+            Participant.name,
+            ExpensePayment.amount_paid,
+            ExpensePayment.created_at,
+            ExpensePayment.updated_at,
+        )
+        .join(Expense, ExpensePayment.expense_id == Expense.id)
+        .join(Participant, ExpensePayment.participant_id == Participant.id)
+        .where(
+            ExpensePayment.expense_id.in_(_live_expenses_of_trip(trip.id)),
+            ExpensePayment.deleted_at.is_(None),
+        )
+        .order_by(Expense.slug, ExpensePayment.created_at, ExpensePayment.id)
+    )
+    header = [
+        "payment_slug",
+        "expense_slug",
+        "participant_id",
+        "participant_name",
+        "amount_paid",
+        "created_at",
+        "updated_at",
+    ]
+    return _stream_csv(header, stmt, db, progress)
+
+
+def iter_expense_splits_csv(
+    trip: Trip, db: Session, progress: ExportProgress | None = None
+) -> Iterator[str]:
+    stmt = (
+        select(
+            ExpenseSplit.slug,
+            Expense.slug,
+            Participant.id,
+            Participant.name,
+            ExpenseSplit.amount_owed,
+            ExpenseSplit.created_at,
+            ExpenseSplit.updated_at,
+        )
+        .join(Expense, ExpenseSplit.expense_id == Expense.id)
+        .join(Participant, ExpenseSplit.participant_id == Participant.id)
+        .where(
+            ExpenseSplit.expense_id.in_(_live_expenses_of_trip(trip.id)),
+            ExpenseSplit.deleted_at.is_(None),
+        )
+        .order_by(Expense.slug, ExpenseSplit.created_at, ExpenseSplit.id)
+    )
+    header = [
+        "split_slug",
+        "expense_slug",
+        "participant_id",
+        "participant_name",
+        "amount_owed",
+        "created_at",
+        "updated_at",
+    ]
+    return _stream_csv(header, stmt, db, progress)
+
+
+def iter_participant_totals_csv(
+    trip: Trip, db: Session, progress: ExportProgress | None = None
+) -> Iterator[str]:
+    live_expenses = _live_expenses_of_trip(trip.id)
+    paid = (
+        select(
+            ExpensePayment.participant_id,
+            func.sum(ExpensePayment.amount_paid).label("total"),
+        )
+        .where(
+            ExpensePayment.expense_id.in_(live_expenses),
+            ExpensePayment.deleted_at.is_(None),
+        )
+        .group_by(ExpensePayment.participant_id)
+        .subquery()
+    )
+    owed = (
+        select(
+            ExpenseSplit.participant_id,
+            func.sum(ExpenseSplit.amount_owed).label("total"),
+        )
+        .where(
+            ExpenseSplit.expense_id.in_(live_expenses),
+            ExpenseSplit.deleted_at.is_(None),
+        )
+        .group_by(ExpenseSplit.participant_id)
+        .subquery()
+    )
+    total_paid = func.coalesce(paid.c.total, 0.0)
+    total_owed = func.coalesce(owed.c.total, 0.0)
+    stmt = (
+        select(
+            Participant.id,
+            Participant.name,
+            total_paid,
+            total_owed,
+            total_paid - total_owed,
+        )
+        .outerjoin(paid, paid.c.participant_id == Participant.id)
+        .outerjoin(owed, owed.c.participant_id == Participant.id)
+        .where(Participant.trip_id == trip.id)
+        .order_by(Participant.id)
+    )
+    header = [
+        "participant_id",
+        "participant_name",
+        "total_paid",
+        "total_owed",
+        "balance",
+    ]
+    return _stream_csv(header, stmt, db, progress)
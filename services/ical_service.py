@@ -0,0 +1,123 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session, selectinload
+
+from core.cache import calendar_feed_cache
+from core.invalidation import invalidator
+from core.models import Calendar, Trip
+
+PRODID = "-//TripBoard//TripBoard API//EN"
+
+
+@dataclass(frozen=True)
+class CalendarFeed:
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+
+def _escape_text(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    # RFC 5545 3.1: content lines are folded at 75 octets.
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Never split a multi-byte UTF-8 sequence.
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+        limit = 74
+    return "\r\n ".join(parts)
+
+
+def _utc_stamp(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _last_modified(trip: Trip) -> datetime:
+    # Bumped by every change inside the trip, deletions included, which the
+    # timestamps of the remaining rows would miss.
+    changed_at = trip.changed_at
+    if changed_at.tzinfo is None:
+        changed_at = changed_at.replace(tzinfo=timezone.utc)
+    return changed_at.replace(microsecond=0)
+
+
+def render_trip_calendar(trip: Trip, last_modified: datetime) -> str:
+    dtstamp = _utc_stamp(last_modified)
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape_text(trip.title)}",
+    ]
+    for calendar in sorted(trip.calendars, key=lambda c: (c.dt, c.id)):
+        day_start = calendar.dt.strftime("%Y%m%d")
+        day_end = (calendar.dt + timedelta(days=1)).strftime("%Y%m%d")
+        activities = sorted(calendar.activities, key=lambda a: (a.created_at, a.slug))
+        for activity in activities:
+            lines.extend(
+                [
+                    "BEGIN:VEVENT",
+                    f"UID:{activity.id}@tripboard",
+                    f"DTSTAMP:{dtstamp}",
+                    f"DTSTART;VALUE=DATE:{day_start}",
+                    f"DTEND;VALUE=DATE:{day_end}",
+                    f"SUMMARY:{_escape_text(activity.title)}",
+                    "END:VEVENT",
+                ]
+            )
+    lines.append("END:VCALENDAR")
+    return "".join(_fold(line) + "\r\n" for line in lines)
+
+
+def get_trip_calendar_feed(slug: str, db: Session) -> CalendarFeed:
+    cached = calendar_feed_cache.get(slug)
+    if cached is not None:
+        return cached
+
+    trip = (
+        db.query(Trip)
+        .options(selectinload(Trip.calendars).selectinload(Calendar.activities))
+        .filter(Trip.slug == slug)
+        .first()
+    )
+    if not trip:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trip not found",
+        )
+
+    last_modified = _last_modified(trip)
+    body = render_trip_calendar(trip, last_modified).encode("utf-8")
+    feed = CalendarFeed(
+        body=body,
+        etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        last_modified=last_modified,
+    )
+    calendar_feed_cache.put(slug, feed, trip.id, trip.version)
+    return feed
+
+
+invalidator.register(calendar_feed_cache)
@@ -0,0 +1,137 @@
+"""Background jobs for heavy trip operations.
+
+Handlers run in the worker process (``python worker.py``); the API only
+queues jobs and reports on them through ``GET /api/v1/jobs/{id}``.
+
+Export results are files in ``JOB_RESULTS_DIR``, which the worker writes and
+the API serves, so both processes must mount the same directory (a shared
+volume when they run on different hosts). Jobs record the file name only and
+each process resolves it against its own ``JOB_RESULTS_DIR``. The worker
+deletes result files older than ``JOB_RESULT_TTL_S``.
+"""
+
+import os
+import uuid
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Literal
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from core.jobs import JobContext, PermanentJobError, enqueue_job, job_handler
+from core.models import Job, Trip
+from services.document_service import rebuild_trip_documents
+from services.export_service import (
+    ExportProgress,
+    iter_expense_payments_csv,
+    iter_expense_splits_csv,
+    iter_expenses_csv,
+    iter_participant_totals_csv,
+    iter_trip_ndjson,
+)
+from services.trip_service import get_trip_or_404
+
+ExportFormat = Literal["ndjson", "expenses", "payments", "splits", "totals"]
+
+ExportRenderer = Callable[[Trip, Session, ExportProgress | None], Iterator[str]]
+
+EXPORTS: dict[str, tuple[ExportRenderer, str, str]] = {
+    "ndjson": (iter_trip_ndjson, "ndjson", "application/x-ndjson"),
+    "expenses": (iter_expenses_csv, "csv", "text/csv"),
+    "payments": (iter_expense_payments_csv, "csv", "text/csv"),
+    "splits": (iter_expense_splits_csv, "csv", "text/csv"),
+    "totals": (iter_participant_totals_csv, "csv", "text/csv"),
+}
+
+# Document rebuild progress is written every this many trips.
+PROGRESS_EVERY = 100
+
+
+def get_job_or_404(job_id: uuid.UUID, db: Session) -> Job:
+    job = db.get(Job, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    return job
+
+
+def get_job_result_file(
+    job_id: uuid.UUID, results_dir: str, db: Session
+) -> tuple[Path, dict]:
+    job = get_job_or_404(job_id, db)
+    name = (job.result or {}).get("path")
+    if job.status != "succeeded" or not name:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Job has no result file",
+        )
+    path = Path(results_dir) / Path(name).name
+    if not path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Job result file no longer exists",
+        )
+    return path, job.result
+
+
+def enqueue_export_job(slug: str, export_format: ExportFormat, db: Session) -> Job:
+    trip = get_trip_or_404(slug, db)
+    job = enqueue_job(
+        db, "trip.export", {"trip_id": str(trip.id), "format": export_format}
+    )
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def enqueue_document_rebuild(db: Session) -> Job:
+    job = enqueue_job(db, "trip_documents.rebuild", max_attempts=1)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+@job_handler("trip.export")
+def run_export_job(context: JobContext) -> dict:
+    export_format = context.payload["format"]
+    trip = context.db.get(Trip, uuid.UUID(context.payload["trip_id"]))
+    if trip is None:
+        raise PermanentJobError("Trip no longer exists")
+    render, extension, media_type = EXPORTS[export_format]
+
+    directory = Path(context.results_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{context.job_id}.{extension}"
+    partial = path.with_suffix(".partial")
+
+    def report(done: int, total: int) -> None:
+        if total:
+            context.report_progress(done / total, f"{done}/{total} rows written")
+
+    size = 0
+    with partial.open("w", encoding="utf-8", newline="") as fh:
+        for chunk in render(trip, context.db, ExportProgress(report)):
+            fh.write(chunk)
+            size += len(chunk)
+    os.replace(partial, path)
+    return {
+        "path": path.name,
+        "filename": f"{trip.slug}-{export_format}.{extension}",
+        "media_type": media_type,
+        "size": size,
+    }
+
+
+@job_handler("trip_documents.rebuild")
+def run_document_rebuild_job(context: JobContext) -> dict:
+    total = context.db.scalar(select(func.count()).select_from(Trip)) or 0
+
+    def progress(done: int) -> None:
+        if total and (done % PROGRESS_EVERY == 0 or done == total):
+            context.report_progress(done / total, f"{done}/{total} trips")
+
+    return {"rebuilt": rebuild_trip_documents(context.db, progress=progress)}
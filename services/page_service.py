@@ -0,0 +1,127 @@
+import uuid
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, selectinload
+
+from core.models import Activity, Calendar, Participant
+from core.pagination import Keyset, paginate
+from services.calendar_service import get_calendar_or_404
+from services.trip_service import get_trip_or_404
+
+CALENDAR_KEYSET = Keyset((Calendar.dt, Calendar.id), (date.fromisoformat, int))
+ACTIVITY_KEYSET = Keyset(
+    (Activity.created_at, Activity.id), (datetime.fromisoformat, uuid.UUID)
+)
+PARTICIPANT_KEYSET = Keyset((Participant.id,), (int,))
+
+
+def _calendars_with_activity_pages(
+    calendars: list[Calendar], limit: int, db: Session
+) -> list[dict]:
+    """Each calendar with the first ``limit`` activities, in one query."""
+    position = (
+        func.row_number()
+        .over(partition_by=Activity.calendar_id, order_by=ACTIVITY_KEYSET.columns)
+        .label("position")
+    )
+    ranked = (
+        select(Activity.id, position)
+        .where(Activity.calendar_id.in_([c.id for c in calendars]))
+        .subquery()
+    )
+    grouped: dict[int, list[Activity]] = defaultdict(list)
+    for activity in db.scalars(
+        select(Activity)
+        .join(ranked, ranked.c.id == Activity.id)
+        .where(ranked.c.position <= limit + 1)
+        .order_by(Activity.calendar_id, *ACTIVITY_KEYSET.columns)
+        .options(selectinload(Activity.participants))
+    ):
+        grouped[activity.calendar_id].append(activity)
+
+    return [
+        {
+            "id": calendar.id,
+            "dt": calendar.dt,
+            "activities": ACTIVITY_KEYSET.page(grouped[calendar.id], limit),
+            "created_at": calendar.created_at,
+            "updated_at": calendar.updated_at,
+        }
+        for calendar in calendars
+    ]
+
+
+def _calendar_page(trip_id, cursor: str | None, limit: int, db: Session) -> dict:
+    page = paginate(
+        select(Calendar).where(Calendar.trip_id == trip_id),
+        CALENDAR_KEYSET,
+        cursor,
+        limit,
+        db,
+    )
+    page["items"] = _calendars_with_activity_pages(page["items"], limit, db)
+    return page
+
+
+def _participant_page(trip_id, cursor: str | None, limit: int, db: Session) -> dict:
+    return paginate(
+        select(Participant).where(Participant.trip_id == trip_id),
+        PARTICIPANT_KEYSET,
+        cursor,
+        limit,
+        db,
+    )
+
+
+def list_trip_calendars(
+    trip_slug: str, cursor: str | None, limit: int, db: Session
+) -> dict:
+    trip = get_trip_or_404(trip_slug, db)
+    return _calendar_page(trip.id, cursor, limit, db)
+
+
+def list_trip_participants(
+    trip_slug: str, cursor: str | None, limit: int, db: Session
+) -> dict:
+    trip = get_trip_or_404(trip_slug, db)
+    return _participant_page(trip.id, cursor, limit, db)
+
+
+def list_calendar_activities(
+    trip_slug: str, calendar_id: int, cursor: str | None, limit: int, db: Session
+) -> dict:
+    calendar = get_calendar_or_404(trip_slug, calendar_id, db)
+    return paginate(
+        select(Activity)
+        .where(Activity.calendar_id == calendar.id)
+        .options(selectinload(Activity.participants)),
+        ACTIVITY_KEYSET,
+        cursor,
+        limit,
+        db,
+    )
+
+
+def get_trip_page(slug: str, limit: int, db: Session) -> dict:
+    """A trip whose nested collections are capped at ``limit`` items each."""
+    trip = get_trip_or_404(slug, db)
+    return {
+        "title": trip.title,
+        "slug": trip.slug,
+        "is_active": trip.is_active,
+        "calendars": _calendar_page(trip.id, None, limit, db),
+        "participants": _participant_page(trip.id, None, limit, db),
+        "created_at": trip.created_at,
+        "updated_at": trip.updated_at,
+    }
+
+
+def get_calendar_page(
+    trip_slug: str, calendar_id: int, limit: int, db: Session
+) -> dict:
+    """A calendar whose activities are capped at ``limit`` items."""
+    calendar = get_calendar_or_404(trip_slug, calendar_id, db)
+    (page,) = _calendars_with_activity_pages([calendar], limit, db)
+    return page
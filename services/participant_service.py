@@ -1,13 +1,14 @@
 from datetime import datetime, timezone
 
 from fastapi import HTTPException, status
-from sqlalchemy import func
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from core.models import Participant, Trip
+from core.models import Activity, Participant, Trip, activity_participant
 from schemas.participants import ParticipantCreate, ParticipantUpdate
-from services.trip_service import get_trip_or_404
+from services.sync_service import record_tombstones
+from services.trip_service import get_trip_or_404, record_trip_change
 
 
 def get_participant_or_404(trip_slug: str, id: int, db: Session) -> Participant:
@@ -29,7 +30,7 @@ def get_participant_by_id(trip_slug: str, id: int, db: Session):
 
 
 def add_participant_to_trip(
-    trip_slug: str, data: ParticipantCreate, db: Session
+    trip_slug: str, data: ParticipantCreate, db: Session, refresh: bool = True
 ) -> Participant:
     trip = get_trip_or_404(trip_slug, db)
     existing = (
@@ -49,6 +50,14 @@ def add_participant_to_trip(
     db.add(participant)
 
     try:
+        db.flush()
+        record_trip_change(
+            db,
+            trip.id,
+            trip_slug,
+            "participant.created",
+            participant_id=participant.id,
+        )
         db.commit()
     except IntegrityError:
         db.rollback()
@@ -56,24 +65,57 @@ def add_participant_to_trip(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Participant with the same name already exists in this trip",
         )
-    db.refresh(participant)
+    if refresh:
+        db.refresh(participant)
     return participant
 
 
 def update_participant_by_id(
-    trip_slug: str, id: int, data: ParticipantUpdate, db: Session
+    trip_slug: str,
+    id: int,
+    data: ParticipantUpdate,
+    db: Session,
+    refresh: bool = True,
 ) -> Participant:
     participant = get_participant_or_404(trip_slug, id, db)
 
     participant.name = data.name
     participant.updated_at = datetime.now(tz=timezone.utc)
+    record_trip_change(
+        db,
+        participant.trip_id,
+        trip_slug,
+        "participant.updated",
+        participant_id=participant.id,
+    )
     db.commit()
-    db.refresh(participant)
+    if refresh:
+        db.refresh(participant)
     return participant
 
 
 def delete_participant_by_id(trip_slug: str, id: int, db: Session) -> None:
     participant = get_participant_or_404(trip_slug, id, db)
 
-    db.delete(participant)
+    record_trip_change(
+        db,
+        participant.trip_id,
+        trip_slug,
+        "participant.deleted",
+        participant_id=participant.id,
+    )
+    record_tombstones(participant.trip_id, "participant", [participant.id], db)
+    # Their memberships disappear with them; mark those activities changed.
+    db.execute(
+        update(Activity)
+        .where(
+            Activity.id.in_(
+                select(activity_participant.c.activity_id).where(
+                    activity_participant.c.participant_id == participant.id
+                )
+            )
+        )
+        .values(updated_at=datetime.now(tz=timezone.utc))
+    )
+    db.execute(delete(Participant).where(Participant.id == participant.id))
     db.commit()
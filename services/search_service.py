@@ -0,0 +1,111 @@
+from sqlalchemy import (
+    ColumnElement,
+    Integer,
+    Select,
+    String,
+    and_,
+    case,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    union_all,
+)
+from sqlalchemy.orm import InstrumentedAttribute, Session
+
+from core.models import Activity, Calendar, Participant, Trip
+from core.slugs import normalize_search_text
+
+DEFAULT_SEARCH_LIMIT = 20
+
+
+def _match_and_score(
+    column: InstrumentedAttribute[str], term: str, postgres: bool
+) -> tuple[ColumnElement[bool], ColumnElement[float]]:
+    # Every word must appear in the folded text; on PostgreSQL these LIKEs
+    # are served by the gin_trgm_ops index.
+    contains_all = and_(
+        *(column.contains(word, autoescape=True) for word in term.split())
+    )
+    if postgres:
+        # Must match the ix_*_search_text_tsv expression for the index to apply.
+        tsv = func.to_tsvector(literal_column("'simple'"), column)
+        tsquery = func.plainto_tsquery(literal_column("'simple'"), term)
+        matches = or_(tsv.op("@@")(tsquery), contains_all)
+        score = func.ts_rank(tsv, tsquery) + func.word_similarity(term, column)
+    else:
+        matches = contains_all
+        score = case(
+            (column == term, 3.0),
+            (column.startswith(term, autoescape=True), 2.0),
+            else_=1.0,
+        )
+    return matches, score
+
+
+def _trip_query(term: str, postgres: bool) -> Select:
+    matches, score = _match_and_score(Trip.search_text, term, postgres)
+    return select(
+        literal("trip").label("kind"),
+        Trip.title.label("title"),
+        Trip.slug.label("trip_slug"),
+        Trip.slug.label("slug"),
+        literal(None, Integer).label("calendar_id"),
+        literal(None, Integer).label("participant_id"),
+        score.label("score"),
+    ).where(matches)
+
+
+def _activity_query(term: str, postgres: bool) -> Select:
+    matches, score = _match_and_score(Activity.search_text, term, postgres)
+    return (
+        select(
+            literal("activity").label("kind"),
+            Activity.title.label("title"),
+            Trip.slug.label("trip_slug"),
+            Activity.slug.label("slug"),
+            Activity.calendar_id.label("calendar_id"),
+            literal(None, Integer).label("participant_id"),
+            score.label("score"),
+        )
+        .join(Calendar, Activity.calendar_id == Calendar.id)
+        .join(Trip, Calendar.trip_id == Trip.id)
+        .where(matches)
+    )
+
+
+def _participant_query(term: str, postgres: bool) -> Select:
+    matches, score = _match_and_score(Participant.search_text, term, postgres)
+    return (
+        select(
+            literal("participant").label("kind"),
+            Participant.name.label("title"),
+            Trip.slug.label("trip_slug"),
+            literal(None, String).label("slug"),
+            literal(None, Integer).label("calendar_id"),
+            Participant.id.label("participant_id"),
+            score.label("score"),
+        )
+        .join(Trip, Participant.trip_id == Trip.id)
+        .where(matches)
+    )
+
+
+def search(q: str, db: Session, limit: int = DEFAULT_SEARCH_LIMIT):
+    term = normalize_search_text(q)
+    if not term:
+        return []
+
+    postgres = db.get_bind().dialect.name == "postgresql"
+    ranked = union_all(
+        _trip_query(term, postgres),
+        _activity_query(term, postgres),
+        _participant_query(term, postgres),
+    ).subquery()
+    stmt = (
+        select(ranked)
+        .order_by(ranked.c.score.desc(), ranked.c.kind, ranked.c.title)
+        .limit(limit)
+    )
+    return db.execute(stmt).mappings().all()
@@ -0,0 +1,150 @@
+import base64
+import binascii
+import uuid
+from collections.abc import Iterable
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, status
+from sqlalchemy import ColumnElement, delete, insert, or_, select
+from sqlalchemy.orm import Session
+
+from core.models import (
+    Activity,
+    Calendar,
+    Participant,
+    Tombstone,
+    activity_participant,
+)
+from services.trip_service import get_trip_or_404
+
+# Timestamps are assigned before commit, so a row can become visible after a
+# sync that started later than its timestamp. Re-sending this window covers
+# such late commits; clients apply changes idempotently.
+SYNC_OVERLAP = timedelta(seconds=5)
+# Cursors older than this may have missed pruned tombstones.
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+
+def _aware(value: datetime) -> datetime:
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def encode_cursor(value: datetime) -> str:
+    raw = _aware(value).isoformat().encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> datetime:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii")
+        return _aware(datetime.fromisoformat(raw))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync cursor",
+        )
+
+
+def record_tombstones(
+    trip_id: uuid.UUID, entity: str, entity_ids: Iterable, db: Session
+) -> None:
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "trip_id": trip_id,
+            "entity": entity,
+            "entity_id": str(entity_id),
+            "deleted_at": now,
+        }
+        for entity_id in entity_ids
+    ]
+    if rows:
+        db.execute(insert(Tombstone), rows)
+        # Pruned as the trip gains new ones; older cursors get a full resync.
+        db.execute(
+            delete(Tombstone).where(
+                Tombstone.trip_id == trip_id,
+                Tombstone.deleted_at < now - TOMBSTONE_RETENTION,
+            )
+        )
+
+
+def _changed_since(model, threshold: datetime | None) -> ColumnElement[bool] | bool:
+    if threshold is None:
+        return True
+    return or_(model.created_at > threshold, model.updated_at > threshold)
+
+
+def get_trip_changes(slug: str, since: str | None, db: Session) -> dict:
+    trip = get_trip_or_404(slug, db)
+    started_at = datetime.now(timezone.utc)
+
+    since_dt = decode_cursor(since) if since else None
+    reset = since_dt is None or since_dt < started_at - TOMBSTONE_RETENTION
+    threshold = None if reset else since_dt - SYNC_OVERLAP
+
+    trip_changed = threshold is None or any(
+        ts is not None and _aware(ts) > threshold
+        for ts in (trip.created_at, trip.updated_at)
+    )
+
+    calendars = db.scalars(
+        select(Calendar)
+        .where(Calendar.trip_id == trip.id, _changed_since(Calendar, threshold))
+        .order_by(Calendar.id)
+    ).all()
+    participants = db.scalars(
+        select(Participant)
+        .where(Participant.trip_id == trip.id, _changed_since(Participant, threshold))
+        .order_by(Participant.id)
+    ).all()
+
+    changed_activities = (
+        select(Activity)
+        .join(Calendar, Activity.calendar_id == Calendar.id)
+        .where(Calendar.trip_id == trip.id, _changed_since(Activity, threshold))
+    )
+    memberships: dict[uuid.UUID, list[int]] = {}
+    for activity_id, participant_id in db.execute(
+        select(
+            activity_participant.c.activity_id, activity_participant.c.participant_id
+        )
+        .join(Activity, activity_participant.c.activity_id == Activity.id)
+        .join(Calendar, Activity.calendar_id == Calendar.id)
+        .where(Calendar.trip_id == trip.id, _changed_since(Activity, threshold))
+        .order_by(activity_participant.c.participant_id)
+    ):
+        memberships.setdefault(activity_id, []).append(participant_id)
+    activities = [
+        {
+            "id": activity.id,
+            "calendar_id": activity.calendar_id,
+            "title": activity.title,
+            "slug": activity.slug,
+            "participant_ids": memberships.get(activity.id, []),
+            "created_at": activity.created_at,
+            "updated_at": activity.updated_at,
+        }
+        for activity in db.scalars(
+            changed_activities.order_by(Activity.created_at, Activity.id)
+        )
+    ]
+
+    deleted = []
+    if threshold is not None:
+        deleted = db.scalars(
+            select(Tombstone)
+            .where(Tombstone.trip_id == trip.id, Tombstone.deleted_at > threshold)
+            .order_by(Tombstone.id)
+        ).all()
+
+    return {
+        "cursor": encode_cursor(started_at),
+        "reset": reset,
+        "trip": trip if trip_changed else None,
+        "calendars": calendars,
+        "activities": activities,
+        "participants": participants,
+        "deleted": deleted,
+    }
@@ -0,0 +1,227 @@
+"""Render ``TripOut`` JSON inside the database.
+
+The statements below build the same document as
+``TripOut.model_validate(trip).model_dump_json()`` with the database's JSON
+functions (``json_build_object``/``json_agg`` on PostgreSQL, JSON1 on
+SQLite), so a trip tree is returned as one text value per trip without
+hydrating ORM objects. Collection order follows the ORM relationships.
+"""
+
+import os
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import (
+    Select,
+    String,
+    Text,
+    and_,
+    case,
+    cast,
+    func,
+    literal,
+    literal_column,
+    select,
+    true,
+)
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from core.models import (
+    Activity,
+    Calendar,
+    Participant,
+    Trip,
+    TripDocument,
+    activity_participant,
+)
+from services.trip_service import TripVersion
+
+
+@lru_cache
+def local_zone_name() -> str | None:
+    """The IANA name of the server's time zone (``TZ`` or ``/etc/localtime``)."""
+    zone = os.environ.get("TZ", "").lstrip(":")
+    if zone:
+        return zone
+    path = os.path.realpath("/etc/localtime")
+    _, found, name = path.partition("/zoneinfo/")
+    return name if found else None
+
+
+class _Builder:
+    """Dialect specific JSON expressions."""
+
+    def __init__(self, dialect: str):
+        self.postgres = dialect == "postgresql"
+
+    def object(self, *pairs: tuple[str, ColumnElement]) -> ColumnElement:
+        args = []
+        for key, value in pairs:
+            args.extend((literal(key, String), value))
+        if self.postgres:
+            return func.json_build_object(*args)
+        return func.json_object(*args)
+
+    def array(self, item: ColumnElement, where, *order_by, tables) -> ColumnElement:
+        if self.postgres:
+            return func.coalesce(
+                select(func.json_agg(aggregate_order_by(item, *order_by)))
+                .where(where)
+                .scalar_subquery(),
+                cast(literal("[]"), JSON),
+            )
+        # SQLite has no ORDER BY inside aggregates before 3.44; an ordered
+        # derived table keeps the order in json_group_array.
+        rows = (
+            select(item.label("doc"))
+            .where(where)
+            .order_by(*order_by)
+            .correlate_except(*tables)
+            .subquery()
+        )
+        return func.json(
+            select(func.json_group_array(func.json(rows.c.doc)))
+            .select_from(rows)
+            .scalar_subquery()
+        )
+
+    def boolean(self, column) -> ColumnElement:
+        if self.postgres:
+            return column
+        return func.json(case((column, "true"), else_="false"))
+
+    def timestamp(self, column) -> ColumnElement:
+        # Matches ``serialize_dt``: minutes, in the server's local time.
+        if self.postgres:
+            zone = local_zone_name()
+            if zone is None:
+                # Unknown zone: the current offset, exact outside DST changes.
+                offset = datetime.now().astimezone().utcoffset()
+                zone = literal_column(
+                    f"interval '{int(offset.total_seconds())} seconds'"
+                )
+            local = func.timezone(zone, column)
+            return func.to_char(local, "YYYY-MM-DD HH24:MI")
+        # SQLite stores UTC; ``localtime`` converts with this process's C
+        # library, as ``datetime.astimezone`` does.
+        return func.strftime("%Y-%m-%d %H:%M", column, "localtime")
+
+
+def trip_json(dialect: str) -> ColumnElement:
+    """A ``TripOut`` document for the ``Trip`` row of the enclosing query."""
+    b = _Builder(dialect)
+
+    def participant() -> ColumnElement:
+        return b.object(
+            ("id", Participant.id),
+            ("name", Participant.name),
+            ("created_at", b.timestamp(Participant.created_at)),
+            ("updated_at", b.timestamp(Participant.updated_at)),
+        )
+
+    activity_participants = b.array(
+        participant(),
+        and_(
+            activity_participant.c.participant_id == Participant.id,
+            activity_participant.c.activity_id == Activity.id,
+        ),
+        Participant.id,
+        tables=[Participant, activity_participant],
+    )
+    activity = b.object(
+        ("title", Activity.title),
+        ("slug", Activity.slug),
+        ("participants", activity_participants),
+        ("created_at", b.timestamp(Activity.created_at)),
+        ("updated_at", b.timestamp(Activity.updated_at)),
+    )
+    calendar = b.object(
+        ("id", Calendar.id),
+        ("dt", Calendar.dt),
+        (
+            "activities",
+            b.array(
+                activity,
+                Activity.calendar_id == Calendar.id,
+                Activity.created_at,
+                Activity.id,
+                tables=[Activity],
+            ),
+        ),
+        ("created_at", b.timestamp(Calendar.created_at)),
+        ("updated_at", b.timestamp(Calendar.updated_at)),
+    )
+    return cast(
+        b.object(
+            ("title", Trip.title),
+            ("slug", Trip.slug),
+            ("is_active", b.boolean(Trip.is_active)),
+            (
+                "calendars",
+                b.array(
+                    calendar,
+                    Calendar.trip_id == Trip.id,
+                    Calendar.dt,
+                    Calendar.id,
+                    tables=[Calendar],
+                ),
+            ),
+            (
+                "participants",
+                b.array(
+                    participant(),
+                    Participant.trip_id == Trip.id,
+                    Participant.id,
+                    tables=[Participant],
+                ),
+            ),
+            ("created_at", b.timestamp(Trip.created_at)),
+            ("updated_at", b.timestamp(Trip.updated_at)),
+        ),
+        Text,
+    )
+
+
+def trip_json_query(db: Session, where=true()) -> Select:
+    return (
+        select(
+            Trip.id,
+            Trip.version,
+            Trip.changed_at,
+            trip_json(db.get_bind().dialect.name).label("body"),
+        )
+        .where(where)
+        .order_by(Trip.created_at, Trip.id)
+    )
+
+
+def render_trip_json(trip_id, db: Session) -> tuple[str, TripVersion]:
+    row = db.execute(trip_json_query(db, Trip.id == trip_id)).one()
+    return row.body, TripVersion(row.id, row.version, row.changed_at)
+
+
+def get_all_trips_json(db: Session) -> str:
+    """The ``list[TripOut]`` response body, assembled from per-trip documents.
+
+    Stored ``trip_documents`` are used where their version is current; other
+    trips are rendered in the same query.
+    """
+    stmt = (
+        select(
+            func.coalesce(
+                TripDocument.body, trip_json(db.get_bind().dialect.name)
+            ).label("body")
+        )
+        .select_from(Trip)
+        .outerjoin(
+            TripDocument,
+            and_(
+                TripDocument.trip_id == Trip.id,
+                TripDocument.version == Trip.version,
+            ),
+        )
+        .order_by(Trip.created_at, Trip.id)
+    )
+    return "[" + ",".join(db.scalars(stmt)) + "]"
@@ -1,17 +1,27 @@
+import uuid
+from collections.abc import Sequence
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from typing import Any
 
 from fastapi import HTTPException, status
-from sqlalchemy import update
+from sqlalchemy import delete, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from core.events import emit_trip_event
+from core.fieldsets import FieldSelection
+from core.http import if_match_satisfied
 from core.models import Trip
 from core.slugs import slugify_trip
-from schemas.trips import TripCreate, TripUpdate
+from schemas.trips import TripCreate, TripOut, TripUpdate
 
+WRITTEN_VERSION_KEY = "written_trip_version"
+CHANGED_TRIPS_KEY = "changed_trip_ids"
 
-def get_trip_or_404(slug: str, db: Session) -> Trip:
-    trip = db.query(Trip).filter(Trip.slug == slug).first()
+
+def get_trip_or_404(slug: str, db: Session, options: Sequence = ()) -> Trip:
+    trip = db.query(Trip).options(*options).filter(Trip.slug == slug).first()
     if not trip:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -20,12 +30,95 @@ def get_trip_or_404(slug: str, db: Session) -> Trip:
     return trip
 
 
-def get_all_trips(db: Session):
-    return db.query(Trip).all()
+@dataclass(frozen=True)
+class TripVersion:
+    trip_id: uuid.UUID
+    version: int
+    changed_at: datetime
+
+    @property
+    def etag(self) -> str:
+        return trip_etag(self.trip_id, self.version)
+
+
+def trip_etag(trip_id: uuid.UUID, version: int) -> str:
+    return f'"{trip_id.hex}-{version}"'
+
+
+def get_trip_version_or_404(
+    slug: str, db: Session, for_update: bool = False
+) -> TripVersion:
+    stmt = select(Trip.id, Trip.version, Trip.changed_at).where(Trip.slug == slug)
+    if for_update:
+        stmt = stmt.with_for_update()
+    row = db.execute(stmt).first()
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trip not found",
+        )
+    return TripVersion(*row)
+
+
+def check_trip_precondition(slug: str, if_match: str | None, db: Session) -> None:
+    """Enforce ``If-Match`` for a write; the trip row stays locked until commit."""
+    if if_match is None:
+        return
+    current = get_trip_version_or_404(slug, db, for_update=True)
+    if not if_match_satisfied(if_match, current.etag):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Trip has been modified",
+        )
+
+
+def record_trip_change(
+    db: Session, trip_id: uuid.UUID, trip_slug: str, kind: str, **data: Any
+) -> TripVersion:
+    """Bump the trip version and queue a change event in the current transaction."""
+    changed_at = datetime.now(tz=timezone.utc)
+    version = db.execute(
+        update(Trip)
+        .where(Trip.id == trip_id)
+        .values(version=Trip.version + 1, changed_at=changed_at)
+        .returning(Trip.version)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+    emit_trip_event(db, trip_id, trip_slug, kind, version=version, **data)
+    db.info.setdefault(CHANGED_TRIPS_KEY, set()).add(trip_id)
+    current = db.info[WRITTEN_VERSION_KEY] = TripVersion(trip_id, version, changed_at)
+    return current
+
+
+def written_trip_version(db: Session) -> TripVersion:
+    """The trip version set by this session's last ``record_trip_change``."""
+    return db.info[WRITTEN_VERSION_KEY]
+
+
+def deactivate_trips(db: Session) -> None:
+    active = db.query(Trip.id, Trip.slug).filter(Trip.is_active.is_(True)).all()
+    for trip_id, trip_slug in active:
+        record_trip_change(db, trip_id, trip_slug, "trip.updated")
+    db.execute(
+        update(Trip)
+        .where(Trip.is_active.is_(True))
+        .values(is_active=False, updated_at=datetime.now(tz=timezone.utc))
+    )
+
+
+def get_all_trips(db: Session, selection: FieldSelection | None = None):
+    query = db.query(Trip)
+    if selection is not None:
+        query = query.options(*selection.loader_options(Trip, TripOut))
+    return query.order_by(Trip.created_at, Trip.id).all()
 
 
-def get_trip_by_slug(slug: str, db: Session):
-    return get_trip_or_404(slug, db)
+def get_trip_by_slug(
+    slug: str, db: Session, selection: FieldSelection | None = None
+) -> Trip:
+    if selection is None:
+        return get_trip_or_404(slug, db)
+    return get_trip_or_404(slug, db, selection.loader_options(Trip, TripOut))
 
 
 def get_active_trip(db: Session) -> Trip | None:
@@ -35,7 +128,7 @@ def get_active_trip(db: Session) -> Trip | None:
     return active_trip
 
 
-def insert_trip(data: TripCreate, db: Session) -> Trip:
+def insert_trip(data: TripCreate, db: Session, refresh: bool = True) -> Trip:
     slug = slugify_trip(data.title)
 
     # For now non-english/latin titles are not checked for uniqueness
@@ -47,12 +140,14 @@ def insert_trip(data: TripCreate, db: Session) -> Trip:
         )
 
     if data.is_active:
-        db.execute(update(Trip).values(is_active=False))
+        deactivate_trips(db)
 
     trip = Trip(title=data.title, is_active=data.is_active, slug=slug)
 
     db.add(trip)
     try:
+        db.flush()
+        record_trip_change(db, trip.id, trip.slug, "trip.created")
         db.commit()
     except IntegrityError:
         db.rollback()
@@ -60,25 +155,32 @@ def insert_trip(data: TripCreate, db: Session) -> Trip:
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Trip with this slug already exists",
         )
-    db.refresh(trip)
+    if refresh:
+        db.refresh(trip)
     return trip
 
 
-def update_trip_by_slug(slug: str, data: TripUpdate, db: Session) -> Trip:
+def update_trip_by_slug(
+    slug: str, data: TripUpdate, db: Session, refresh: bool = True
+) -> Trip:
     trip = get_trip_or_404(slug, db)
     if data.is_active:
-        db.execute(update(Trip).values(is_active=False))
+        deactivate_trips(db)
     trip.title = data.title
     trip.slug = slugify_trip(data.title)
     trip.is_active = data.is_active
     trip.updated_at = datetime.now(tz=timezone.utc)
+    record_trip_change(db, trip.id, trip.slug, "trip.updated", previous_trip_slug=slug)
     db.commit()
-    db.refresh(trip)
+    if refresh:
+        db.refresh(trip)
     return trip
 
 
 def delete_trip_by_slug(slug: str, db: Session) -> None:
     trip = get_trip_or_404(slug, db)
 
-    db.delete(trip)
+    record_trip_change(db, trip.id, trip.slug, "trip.deleted")
+    # Children are removed by ON DELETE CASCADE rather than loaded by the ORM.
+    db.execute(delete(Trip).where(Trip.id == trip.id))
     db.commit()
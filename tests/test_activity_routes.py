@@ -183,3 +183,46 @@ def test_add_and_remove_participant_in_activity(
     assert remove_again.status_code == 400
     body_remove_again = remove_again.json()
     assert body_remove_again["detail"] == "Participant is already not in the activity"
+
+
+def test_activity_writes_with_minimal_and_compact_returns(
+    client: TestClient,
+    trip: TripOut,
+    calendar: CalendarOut,
+    participant: ParticipantOut,
+):
+    activities_url = f"{BASE_URL}/{trip.slug}/calendars/{calendar.id}/activities"
+    minimal = {"Prefer": "return=minimal"}
+    create = client.post(activities_url, data={"title": "Quiet Hike"}, headers=minimal)
+    assert create.status_code == 204
+    assert create.content == b""
+    assert create.headers["preference-applied"] == "return=minimal"
+    location = create.headers["location"]
+    assert location.endswith(f"{activities_url}/quiet-hike")
+
+    current = client.get(location)
+    assert current.json()["title"] == "Quiet Hike"
+    assert create.headers["etag"] == current.headers["etag"]
+
+    add = client.post(
+        f"{location}/add_participant/{participant.id}",
+        params={"fields": "slug", "expand": ""},
+    )
+    assert add.status_code == 200
+    assert add.json() == {"slug": "quiet-hike"}
+    assert add.headers["etag"] == client.get(location).headers["etag"]
+    assert "last-modified" in add.headers
+
+    remove = client.post(
+        f"{location}/remove_participant/{participant.id}", headers=minimal
+    )
+    assert remove.status_code == 204
+    assert remove.headers["etag"] != create.headers["etag"]
+    assert client.get(location).json()["participants"] == []
+
+    # Unknown fields are rejected before anything is written.
+    bad = client.post(
+        activities_url, data={"title": "Never Made"}, params={"fields": "nope"}
+    )
+    assert bad.status_code == 400
+    assert client.get(f"{activities_url}/never-made").status_code == 404
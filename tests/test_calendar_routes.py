@@ -1,7 +1,9 @@
+import threading
 from datetime import date, datetime, timezone
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import Engine, event, update
 from sqlalchemy.orm import Session
 
 from core.models import Trip
@@ -74,6 +76,11 @@ def test_calendar_crud_flow(client: TestClient, trip: TripOut):
     assert update.status_code == 200
     updated = update.json()
     assert updated["dt"] == "2026-01-31"
+    assert update.headers["etag"] != read.headers["etag"]
+    assert (
+        update.headers["etag"]
+        == client.get(f"{BASE_URL}/{trip_slug}/calendars/{id}").headers["etag"]
+    )
 
     # Delete
     delete = client.delete(f"{BASE_URL}/{trip_slug}/calendars/{id}")
@@ -82,3 +89,109 @@ def test_calendar_crud_flow(client: TestClient, trip: TripOut):
     # Ensure gone
     read_again = client.get(f"{BASE_URL}/{trip_slug}/calendars/{id}")
     assert read_again.status_code == 404
+
+
+def test_calendar_feed_conditional_get(client: TestClient):
+    trip_slug = client.post(f"{BASE_URL}/", data={"title": "Feed Trip"}).json()["slug"]
+    calendar = client.post(
+        f"{BASE_URL}/{trip_slug}/calendars", data={"dt": "2024-05-01"}
+    ).json()
+    client.post(
+        f"{BASE_URL}/{trip_slug}/calendars/{calendar['id']}/activities",
+        data={"title": "Morning Hike"},
+    )
+
+    feed = client.get(f"{BASE_URL}/{trip_slug}/calendar.ics")
+    assert feed.status_code == 200
+    assert feed.headers["content-type"].startswith("text/calendar")
+    assert "BEGIN:VCALENDAR" in feed.text
+    assert "DTSTART;VALUE=DATE:20240501" in feed.text
+    assert "SUMMARY:Morning Hike" in feed.text
+    etag = feed.headers["etag"]
+
+    not_modified = client.get(
+        f"{BASE_URL}/{trip_slug}/calendar.ics", headers={"If-None-Match": etag}
+    )
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+
+    since = client.get(
+        f"{BASE_URL}/{trip_slug}/calendar.ics",
+        headers={"If-Modified-Since": feed.headers["last-modified"]},
+    )
+    assert since.status_code == 304
+
+    # Mutations invalidate the cached feed
+    client.post(
+        f"{BASE_URL}/{trip_slug}/calendars/{calendar['id']}/activities",
+        data={"title": "Evening Swim"},
+    )
+    changed = client.get(
+        f"{BASE_URL}/{trip_slug}/calendar.ics", headers={"If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert "SUMMARY:Evening Swim" in changed.text
+
+
+def test_calendar_feed_last_modified_moves_on_delete(
+    client: TestClient, db_session: Session
+):
+    trip_slug = client.post(f"{BASE_URL}/", data={"title": "Shrinking Feed"}).json()[
+        "slug"
+    ]
+    calendar = client.post(
+        f"{BASE_URL}/{trip_slug}/calendars", data={"dt": "2024-06-01"}
+    ).json()
+    activities_url = f"{BASE_URL}/{trip_slug}/calendars/{calendar['id']}/activities"
+    client.post(activities_url, data={"title": "Kept Walk"})
+    dropped = client.post(activities_url, data={"title": "Dropped Dive"}).json()
+    long_ago = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    db_session.execute(
+        update(Trip).where(Trip.slug == trip_slug).values(changed_at=long_ago)
+    )
+    db_session.commit()
+
+    feed = client.get(f"{BASE_URL}/{trip_slug}/calendar.ics")
+    assert feed.headers["last-modified"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+    client.delete(f"{activities_url}/{dropped['slug']}")
+    since = client.get(
+        f"{BASE_URL}/{trip_slug}/calendar.ics",
+        headers={"If-Modified-Since": feed.headers["last-modified"]},
+    )
+    assert since.status_code == 200
+    assert "Dropped Dive" not in since.text
+
+
+def test_calendar_feed_unknown_trip_404(client: TestClient):
+    resp = client.get(f"{BASE_URL}/no-such-trip/calendar.ics")
+    assert resp.status_code == 404
+
+
+def test_calendar_responses_load_relationships_off_the_event_loop(
+    client: TestClient, trip: TripOut
+):
+    created = client.post(
+        f"{BASE_URL}/{trip.slug}/calendars", data={"dt": "2016-02-02"}
+    )
+    calendar_id = created.json()["id"]
+    threads = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM activities" in statement:
+            threads.append(threading.current_thread().name)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        response = client.get(f"{BASE_URL}/{trip.slug}/calendars/{calendar_id}")
+        written = client.post(
+            f"{BASE_URL}/{trip.slug}/calendars",
+            data={"dt": "2016-02-03"},
+            params={"fields": "id,activities"},
+        )
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    assert written.json()["activities"] == []
+    assert threads and all(name.startswith("db") for name in threads)
@@ -0,0 +1,134 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from core.cache import TripCache
+from core.events import TripEvent, get_event_bus
+from core.invalidation import CacheInvalidator
+from core.models import Trip
+from routers.events import _iter_sse
+
+BASE_URL = "/api/v1/trips"
+
+
+class _ConnectedRequest:
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+def test_committed_writes_are_published(client: TestClient, db_session: Session):
+    slug = client.post(f"{BASE_URL}/", data={"title": "Event Trip"}).json()["slug"]
+    trip_id = str(db_session.query(Trip).filter_by(slug=slug).one().id)
+
+    async def collect() -> list[TripEvent]:
+        subscription = get_event_bus().subscribe(trip_id)
+        try:
+            for path, data in [
+                ("calendars", {"dt": "2024-07-01"}),
+                # Rejected writes roll back and publish nothing
+                ("calendars", {"dt": "2024-07-01"}),
+                ("participants", {"name": "Kim"}),
+            ]:
+                await asyncio.to_thread(
+                    client.post, f"{BASE_URL}/{slug}/{path}", data=data
+                )
+            return [
+                await asyncio.wait_for(subscription.get(), timeout=1),
+                await asyncio.wait_for(subscription.get(), timeout=1),
+            ]
+        finally:
+            subscription.close()
+
+    events = asyncio.run(collect())
+    assert [e.kind for e in events] == ["calendar.created", "participant.created"]
+    assert all(e.trip_slug == slug for e in events)
+
+
+def test_event_stream_format():
+    async def stream() -> list[str]:
+        bus = get_event_bus()
+        chunks = _iter_sse(_ConnectedRequest(), "trip-1")
+        received = [await anext(chunks)]
+        bus.deliver(TripEvent("trip-1", "rome", "calendar.created", {"calendar_id": 7}))
+        received.append(await asyncio.wait_for(anext(chunks), timeout=1))
+        await chunks.aclose()
+        return received
+
+    retry, message = asyncio.run(stream())
+    assert retry == "retry: 5000\n\n"
+    event_line, data_line, _, _ = message.split("\n")
+    assert event_line == "event: calendar.created"
+    payload = json.loads(data_line.removeprefix("data: "))
+    assert payload["trip_slug"] == "rome"
+    assert payload["data"] == {"calendar_id": 7}
+    # Closing the stream drops the subscription
+    assert "trip-1" not in get_event_bus()._subscriptions
+
+
+def test_event_stream_subscribes_only_when_iterated():
+    async def abandon() -> None:
+        chunks = _iter_sse(_ConnectedRequest(), "trip-2")
+        await chunks.aclose()
+
+    asyncio.run(abandon())
+    assert "trip-2" not in get_event_bus()._subscriptions
+
+
+def test_event_stream_unknown_trip_404(client: TestClient):
+    resp = client.get(f"{BASE_URL}/no-such-trip/events")
+    assert resp.status_code == 404
+
+
+def test_cache_invalidation_ordering_and_fallback():
+    invalidator = CacheInvalidator(fallback_ttl=1)
+    cache = invalidator.register(
+        TripCache(ttl=300, keys=lambda trip_event: [trip_event.trip_slug])
+    )
+    other = invalidator.register(TripCache(ttl=300, keys=lambda trip_event: []))
+
+    def changed(version: int, slug: str = "rome") -> TripEvent:
+        return TripEvent("t1", slug, "trip.updated", {"version": version})
+
+    assert cache.put("rome", "v1", "t1", 1)
+    invalidator.handle(changed(2))
+    assert cache.get("rome") is None
+    # A fill built from the old version can't land after the invalidation.
+    assert not cache.put("rome", "v1 again", "t1", 1)
+    assert cache.put("rome", "v2", "t1", 2)
+    # Duplicates and older events are skipped.
+    invalidator.handle(changed(2))
+    assert cache.get("rome") == "v2"
+
+    # A gap means an event was missed: that trip's entries are dropped.
+    other.put("anything", "value", "t1", 2)
+    other.put("unrelated", "value", "t2", 1)
+    invalidator.handle(changed(5, "paris"))
+    assert cache.get("rome") is None and other.get("anything") is None
+    assert other.get("unrelated") == "value"
+
+    cache.put("rome", "v5", "t1", 5)
+    invalidator.connection_changed(False)
+    assert cache.get("rome") is None
+    assert (cache.ttl, other.ttl) == (1, 1)
+    invalidator.connection_changed(True)
+    assert (cache.ttl, other.ttl) == (300, 300)
+
+
+def test_cache_invalidation_state_is_bounded():
+    invalidator = CacheInvalidator(max_trips=2)
+    cache = invalidator.register(
+        TripCache(ttl=300, keys=lambda trip_event: [trip_event.trip_slug], maxsize=2)
+    )
+    for n in range(5):
+        cache.put(f"slug-{n}", "value", f"t{n}", 1)
+        invalidator.handle(
+            TripEvent(f"t{n}", f"slug-{n}", "trip.updated", {"version": 2})
+        )
+    assert list(invalidator._versions) == ["t3", "t4"]
+    assert list(cache._versions) == ["t3", "t4"]
+    # Evicted entries take their trip bookkeeping with them.
+    for n in range(5):
+        cache.put(f"slug-{n}", "value", f"t{n}", 2)
+    assert list(cache._trips) == ["slug-3", "slug-4"]
@@ -0,0 +1,216 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session, sessionmaker
+
+from core.jobs import JobWorker, enqueue_job, job_handler
+from core.models import Activity, Expense, ExpensePayment, ExpenseSplit, Job
+
+BASE_URL = "/api/v1/trips"
+
+
+def test_export_trip_ndjson(client: TestClient):
+    trip = client.post(f"{BASE_URL}/", data={"title": "Export Trip"}).json()
+    slug = trip["slug"]
+    calendar = client.post(
+        f"{BASE_URL}/{slug}/calendars", data={"dt": "2024-03-01"}
+    ).json()
+    participant = client.post(
+        f"{BASE_URL}/{slug}/participants", data={"name": "Export Person"}
+    ).json()
+    activity = client.post(
+        f"{BASE_URL}/{slug}/calendars/{calendar['id']}/activities",
+        data={"title": "Export Activity"},
+    ).json()
+    client.post(
+        f"{BASE_URL}/{slug}/calendars/{calendar['id']}/activities/"
+        f"{activity['slug']}/add_participant/{participant['id']}"
+    )
+
+    resp = client.get(f"{BASE_URL}/{slug}/export.ndjson")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+
+    records = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["type"] for r in records] == [
+        "trip",
+        "calendar",
+        "activity",
+        "participant",
+        "membership",
+    ]
+    trip_record, calendar_record, activity_record, _, membership = records
+    assert trip_record["slug"] == slug
+    assert calendar_record["dt"] == "2024-03-01"
+    assert activity_record["calendar_id"] == calendar["id"]
+    assert activity_record["slug"] == activity["slug"]
+    assert membership["activity_id"] == activity_record["id"]
+    assert membership["participant_id"] == participant["id"]
+
+
+def test_export_unknown_trip_404(client: TestClient):
+    resp = client.get(f"{BASE_URL}/no-such-trip/export.ndjson")
+    assert resp.status_code == 404
+
+
+def _read_csv(text: str) -> list[dict[str, str]]:
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def test_export_expense_csvs(client: TestClient, db_session: Session):
+    trip = client.post(f"{BASE_URL}/", data={"title": "Expense Export Trip"}).json()
+    slug = trip["slug"]
+    calendar = client.post(
+        f"{BASE_URL}/{slug}/calendars", data={"dt": "2024-04-01"}
+    ).json()
+    alice = client.post(
+        f"{BASE_URL}/{slug}/participants", data={"name": "Alice"}
+    ).json()
+    bob = client.post(f"{BASE_URL}/{slug}/participants", data={"name": "Bob"}).json()
+    activity_slug = client.post(
+        f"{BASE_URL}/{slug}/calendars/{calendar['id']}/activities",
+        data={"title": "Expense Dinner"},
+    ).json()["slug"]
+    activity = db_session.query(Activity).filter_by(slug=activity_slug).one()
+
+    dinner = Expense(slug="dinner", total_amount=30.0, activity_id=activity.id)
+    deleted = Expense(
+        slug="deleted-dinner",
+        total_amount=99.0,
+        activity_id=activity.id,
+        deleted_at=datetime.now(timezone.utc),
+    )
+    db_session.add_all([dinner, deleted])
+    db_session.flush()
+    db_session.add_all(
+        [
+            ExpensePayment(
+                slug="dinner-paid-alice",
+                expense_id=dinner.id,
+                participant_id=alice["id"],
+                amount_paid=30.0,
+            ),
+            ExpensePayment(
+                slug="deleted-paid-bob",
+                expense_id=deleted.id,
+                participant_id=bob["id"],
+                amount_paid=99.0,
+            ),
+            ExpenseSplit(
+                slug="dinner-split-alice",
+                expense_id=dinner.id,
+                participant_id=alice["id"],
+                amount_owed=15.0,
+            ),
+            ExpenseSplit(
+                slug="dinner-split-bob",
+                expense_id=dinner.id,
+                participant_id=bob["id"],
+                amount_owed=15.0,
+            ),
+            ExpenseSplit(
+                slug="dinner-split-bob-removed",
+                expense_id=dinner.id,
+                participant_id=bob["id"],
+                amount_owed=5.0,
+                deleted_at=datetime.now(timezone.utc),
+            ),
+        ]
+    )
+    db_session.commit()
+
+    expenses = client.get(f"{BASE_URL}/{slug}/expenses.csv")
+    assert expenses.status_code == 200
+    assert expenses.headers["content-type"].startswith("text/csv")
+    rows = _read_csv(expenses.text)
+    assert [r["expense_slug"] for r in rows] == ["dinner"]
+    assert rows[0]["activity_slug"] == activity_slug
+
+    payments = _read_csv(client.get(f"{BASE_URL}/{slug}/expenses/payments.csv").text)
+    assert [r["payment_slug"] for r in payments] == ["dinner-paid-alice"]
+
+    splits = _read_csv(client.get(f"{BASE_URL}/{slug}/expenses/splits.csv").text)
+    assert sorted(r["split_slug"] for r in splits) == [
+        "dinner-split-alice",
+        "dinner-split-bob",
+    ]
+
+    totals = _read_csv(client.get(f"{BASE_URL}/{slug}/expenses/totals.csv").text)
+    by_name = {r["participant_name"]: r for r in totals}
+    assert float(by_name["Alice"]["balance"]) == 15.0
+    assert float(by_name["Bob"]["total_paid"]) == 0.0
+    assert float(by_name["Bob"]["balance"]) == -15.0
+
+
+def _worker(db_session: Session, tmp_path, **options) -> JobWorker:
+    factory = sessionmaker(bind=db_session.get_bind())
+    return JobWorker(factory, results_dir=str(tmp_path), **options)
+
+
+def test_export_job_runs_in_worker(
+    client: TestClient, db_session: Session, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(client.app.state.settings, "job_results_dir", str(tmp_path))
+    slug = client.post(f"{BASE_URL}/", data={"title": "Job Export"}).json()["slug"]
+    client.post(f"{BASE_URL}/{slug}/participants", data={"name": "Job Person"})
+
+    queued = client.post(f"{BASE_URL}/{slug}/export-jobs", params={"format": "ndjson"})
+    assert queued.status_code == 202
+    job = queued.json()
+    assert queued.headers["location"] == f"/api/v1/jobs/{job['id']}"
+    assert (job["status"], job["attempts"], job["result"]) == ("queued", 0, None)
+    assert client.get(f"/api/v1/jobs/{job['id']}/result").status_code == 409
+
+    worker = _worker(db_session, tmp_path)
+    assert worker.run_once()
+    assert not worker.run_once()
+
+    done = client.get(f"/api/v1/jobs/{job['id']}").json()
+    assert (done["status"], done["attempts"], done["progress"]) == ("succeeded", 1, 1)
+    assert done["progress_message"] == "1/1 rows written"
+    assert done["result"]["filename"] == f"{slug}-ndjson.ndjson"
+    assert "path" not in done["result"]
+    result = client.get(f"/api/v1/jobs/{job['id']}/result")
+    assert result.text == client.get(f"{BASE_URL}/{slug}/export.ndjson").text
+
+    # Result files expire
+    assert _worker(db_session, tmp_path, result_ttl=3600).prune_results() == 0
+    assert _worker(db_session, tmp_path, result_ttl=-1).prune_results() == 1
+    assert client.get(f"/api/v1/jobs/{job['id']}/result").status_code == 410
+
+    assert client.post(f"{BASE_URL}/nope/export-jobs?format=ndjson").status_code == 404
+    bad_format = client.post(f"{BASE_URL}/{slug}/export-jobs?format=xlsx")
+    assert bad_format.status_code == 422
+
+
+def test_failed_jobs_are_retried_then_failed(db_session: Session, tmp_path):
+    attempts = []
+
+    @job_handler("test.flaky")
+    def flaky(context):
+        attempts.append(context.attempt)
+        if context.attempt < 2:
+            raise RuntimeError("first try fails")
+        return {"attempt": context.attempt}
+
+    @job_handler("test.broken")
+    def broken(context):
+        raise RuntimeError("always fails")
+
+    flaky_job = enqueue_job(db_session, "test.flaky")
+    broken_job = enqueue_job(db_session, "test.broken", max_attempts=2)
+    db_session.commit()
+
+    worker = _worker(db_session, tmp_path, backoff_base=0)
+    while worker.run_once():
+        pass
+    db_session.expire_all()
+
+    assert attempts == [1, 2]
+    assert (flaky_job.status, flaky_job.result) == ("succeeded", {"attempt": 2})
+    assert (broken_job.status, broken_job.attempts) == ("failed", 2)
+    assert broken_job.error == "RuntimeError: always fails"
+    assert db_session.get(Job, broken_job.id).finished_at is not None
@@ -82,6 +82,11 @@ def test_participant_crud_flow(client: TestClient, trip: TripOut):
     assert update.status_code == 200
     updated = update.json()
     assert updated["name"] == "anya"
+    assert update.headers["etag"] != read.headers["etag"]
+    assert (
+        update.headers["etag"]
+        == client.get(f"{BASE_URL}/{trip_slug}/participants/{id}").headers["etag"]
+    )
 
     # Delete
     delete = client.delete(f"{BASE_URL}/{trip_slug}/participants/{id}")
@@ -1,7 +1,31 @@
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
 import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
 
-from main import app
+from core.db import get_db
+from core.executor import DBExecutor
+from core.health import HealthMonitor, migration_head
+from core.idempotency import (
+    MAX_STORED_BODY,
+    IdempotencyRecord,
+    PostgresIdempotencyStore,
+)
+from core.models import Trip
+from core.ratelimit import full_trip_read_slots
+from core.settings import Settings
+from core.singleflight import SingleFlight, coalesced_total
+from core.watchdog import LoopWatchdog, loop_blocked_total
+from main import app, create_app
 
 client = TestClient(app)
 
@@ -14,3 +38,383 @@ def test_docs_ok():
 def test_openapi_ok():
     r = client.get("/openapi.json")
     assert r.status_code == 200
+
+
+def test_importing_main_is_lazy():
+    # No settings, environment or engine are needed until the app is built.
+    env = {k: v for k, v in os.environ.items() if not k.startswith("POSTGRES_")}
+    code = (
+        "import main, core.db, core.settings;"
+        "assert core.db._engine is None;"
+        "assert core.settings.get_settings.cache_info().currsize == 0;"
+        "assert callable(main.create_app)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).resolve().parent.parent,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_gunicorn_config_preloads_app_without_engine():
+    pytest.importorskip("gunicorn")
+    code = (
+        "import sys;"
+        "sys.argv = ['gunicorn', '--config', 'gunicorn.conf.py'];"
+        "from gunicorn.app.wsgiapp import WSGIApplication;"
+        "server = WSGIApplication();"
+        "assert server.cfg.preload_app;"
+        "assert server.cfg.worker_class_str == 'uvicorn_worker.UvicornWorker';"
+        "import fastapi, core.db;"
+        "assert isinstance(server.load(), fastapi.FastAPI);"
+        "assert core.db._engine is None"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).resolve().parent.parent,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_db_executor_rejects_when_queue_is_full():
+    executor = DBExecutor(max_workers=1, max_queue=1, retry_after=7)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        assert executor.queue_depth == 1
+        with pytest.raises(HTTPException) as rejected:
+            await executor.run(lambda: "rejected")
+        release.set()
+        return rejected.value, await running, await queued
+
+    try:
+        rejected, running, queued = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert rejected.status_code == 503
+    assert rejected.headers == {"Retry-After": "7"}
+    assert (running, queued) == (True, "queued")
+    assert executor.queue_depth == 0
+
+
+def test_db_queue_wait_is_reported(client: TestClient):
+    response = client.get("/api/v1/trips/")
+    assert response.headers["server-timing"].startswith("db-queue;dur=")
+    body = client.get("/metrics").text
+    assert "db_executor_queue_wait_seconds_count" in body
+    assert "db_executor_queue_depth 0" in body
+
+
+def test_loop_watchdog_reports_blocking_calls(caplog):
+    def blocking_service_call():
+        time.sleep(0.3)
+
+    async def scenario():
+        watchdog = LoopWatchdog(threshold=0.05, interval=0.01)
+        watchdog.start()
+        try:
+            await asyncio.sleep(0.05)
+            blocking_service_call()
+            await asyncio.sleep(0.05)
+        finally:
+            watchdog.stop()
+
+    before = loop_blocked_total.value()
+    with caplog.at_level(logging.WARNING, logger="core.watchdog"):
+        asyncio.run(scenario())
+    assert loop_blocked_total.value() == before + 1
+    assert "blocking_service_call" in caplog.text
+
+
+def test_profiling_writes_collapsed_stacks(client, tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILE_TOKEN", "let-me-profile")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("PROFILE_INTERVAL_MS", "1")
+    profiled_app = create_app(Settings())
+    # Reuse the test database override installed by the client fixture.
+    profiled_app.dependency_overrides[get_db] = app.dependency_overrides[get_db]
+    with TestClient(profiled_app) as profiled:
+        slug = profiled.post("/api/v1/trips/", data={"title": "Profiled"}).json()[
+            "slug"
+        ]
+        assert "x-profile-id" not in profiled.get(f"/api/v1/trips/{slug}").headers
+        # The token is only read from the header, never from the URL.
+        query = profiled.get(f"/api/v1/trips/{slug}?profile=let-me-profile")
+        assert "x-profile-id" not in query.headers
+        response = profiled.get(
+            f"/api/v1/trips/{slug}", headers={"X-Profile": "let-me-profile"}
+        )
+        assert response.status_code == 200
+
+    (profile,) = tmp_path.iterdir()
+    assert profile.name.startswith(response.headers["x-profile-id"])
+    assert profile.name.endswith(f"-slug-{slug}.folded")
+    stack, count = profile.read_text().splitlines()[0].rsplit(" ", 1)
+    assert int(count) >= 1
+
+
+def test_memtrace_reports_heavy_requests(client, caplog, monkeypatch):
+    monkeypatch.setenv("MEMTRACE", "true")
+    monkeypatch.setenv("MEMTRACE_THRESHOLD_MB", "0")
+    monkeypatch.setenv("MEMTRACE_TOKEN", "let-me-debug")
+    monkeypatch.setenv("MEMTRACE_FRAMES", "1")
+    traced_app = create_app(Settings())
+    traced_app.dependency_overrides[get_db] = app.dependency_overrides[get_db]
+    debug = {"X-Debug-Token": "let-me-debug"}
+    with TestClient(traced_app) as traced:
+        slug = traced.post("/api/v1/trips/", data={"title": "Traced"}).json()["slug"]
+        traced.post(f"/api/v1/trips/{slug}/calendars", data={"dt": "2024-08-01"})
+        traced.post(f"/api/v1/trips/{slug}/participants", data={"name": "Traced"})
+        assert traced.post("/debug/memory/snapshots").status_code == 403
+        snapshot = traced.post("/debug/memory/snapshots", headers=debug).json()
+
+        with caplog.at_level(logging.WARNING, logger="core.memtrace"):
+            expand = {"expand": "calendars,participants"}
+            assert traced.get(f"/api/v1/trips/{slug}", params=expand).status_code == 200
+        routes = traced.get("/debug/memory", headers=debug).json()
+        diff = traced.get(
+            f"/debug/memory/snapshots/{snapshot['id']}/diff", headers=debug
+        )
+        missing = traced.get("/debug/memory/snapshots/999/diff", headers=debug)
+
+    assert "GET /{slug} peaked at" in caplog.text
+    assert "1 calendars, 1 participants, 1 trips" in caplog.text
+    stats = routes["GET /{slug}"]
+    assert stats["loaded"] == {"trips": 1, "calendars": 1, "participants": 1}
+    assert stats["max_peak_bytes"] > 0 and stats["top_sites"]
+    assert diff.status_code == 200 and isinstance(diff.json(), list)
+    assert missing.status_code == 404
+
+
+def test_health_endpoints(client: TestClient):
+    assert client.get("/health/live").json() == {"status": "ok"}
+    # The test settings point at a database that is not running.
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    checks = response.json()["checks"]
+    assert checks["database"]["ok"] is False
+    assert checks["migrations"]["head"] == migration_head()
+    assert checks["executor"] == {"ok": True, "queue_depth": 0}
+
+
+def test_health_monitor_checks_database_and_migrations(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'health.db'}")
+    head = migration_head()
+    monitor = HealthMonitor(engine, head, pool_capacity=2, timeout=5)
+
+    asyncio.run(monitor.probe())
+    ready, checks = monitor.readiness()
+    assert not ready
+    assert checks["database"]["ok"] and not checks["migrations"]["ok"]
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32))"))
+        conn.execute(text("INSERT INTO alembic_version VALUES (:v)"), {"v": head})
+    asyncio.run(monitor.probe())
+    ready, checks = monitor.readiness()
+    assert ready
+    assert checks["migrations"] == {"ok": True, "current": head, "head": head}
+    assert checks["pool"]["checked_out"] == 0
+
+    monitor.stop()
+    engine.dispose()
+
+
+def test_hung_health_probe_holds_one_dedicated_thread(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'health.db'}")
+    monitor = HealthMonitor(engine, None, pool_capacity=2, timeout=0.05)
+    release = threading.Event()
+    threads = []
+
+    def hung_check():
+        threads.append(threading.current_thread().name)
+        release.wait(5)
+
+    monitor._check = hung_check
+    try:
+        for _ in range(3):
+            result = asyncio.run(monitor.probe())
+            assert (result.database, result.error) == (False, "timed out")
+        assert len(threads) == 1 and threads[0].startswith("health-probe")
+    finally:
+        release.set()
+        monitor.stop()
+        engine.dispose()
+
+
+def test_rate_limit_per_client_and_route_class(client, monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_READS_PER_S", "0.5")
+    monkeypatch.setenv("RATE_LIMIT_READ_BURST", "2")
+    monkeypatch.setenv("RATE_LIMIT_WRITES_PER_S", "0.5")
+    monkeypatch.setenv("RATE_LIMIT_WRITE_BURST", "1")
+    monkeypatch.setenv("RATE_LIMIT_CLIENT_HEADER", "X-Client-Id")
+    limited_app = create_app(Settings())
+    limited_app.dependency_overrides[get_db] = app.dependency_overrides[get_db]
+    noisy = {"X-Client-Id": "noisy-integration"}
+    with TestClient(limited_app) as limited:
+        reads = [limited.get("/api/v1/trips/", headers=noisy) for _ in range(3)]
+        assert [r.status_code for r in reads] == [200, 200, 429]
+        assert reads[-1].headers["retry-after"] == "2"
+        # Other clients, writes and non-API routes have their own budgets.
+        other = limited.get("/api/v1/trips/", headers={"X-Client-Id": "other"})
+        assert other.status_code == 200
+        write = limited.post("/api/v1/trips/", data={"title": "Ok"}, headers=noisy)
+        assert write.status_code == 200
+        assert limited.get("/health/live", headers=noisy).status_code == 200
+        assert "rate_limited_requests_total" in limited.get("/metrics").text
+
+
+def test_full_trip_reads_are_shed_at_concurrency_cap(client, monkeypatch):
+    slug = client.post("/api/v1/trips/", data={"title": "Busy"}).json()["slug"]
+    monkeypatch.setattr(full_trip_read_slots, "active", 16)
+    response = client.get(f"/api/v1/trips/{slug}")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    monkeypatch.setattr(full_trip_read_slots, "active", 0)
+    assert client.get(f"/api/v1/trips/{slug}").status_code == 200
+    assert full_trip_read_slots.active == 0
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight("test", timeout=0.2)
+    calls = []
+
+    async def build(result, delay=0.05):
+        calls.append(result)
+        await asyncio.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def scenario():
+        # Identical concurrent calls run once and share the result.
+        shared = await asyncio.gather(
+            *(flight.do("trip", lambda: build("doc")) for _ in range(5))
+        )
+        assert shared == ["doc"] * 5 and calls == ["doc"]
+
+        # Errors reach every waiter and are not cached.
+        failures = await asyncio.gather(
+            *(flight.do("trip", lambda: build(LookupError())) for _ in range(3)),
+            return_exceptions=True,
+        )
+        assert all(isinstance(f, LookupError) for f in failures)
+        assert await flight.do("trip", lambda: build("again")) == "again"
+
+        # A cancelled leader hands over to a waiter.
+        leader = asyncio.ensure_future(flight.do("trip", lambda: build("lost", 1)))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.do("trip", lambda: build("took over")))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await waiter == "took over"
+        assert not flight.in_flight("trip")
+
+        # Waiters time out; the leader finishes regardless.
+        slow = asyncio.ensure_future(flight.do("trip", lambda: build("slow", 0.5)))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as timed_out:
+            await flight.do("trip", lambda: build("unused"))
+        assert timed_out.value.status_code == 503
+        assert await slow == "slow"
+
+    before = coalesced_total.value(flight="test")
+    asyncio.run(scenario())
+    assert coalesced_total.value(flight="test") == before + 4 + 2 + 1 + 1
+    assert "unused" not in calls
+
+
+def test_idempotency_key_replays_successful_posts(client: TestClient, db_session):
+    key = {"Idempotency-Key": "create-retried-trip"}
+    first = client.post("/api/v1/trips/", data={"title": "Retried"}, headers=key)
+    assert first.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+
+    retry = client.post("/api/v1/trips/", data={"title": "Retried"}, headers=key)
+    assert retry.status_code == 200
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    assert db_session.query(Trip).filter_by(title="Retried").count() == 1
+
+    misused = client.post("/api/v1/trips/", data={"title": "Other"}, headers=key)
+    assert misused.status_code == 422
+
+    # Multipart retries match even though each picks a new boundary.
+    multipart = {"Idempotency-Key": "create-multipart-trip"}
+    responses = [
+        client.post(
+            "/api/v1/trips/", files={"title": (None, "Multipart")}, headers=multipart
+        )
+        for _ in range(2)
+    ]
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[1].headers["idempotent-replayed"] == "true"
+
+    # Failures are not stored, so the same key can be retried.
+    unknown = {"Idempotency-Key": "participant-for-missing-trip"}
+    for _ in range(2):
+        response = client.post(
+            "/api/v1/trips/no-such-trip/participants",
+            data={"name": "Nobody"},
+            headers=unknown,
+        )
+        assert response.status_code == 404
+        assert "idempotent-replayed" not in response.headers
+
+    # Bodies too large to fingerprint run again instead of being buffered.
+    half = "x" * (MAX_STORED_BODY // 2 + 1)
+    large = {"title": "Too Large", "padding": half, "more_padding": half}
+    large_key = {"Idempotency-Key": "create-large-trip"}
+    assert client.post("/api/v1/trips/", data=large, headers=large_key).is_success
+    again = client.post("/api/v1/trips/", data=large, headers=large_key)
+    assert again.status_code == 400
+    assert "idempotent-replayed" not in again.headers
+
+
+def test_idempotency_keys_are_scoped_to_the_client(client, monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_CLIENT_HEADER", "X-Client-Id")
+    scoped_app = create_app(Settings())
+    scoped_app.dependency_overrides[get_db] = app.dependency_overrides[get_db]
+    with TestClient(scoped_app) as scoped:
+
+        def create(client_id: str):
+            return scoped.post(
+                "/api/v1/trips/",
+                data={"title": "Scoped Key"},
+                headers={"Idempotency-Key": "shared", "X-Client-Id": client_id},
+            )
+
+        assert create("alice").is_success
+        assert create("alice").headers["idempotent-replayed"] == "true"
+        # Same key from another client is a new request (a duplicate slug here).
+        other = create("bob")
+        assert other.status_code == 400
+        assert "idempotent-replayed" not in other.headers
+
+
+def test_postgres_idempotency_store_shares_records(db_session):
+    store = PostgresIdempotencyStore(db_session.get_bind())
+
+    async def scenario():
+        assert await store.begin("k", "fp", 100.0, 160.0) is None
+        pending = await store.begin("k", "fp", 101.0, 161.0)
+        assert pending is not None and pending.pending
+
+        done = IdempotencyRecord("fp", 200.0, 201, [("location", "/x")], b"{}")
+        await store.complete("k", done)
+        assert await store.begin("k", "fp", 102.0, 162.0) == done
+        # Expired records are taken over by the next request.
+        assert await store.begin("k", "other", 300.0, 360.0) is None
+        await store.release("k")
+        assert await store.begin("k", "fp", 301.0, 361.0) is None
+
+    asyncio.run(scenario())
+    store.close()
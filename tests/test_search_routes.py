@@ -0,0 +1,53 @@
+from fastapi.testclient import TestClient
+
+BASE_URL = "/api/v1"
+
+
+def test_search_trips_activities_and_participants(client: TestClient):
+    trip_slug = client.post(
+        f"{BASE_URL}/trips/", data={"title": "Mandalay Search Trip"}
+    ).json()["slug"]
+    calendar = client.post(
+        f"{BASE_URL}/trips/{trip_slug}/calendars", data={"dt": "2024-06-01"}
+    ).json()
+    client.post(
+        f"{BASE_URL}/trips/{trip_slug}/calendars/{calendar['id']}/activities",
+        data={"title": "Mandalay Hill Sunset"},
+    )
+    participant = client.post(
+        f"{BASE_URL}/trips/{trip_slug}/participants", data={"name": "José Álvarez"}
+    ).json()
+
+    resp = client.get(f"{BASE_URL}/search", params={"q": "mandalay"})
+    assert resp.status_code == 200
+    results = resp.json()
+    kinds = {(r["kind"], r["title"]) for r in results}
+    assert ("trip", "Mandalay Search Trip") in kinds
+    assert ("activity", "Mandalay Hill Sunset") in kinds
+    assert all(r["trip_slug"] == trip_slug for r in results)
+    # Prefix matches rank above infix matches
+    assert results[0]["score"] >= results[-1]["score"]
+
+    # Accents are folded on both sides
+    folded = client.get(f"{BASE_URL}/search", params={"q": "jose alvarez"}).json()
+    assert [(r["kind"], r["participant_id"]) for r in folded] == [
+        ("participant", participant["id"])
+    ]
+    accented = client.get(f"{BASE_URL}/search", params={"q": "ÁLVAREZ"}).json()
+    assert [r["participant_id"] for r in accented] == [participant["id"]]
+
+
+def test_search_follows_renames(client: TestClient):
+    trip_slug = client.post(
+        f"{BASE_URL}/trips/", data={"title": "Rename Search Trip"}
+    ).json()["slug"]
+    client.put(f"{BASE_URL}/trips/{trip_slug}", data={"title": "Bagan Temples"})
+
+    assert client.get(f"{BASE_URL}/search", params={"q": "rename search"}).json() == []
+    results = client.get(f"{BASE_URL}/search", params={"q": "bagan"}).json()
+    assert [r["slug"] for r in results] == ["bagan-temples"]
+
+
+def test_search_requires_query(client: TestClient):
+    assert client.get(f"{BASE_URL}/search").status_code == 422
+    assert client.get(f"{BASE_URL}/search", params={"q": "!!!"}).json() == []
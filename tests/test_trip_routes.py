@@ -1,4 +1,27 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import delete, event, update
+from sqlalchemy.dialects import postgresql
+
+from core.models import (
+    Calendar,
+    Participant,
+    Tombstone,
+    Trip,
+    TripDocument,
+    activity_participant,
+)
+from schemas.trips import TripOut
+from services.document_service import check_trip_documents
+from services.trip_json_service import (
+    local_zone_name,
+    render_trip_json,
+    trip_json,
+)
 
 
 def test_read_trips_returns_list(client: TestClient):
@@ -136,3 +159,444 @@ def test_only_one_active_trip(client: TestClient):
     read_b = client.get(f"/api/v1/trips/{trip_b['slug']}")
     assert read_b.status_code == 200
     assert read_b.json()["is_active"] is False
+
+
+def test_trip_changes_delta_sync(client: TestClient, monkeypatch):
+    monkeypatch.setattr("services.sync_service.SYNC_OVERLAP", timedelta(0))
+    slug = client.post("/api/v1/trips/", data={"title": "Sync Trip"}).json()["slug"]
+    calendar = client.post(
+        f"/api/v1/trips/{slug}/calendars", data={"dt": "2024-08-01"}
+    ).json()
+    participant = client.post(
+        f"/api/v1/trips/{slug}/participants", data={"name": "Sync Person"}
+    ).json()
+
+    # First sync returns everything
+    full = client.get(f"/api/v1/trips/{slug}/changes")
+    assert full.status_code == 200
+    body = full.json()
+    assert body["reset"] is True
+    assert body["trip"]["slug"] == slug
+    assert [c["id"] for c in body["calendars"]] == [calendar["id"]]
+    assert [p["id"] for p in body["participants"]] == [participant["id"]]
+    cursor = body["cursor"]
+
+    # Nothing changed since the cursor
+    empty = client.get(f"/api/v1/trips/{slug}/changes", params={"since": cursor})
+    body = empty.json()
+    assert body["reset"] is False
+    assert body["trip"] is None
+    assert body["calendars"] == body["participants"] == body["deleted"] == []
+
+    activity_slug = client.post(
+        f"/api/v1/trips/{slug}/calendars/{calendar['id']}/activities",
+        data={"title": "Sync Activity"},
+    ).json()["slug"]
+    client.post(
+        f"/api/v1/trips/{slug}/calendars/{calendar['id']}/activities/"
+        f"{activity_slug}/add_participant/{participant['id']}"
+    )
+    delta = client.get(f"/api/v1/trips/{slug}/changes", params={"since": cursor})
+    body = delta.json()
+    assert body["calendars"] == []
+    assert [a["slug"] for a in body["activities"]] == [activity_slug]
+    assert body["activities"][0]["participant_ids"] == [participant["id"]]
+    cursor = body["cursor"]
+
+    client.delete(f"/api/v1/trips/{slug}/participants/{participant['id']}")
+    client.delete(f"/api/v1/trips/{slug}/calendars/{calendar['id']}")
+    deleted = client.get(f"/api/v1/trips/{slug}/changes", params={"since": cursor})
+    body = deleted.json()
+    entities = {(d["entity"], d["entity_id"]) for d in body["deleted"]}
+    assert ("participant", str(participant["id"])) in entities
+    assert ("calendar", str(calendar["id"])) in entities
+    assert sum(1 for e, _ in entities if e == "activity") == 1
+
+
+def test_trip_changes_include_deactivation(client: TestClient, monkeypatch):
+    monkeypatch.setattr("services.sync_service.SYNC_OVERLAP", timedelta(0))
+    first = client.post(
+        "/api/v1/trips/", data={"title": "Active Sync Trip", "is_active": True}
+    ).json()
+    cursor = client.get(f"/api/v1/trips/{first['slug']}/changes").json()["cursor"]
+    client.post("/api/v1/trips/", data={"title": "Newer Trip", "is_active": True})
+
+    delta = client.get(
+        f"/api/v1/trips/{first['slug']}/changes", params={"since": cursor}
+    ).json()
+    assert delta["trip"]["is_active"] is False
+
+
+def test_old_tombstones_are_pruned_on_delete(client: TestClient, db_session):
+    trip = client.post("/api/v1/trips/", data={"title": "Pruned Trip"}).json()
+    trip_id = db_session.query(Trip.id).filter_by(slug=trip["slug"]).scalar()
+    old = Tombstone(
+        trip_id=trip_id,
+        entity="participant",
+        entity_id="1",
+        deleted_at=datetime.now(timezone.utc) - timedelta(days=31),
+    )
+    db_session.add(old)
+    db_session.commit()
+    participant = client.post(
+        f"/api/v1/trips/{trip['slug']}/participants", data={"name": "Gone"}
+    ).json()
+    client.delete(f"/api/v1/trips/{trip['slug']}/participants/{participant['id']}")
+
+    db_session.expire_all()
+    remaining = db_session.query(Tombstone.entity_id).filter_by(trip_id=trip_id)
+    assert [row.entity_id for row in remaining] == [str(participant["id"])]
+
+
+def test_trip_changes_invalid_cursor(client: TestClient):
+    slug = client.post("/api/v1/trips/", data={"title": "Bad Cursor Trip"}).json()[
+        "slug"
+    ]
+    resp = client.get(f"/api/v1/trips/{slug}/changes", params={"since": "%%%"})
+    assert resp.status_code == 400
+
+
+def test_delete_trip_cascades_in_database(client: TestClient, db_session):
+    slug = client.post("/api/v1/trips/", data={"title": "Cascade Trip"}).json()["slug"]
+    participant = client.post(
+        f"/api/v1/trips/{slug}/participants", data={"name": "Cascade Person"}
+    ).json()
+    for day in ("2024-09-01", "2024-09-02"):
+        calendar = client.post(
+            f"/api/v1/trips/{slug}/calendars", data={"dt": day}
+        ).json()
+        activity = client.post(
+            f"/api/v1/trips/{slug}/calendars/{calendar['id']}/activities",
+            data={"title": f"Cascade Activity {day}"},
+        ).json()
+        client.post(
+            f"/api/v1/trips/{slug}/calendars/{calendar['id']}/activities/"
+            f"{activity['slug']}/add_participant/{participant['id']}"
+        )
+    trip_id = db_session.query(Trip.id).filter(Trip.slug == slug).scalar()
+
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert client.delete(f"/api/v1/trips/{slug}").status_code == 204
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    deletes = [s for s in statements if s.lstrip().upper().startswith("DELETE")]
+    assert len(deletes) == 1
+    assert db_session.query(Calendar).filter_by(trip_id=trip_id).count() == 0
+    assert db_session.query(Participant).filter_by(trip_id=trip_id).count() == 0
+    assert (
+        db_session.query(activity_participant)
+        .filter(activity_participant.c.participant_id == participant["id"])
+        .count()
+        == 0
+    )
+
+
+def test_trip_conditional_requests(client: TestClient):
+    slug = client.post("/api/v1/trips/", data={"title": "Version Trip"}).json()["slug"]
+    first = client.get(f"/api/v1/trips/{slug}")
+    etag = first.headers["etag"]
+    assert "last-modified" in first.headers
+
+    cached = client.get(f"/api/v1/trips/{slug}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+
+    # Any change inside the trip bumps its version
+    client.post(f"/api/v1/trips/{slug}/participants", data={"name": "Versioned"})
+    changed = client.get(f"/api/v1/trips/{slug}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    new_etag = changed.headers["etag"]
+    assert new_etag != etag
+
+    # Writes with a stale If-Match are rejected
+    stale = client.put(
+        f"/api/v1/trips/{slug}",
+        data={"title": "Version Trip Stale"},
+        headers={"If-Match": etag},
+    )
+    assert stale.status_code == 412
+
+    fresh = client.put(
+        f"/api/v1/trips/{slug}",
+        data={"title": "Version Trip"},
+        headers={"If-Match": new_etag},
+    )
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] not in (etag, new_etag)
+
+    stale_delete = client.delete(
+        f"/api/v1/trips/{slug}", headers={"If-Match": new_etag}
+    )
+    assert stale_delete.status_code == 412
+    delete = client.delete(
+        f"/api/v1/trips/{slug}", headers={"If-Match": fresh.headers["etag"]}
+    )
+    assert delete.status_code == 204
+
+
+def test_trip_document_is_materialized(client: TestClient, db_session):
+    slug = client.post("/api/v1/trips/", data={"title": "Document Trip"}).json()["slug"]
+    trip = db_session.query(Trip).filter(Trip.slug == slug).one()
+    document = db_session.get(TripDocument, trip.id)
+    assert document is not None
+    assert document.version == trip.version
+    first = client.get(f"/api/v1/trips/{slug}")
+    assert first.status_code == 200
+    assert json.loads(document.body) == first.json()
+
+    # Writes re-render the document in their own transaction
+    client.post(f"/api/v1/trips/{slug}/participants", data={"name": "Doc Person"})
+    db_session.expire_all()
+    assert db_session.get(TripDocument, trip.id).version == trip.version
+    assert [d for d in check_trip_documents(db_session) if d.slug == slug] == []
+    second = client.get(f"/api/v1/trips/{slug}").json()
+    assert [p["name"] for p in second["participants"]] == ["Doc Person"]
+
+    # Edits that bypass the services are reported as drift
+    db_session.execute(
+        update(Participant)
+        .where(Participant.trip_id == trip.id)
+        .values(name="Renamed Behind Our Back")
+    )
+    db_session.commit()
+    drift = check_trip_documents(db_session, repair=True)
+    assert [d.state for d in drift if d.slug == slug] == ["drifted"]
+    assert check_trip_documents(db_session) == []
+
+    # Reads never write: a trip without a document is rendered, not stored
+    db_session.execute(delete(TripDocument).where(TripDocument.trip_id == trip.id))
+    db_session.commit()
+    third = client.get(f"/api/v1/trips/{slug}").json()
+    assert [p["name"] for p in third["participants"]] == ["Renamed Behind Our Back"]
+    assert db_session.get(TripDocument, trip.id) is None
+
+
+def test_trip_json_matches_trip_out(client: TestClient, db_session):
+    slug = client.post("/api/v1/trips/", data={"title": "Json Trip"}).json()["slug"]
+    base = f"/api/v1/trips/{slug}"
+    people = [
+        client.post(f"{base}/participants", data={"name": name}).json()
+        for name in ("Ann", "Bob")
+    ]
+    for day in ("2024-09-02", "2024-09-01"):
+        calendar = client.post(f"{base}/calendars", data={"dt": day}).json()
+        for title in ("Walk", "Swim"):
+            activity = client.post(
+                f"{base}/calendars/{calendar['id']}/activities",
+                data={"title": f"{title} {day}"},
+            ).json()
+        client.post(
+            f"{base}/calendars/{calendar['id']}/activities/{activity['slug']}"
+            f"/add_participant/{people[1]['id']}"
+        )
+
+    db_session.expire_all()
+    trip = db_session.query(Trip).filter(Trip.slug == slug).one()
+    expected = TripOut.model_validate(trip).model_dump(mode="json")
+    assert json.loads(render_trip_json(trip.id, db_session)[0]) == expected
+    assert [c["dt"] for c in expected["calendars"]] == ["2024-09-01", "2024-09-02"]
+    swim = expected["calendars"][0]["activities"][1]
+    assert [p["name"] for p in swim["participants"]] == ["Bob"]
+
+    listed = client.get("/api/v1/trips/").json()
+    assert [t for t in listed if t["slug"] == slug] == [expected]
+
+    # The list serves current stored documents and renders the others.
+    stored = json.dumps({**expected, "title": "From Document"})
+    db_session.execute(
+        update(TripDocument).where(TripDocument.trip_id == trip.id).values(body=stored)
+    )
+    db_session.commit()
+    listed = client.get("/api/v1/trips/").json()
+    assert [t["title"] for t in listed if t["slug"] == slug] == ["From Document"]
+    db_session.execute(
+        update(TripDocument)
+        .where(TripDocument.trip_id == trip.id)
+        .values(version=TripDocument.version - 1)
+    )
+    db_session.commit()
+    listed = client.get("/api/v1/trips/").json()
+    assert [t for t in listed if t["slug"] == slug] == [expected]
+
+
+def test_trip_json_compiles_for_postgresql():
+    # The PostgreSQL branch only runs against a real server; at least make
+    # sure it builds the expected statement.
+    sql = str(trip_json("postgresql").compile(dialect=postgresql.dialect()))
+    assert "json_build_object" in sql and "json_agg" in sql
+    assert "ORDER BY" in sql and "to_char(timezone(" in sql
+
+
+def test_trip_json_renders_local_time(client: TestClient, db_session, monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    local_zone_name.cache_clear()
+    try:
+        slug = client.post("/api/v1/trips/", data={"title": "Zoned"}).json()["slug"]
+        trip = db_session.query(Trip).filter(Trip.slug == slug).one()
+        rendered = json.loads(render_trip_json(trip.id, db_session)[0])
+        # SQLite hands back naive UTC; serialize_dt sees aware values on
+        # PostgreSQL and converts them to local time like this.
+        created = trip.created_at.replace(tzinfo=timezone.utc)
+        local = created.astimezone().strftime("%Y-%m-%d %H:%M")
+        assert rendered["created_at"] == local
+        assert local != created.strftime("%Y-%m-%d %H:%M")
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+        local_zone_name.cache_clear()
+
+
+def test_trip_fields_and_expand(client: TestClient, db_session):
+    slug = client.post("/api/v1/trips/", data={"title": "Sparse Trip"}).json()["slug"]
+    base = f"/api/v1/trips/{slug}"
+    client.post(f"{base}/participants", data={"name": "Sparse Person"})
+    calendar = client.post(f"{base}/calendars", data={"dt": "2024-10-01"}).json()
+    client.post(
+        f"{base}/calendars/{calendar['id']}/activities", data={"title": "Sparse Hike"}
+    )
+
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get(base, params={"fields": "title,slug"})
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    assert response.json() == {"title": "Sparse Trip", "slug": slug}
+    assert "etag" in response.headers
+    assert not [s for s in statements if "FROM calendars" in s]
+
+    body = client.get(
+        base, params={"expand": "calendars.activities", "fields": "title,slug"}
+    ).json()
+    assert list(body) == ["title", "slug", "calendars"]
+    assert [a["title"] for a in body["calendars"][0]["activities"]] == ["Sparse Hike"]
+    assert "participants" not in body["calendars"][0]["activities"][0]
+
+    body = client.get(
+        f"{base}/calendars/{calendar['id']}", params={"fields": "dt"}
+    ).json()
+    assert body == {"dt": "2024-10-01"}
+
+    listed = client.get("/api/v1/trips/", params={"fields": "slug"}).json()
+    assert {"slug": slug} in listed
+
+    bad = client.get(base, params={"fields": "title,nope"})
+    assert bad.status_code == 400
+    assert client.get(base, params={"expand": "title"}).status_code == 400
+
+
+def test_nested_collections_are_paginated(client: TestClient):
+    slug = client.post("/api/v1/trips/", data={"title": "Paged Trip"}).json()["slug"]
+    base = f"/api/v1/trips/{slug}"
+    for name in ("P1", "P2", "P3"):
+        client.post(f"{base}/participants", data={"name": name})
+    calendar_ids = [
+        client.post(f"{base}/calendars", data={"dt": day}).json()["id"]
+        for day in ("2024-11-03", "2024-11-01", "2024-11-02")
+    ]
+    for title in ("A1", "A2", "A3"):
+        client.post(
+            f"{base}/calendars/{calendar_ids[1]}/activities",
+            data={"title": f"Paged {title}"},
+        )
+
+    trip = client.get(base, params={"limit": 2}).json()
+    assert [c["dt"] for c in trip["calendars"]["items"]] == ["2024-11-01", "2024-11-02"]
+    assert [p["name"] for p in trip["participants"]["items"]] == ["P1", "P2"]
+    first = trip["calendars"]["items"][0]["activities"]
+    assert [a["title"] for a in first["items"]] == ["Paged A1", "Paged A2"]
+
+    rest = client.get(
+        f"{base}/calendars/{calendar_ids[1]}/activities",
+        params={"cursor": first["next_cursor"], "limit": 2},
+    ).json()
+    assert [a["title"] for a in rest["items"]] == ["Paged A3"]
+    assert rest["next_cursor"] is None
+
+    calendars = client.get(
+        f"{base}/calendars",
+        params={"cursor": trip["calendars"]["next_cursor"]},
+    ).json()
+    assert [c["dt"] for c in calendars["items"]] == ["2024-11-03"]
+    participants = client.get(
+        f"{base}/participants",
+        params={"cursor": trip["participants"]["next_cursor"]},
+    ).json()
+    assert [p["name"] for p in participants["items"]] == ["P3"]
+
+    calendar = client.get(
+        f"{base}/calendars/{calendar_ids[1]}", params={"limit": 1}
+    ).json()
+    assert len(calendar["activities"]["items"]) == 1
+    assert client.get(f"{base}/participants", params={"cursor": "x"}).status_code == 400
+
+
+def test_trip_responses_are_compressed_when_accepted(client: TestClient):
+    slug = client.post("/api/v1/trips/", data={"title": "Long Haul"}).json()["slug"]
+    for i in range(20):
+        client.post(
+            f"/api/v1/trips/{slug}/participants", data={"name": f"Traveller {i}"}
+        )
+    url = f"/api/v1/trips/{slug}"
+
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(plain.content)
+    assert response.json() == plain.json()
+    assert response.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+    not_modified = client.get(
+        url,
+        headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]},
+    )
+    assert not_modified.status_code == 304
+
+    # The compressed representation's tag still works for optimistic writes.
+    update = client.put(
+        url,
+        data={"title": "Long Haul"},
+        headers={"If-Match": response.headers["etag"]},
+    )
+    assert update.status_code == 200
+    stale = client.put(
+        url,
+        data={"title": "Long Haul"},
+        headers={"If-Match": response.headers["etag"]},
+    )
+    assert stale.status_code == 412
+
+
+def test_trip_as_msgpack(client: TestClient):
+    msgpack = pytest.importorskip("msgpack")
+    slug = client.post("/api/v1/trips/", data={"title": "Packed"}).json()["slug"]
+    url = f"/api/v1/trips/{slug}"
+    response = client.get(url, headers={"Accept": "application/msgpack"})
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == client.get(url).json()
+    assert "Accept" in response.headers["vary"]
+
+
+def test_json_trip_varies_on_accept(client: TestClient):
+    pytest.importorskip("msgpack")
+    slug = client.post("/api/v1/trips/", data={"title": "Plain"}).json()["slug"]
+    response = client.get(f"/api/v1/trips/{slug}")
+    assert response.headers["content-type"] == "application/json"
+    assert "Accept" in response.headers["vary"]
@@ -0,0 +1,57 @@
+"""Background job worker: ``python worker.py [--concurrency N]``."""
+
+import argparse
+import logging
+import signal
+import sys
+import threading
+
+# Registers the job handlers.
+import services.job_service  # noqa: F401
+from core.db import dispose_db, get_session_factory, init_db
+from core.jobs import JobWorker
+from core.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv: list[str] | None = None) -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run queued background jobs")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.job_worker_concurrency,
+        help="jobs run at once (default: JOB_WORKER_CONCURRENCY)",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    init_db(settings)
+    worker = JobWorker(
+        get_session_factory(),
+        concurrency=args.concurrency,
+        poll_interval=settings.job_poll_interval_s,
+        lease=settings.job_lease_s,
+        backoff_base=settings.job_retry_backoff_s,
+        backoff_max=settings.job_retry_backoff_max_s,
+        results_dir=settings.job_results_dir,
+        result_ttl=settings.job_result_ttl_s,
+    )
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopping.set())
+
+    worker.start()
+    logger.info(
+        "Job worker %s running %d at a time", worker.worker_id, args.concurrency
+    )
+    stopping.wait()
+    logger.info("Finishing running jobs")
+    worker.stop()
+    dispose_db()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())